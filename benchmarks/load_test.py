@@ -0,0 +1,251 @@
+"""Teste de carga HTTP do app inteiro contra o provedor falso (sem rede externa).
+
+Uso:
+    # sobe o servidor (gunicorn + MARKET_DATA_PROVIDER=fake), mede e encerra
+    python benchmarks/load_test.py --serve --duration 30 --concurrency 64
+
+    # compara modos: cache desligado, latência e falhas no upstream falso
+    python benchmarks/load_test.py --serve --env CHART_CACHE_MAX_ENTRIES=0 \\
+        --env FAKE_PROVIDER_LATENCY_MS=80 --env FAKE_PROVIDER_ERROR_RATE=0.02
+
+    # contra um servidor já em execução
+    python benchmarks/load_test.py --url http://127.0.0.1:5000
+
+Cada thread mantém uma conexão keep-alive e sorteia (com semente) a rota e o
+símbolo de cada requisição. A saída é JSON: req/s, status, percentis de
+latência por rota e as estatísticas do cache de gráficos do servidor.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (peso, rota) — {symbol} é trocado por um símbolo do conjunto
+DEFAULT_MIX = [
+    (40, '/api/market/data/{symbol}?interval=1d&range=1y'),
+    (25, '/api/market/quote/{symbol}'),
+    (15, '/api/analysis/indicators/{symbol}'),
+    (10, '/api/analysis/signals/{symbol}'),
+    (5, '/api/market/data/{symbol}?interval=1h&range=1mo&format=columnar'),
+    (5, '/api/market/search?q={symbol}'),
+]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else None,
+        **{f'p{q}_ms': round(percentile(values, q) * 1000, 3) if values else None for q in (50, 90, 99, 99.9)},
+        'max_ms': round(values[-1] * 1000, 3) if values else None
+    }
+
+
+class Worker(threading.Thread):
+    def __init__(self, index, target, mix, symbols, deadline, max_requests, headers, seed, results):
+        super().__init__(daemon=True)
+        self.target = target
+        self.mix = mix
+        self.symbols = symbols
+        self.deadline = deadline
+        self.max_requests = max_requests
+        self.headers = headers
+        self.random = random.Random(seed * 1000 + index)
+        self.results = results
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.target.hostname, self.target.port or 80, timeout=30)
+
+    def run(self):
+        paths, weights = zip(*((path, weight) for weight, path in self.mix))
+        conn = self._connect()
+        latencies = {path: [] for path in paths}
+        statuses = {}
+        errors = 0
+        sent = 0
+        while time.monotonic() < self.deadline and (self.max_requests is None or sent < self.max_requests):
+            template = self.random.choices(paths, weights)[0]
+            url = self.target.path.rstrip('/') + template.format(symbol=self.random.choice(self.symbols))
+            started = time.perf_counter()
+            try:
+                conn.request('GET', url, headers=self.headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = self._connect()
+                continue
+            finally:
+                sent += 1
+            latencies[template].append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+        conn.close()
+        self.results.append((latencies, statuses, errors))
+
+
+def run_load(base_url, concurrency, duration, max_requests=None, mix=DEFAULT_MIX, symbols=None,
+             seed=0, headers=None):
+    target = urlsplit(base_url)
+    symbols = symbols or [f'SYM{i:03d}' for i in range(50)]
+    per_worker = None if max_requests is None else max(1, max_requests // concurrency)
+    results = []
+    started = time.monotonic()
+    deadline = started + duration
+    workers = [Worker(i, target, mix, symbols, deadline, per_worker, headers or {}, seed, results)
+               for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - started
+
+    by_route = {}
+    statuses = {}
+    errors = 0
+    for latencies, worker_statuses, worker_errors in results:
+        for path, values in latencies.items():
+            by_route.setdefault(path, []).extend(values)
+        for status, count in worker_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+        errors += worker_errors
+    everything = [value for values in by_route.values() for value in values]
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'requests': len(everything),
+        'requests_per_s': round(len(everything) / elapsed, 1) if elapsed else None,
+        'status': {str(status): count for status, count in sorted(statuses.items())},
+        'connection_errors': errors,
+        'latency': summarize(everything),
+        'routes': {path: summarize(values) for path, values in by_route.items()}
+    }
+
+
+def fetch_json(base_url, path):
+    target = urlsplit(base_url)
+    conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=10)
+    try:
+        conn.request('GET', target.path.rstrip('/') + path)
+        response = conn.getresponse()
+        return json.loads(response.read()) if response.status == 200 else None
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+
+
+def start_server(port, env_overrides, workers=None, worker_class=None):
+    """Sobe o app com gunicorn e o provedor falso; espera responder"""
+    # Barras do provedor falso num diretório temporário, fora do armazenamento real
+    bar_dir = tempfile.mkdtemp(prefix='load-test-bars-')
+    env = dict(os.environ, MARKET_DATA_PROVIDER='fake', PORT=str(port), LOG_LEVEL='WARNING', BAR_STORE_DIR=bar_dir)
+    env.update(env_overrides)
+    if workers:
+        env['WEB_CONCURRENCY'] = str(workers)
+    if worker_class:
+        env['GUNICORN_WORKER_CLASS'] = worker_class
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null', 'src.wsgi:app'],
+        cwd=ROOT, env=env, start_new_session=True
+    )
+    process.bar_dir = bar_dir
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Servidor terminou com código {process.returncode}')
+        if fetch_json(base_url, '/api/market/symbols') is not None:
+            return process, base_url
+        time.sleep(0.25)
+    stop_server(process)
+    raise RuntimeError('Servidor não respondeu em 60s')
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+    shutil.rmtree(process.bar_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='servidor alvo (ignorado com --serve)')
+    parser.add_argument('--serve', action='store_true', help='sobe o app com gunicorn e o provedor falso')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--workers', type=int, help='workers do gunicorn (WEB_CONCURRENCY)')
+    parser.add_argument('--worker-class', help='classe de worker do gunicorn (eventlet, gthread, sync)')
+    parser.add_argument('--env', action='append', default=[], metavar='NOME=VALOR',
+                        help='variável de ambiente do servidor (repetível)')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--requests', type=int, help='total máximo de requisições')
+    parser.add_argument('--warmup', type=float, default=2, help='segundos de aquecimento antes de medir')
+    parser.add_argument('--symbols', type=int, default=50, help='quantidade de símbolos sintéticos')
+    parser.add_argument('--gzip', action='store_true', help='envia Accept-Encoding: gzip')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='arquivo JSON de saída (padrão: stdout)')
+    args = parser.parse_args(argv)
+
+    env_overrides = dict(item.split('=', 1) for item in args.env)
+    process = None
+    base_url = args.url
+    if args.serve:
+        process, base_url = start_server(args.port, env_overrides, args.workers, args.worker_class)
+    try:
+        symbols = [f'SYM{i:03d}' for i in range(args.symbols)]
+        headers = {'Accept-Encoding': 'gzip'} if args.gzip else {}
+        if args.warmup:
+            run_load(base_url, args.concurrency, args.warmup, symbols=symbols, seed=args.seed + 1, headers=headers)
+        result = run_load(base_url, args.concurrency, args.duration, args.requests,
+                          symbols=symbols, seed=args.seed, headers=headers)
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'config': {
+                'url': base_url, 'served': args.serve, 'workers': args.workers, 'worker_class': args.worker_class,
+                'env': env_overrides, 'concurrency': args.concurrency, 'duration': args.duration,
+                'symbols': args.symbols, 'gzip': args.gzip, 'seed': args.seed
+            },
+            'result': result,
+            'server_cache': fetch_json(base_url, '/api/market/cache/stats')
+        }
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    print(f"{result['requests']} requisições em {result['elapsed_s']}s: {result['requests_per_s']} req/s, "
+          f"p50 {result['latency']['p50_ms']} ms, p99 {result['latency']['p99_ms']} ms, status {result['status']}",
+          file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
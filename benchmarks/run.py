@@ -0,0 +1,461 @@
+"""Benchmarks dos caminhos quentes: indicadores, parse do gráfico, serialização e rotas.
+
+Uso:
+    python benchmarks/run.py                            # 1k, 100k e 1M barras
+    python benchmarks/run.py --sizes 1k,100k --filter indicators
+    python benchmarks/run.py --output bench.json --compare baseline.json
+
+Os resultados saem em JSON (um registro por caso e tamanho) para serem
+comparados entre execuções; com --compare o processo termina com código 1
+se algum caso ficar mais lento que a tolerância.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import numpy as np
+
+from benchmarks.synthetic import FakeChartClient, chart_result, history_frame, ohlcv, valid_bars
+
+SCHEMA_VERSION = 1
+DEFAULT_SIZES = '1k,100k,1M'
+# Rotas de ponta a ponta acima disso ficam de fora, a não ser que pedidas
+ROUTE_MAX_BARS = 100_000
+BENCH_SYMBOL = 'BENCH'
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    factor = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * factor)
+
+
+class Case:
+    """Um benchmark: `make(n)` prepara as entradas e devolve a função medida"""
+
+    def __init__(self, name, group, make, scales=True, route=False):
+        self.name = name
+        self.group = group
+        self.make = make
+        self.scales = scales
+        self.route = route
+
+
+def measure(fn, min_repeat, min_time, max_repeat=100):
+    """Executa `fn` uma vez para aquecer e depois até min_repeat vezes e min_time segundos"""
+    fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeat and (len(samples) < min_repeat or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+# --- Kernels -------------------------------------------------------------------
+
+def _indicator_cases():
+    from src.services import indicators
+    from src.services.patterns import scan
+    from src.services.signals import score_series
+
+    def bars(n):
+        return valid_bars(ohlcv(n))
+
+    def compute_series(n):
+        b = bars(n)
+        return lambda: indicators.compute_series(b)
+
+    def rsi(n):
+        close = bars(n)['close']
+        return lambda: indicators.rsi(close)
+
+    def macd(n):
+        close = bars(n)['close']
+        return lambda: indicators.macd(close)
+
+    def bollinger(n):
+        close = bars(n)['close']
+        return lambda: indicators.bollinger(close)
+
+    def stochastic(n):
+        b = bars(n)
+        return lambda: indicators.stochastic(b['high'], b['low'], b['close'])
+
+    def latest(n):
+        b = bars(n)
+        return lambda: indicators.compute_indicators(b)['latest']
+
+    def signal_scores(n):
+        b = bars(n)
+        series = indicators.compute_series(b)
+        return lambda: score_series(series, b['close'])
+
+    def patterns(n):
+        b = bars(n)
+        return lambda: scan(b)
+
+    return [
+        Case('indicators.compute_series', 'indicators', compute_series),
+        Case('indicators.rsi', 'indicators', rsi),
+        Case('indicators.macd', 'indicators', macd),
+        Case('indicators.bollinger', 'indicators', bollinger),
+        Case('indicators.stochastic', 'indicators', stochastic),
+        Case('indicators.compute_indicators', 'indicators', latest),
+        Case('signals.score_series', 'indicators', signal_scores),
+        Case('patterns.scan', 'indicators', patterns),
+    ]
+
+
+def _parse_cases():
+    from src.services.chart_parse import parse_chart
+    from src.services.quotes import quote_from_chart
+    from src.services.resample import resample
+
+    def chart(n):
+        return chart_result(ohlcv(n))
+
+    def parse(n):
+        c = chart(n)
+        return lambda: parse_chart(c)
+
+    def quote(n):
+        c = chart(n)
+        return lambda: quote_from_chart(BENCH_SYMBOL, c)
+
+    def decode(n):
+        payload = json.dumps({'chart': {'result': [chart(n)]}})
+        return lambda: json.loads(payload)
+
+    def resample_4h(n):
+        columns = valid_bars(ohlcv(n, step=3600))
+        return lambda: resample(columns, '4h', 'America/New_York', 34200)
+
+    return [
+        Case('parse.upstream_json', 'parse', decode),
+        Case('parse.parse_chart', 'parse', parse),
+        Case('parse.quote_from_chart', 'parse', quote),
+        Case('resample.60m_to_4h', 'parse', resample_4h),
+    ]
+
+
+def _serialize_cases(app):
+    from src.services.compression import compress
+    from src.services.serialize import bar_rows, columnar
+
+    def columns(n):
+        return valid_bars(ohlcv(n))
+
+    def rows(n):
+        c = columns(n)
+        return lambda: bar_rows(c)
+
+    def rows_json(n):
+        c = columns(n)
+        return lambda: app.json.dumps(bar_rows(c))
+
+    def columnar_json(n):
+        c = columns(n)
+        return lambda: app.json.dumps(columnar(c, arrays=True))
+
+    def gzip_rows(n):
+        data = app.json.dumps(bar_rows(columns(n))).encode()
+        return lambda: compress(data, 'gzip')
+
+    return [
+        Case('serialize.bar_rows', 'serialize', rows),
+        Case('serialize.rows_json', 'serialize', rows_json),
+        Case('serialize.columnar_json', 'serialize', columnar_json),
+        Case('serialize.gzip_rows', 'serialize', gzip_rows),
+    ]
+
+
+def _api_client_cases():
+    from data_api import ApiClient
+
+    class FrameClient(ApiClient):
+        """ApiClient com o histórico do yfinance trocado por um DataFrame sintético"""
+
+        def __init__(self, frame):
+            super().__init__(allow_mock=False)
+            self.frame = frame
+
+        def _ticker(self, symbol):
+            return None
+
+        def _history(self, ticker, **kwargs):
+            return self.frame
+
+    def get_market_data(interval, columnar=False, step=60):
+        def make(n):
+            client = FrameClient(history_frame(valid_bars(ohlcv(n, step=step))))
+            return lambda: client.get_market_data(BENCH_SYMBOL, interval, '1y', columnar=columnar)
+        return make
+
+    return [
+        Case('api_client.get_market_data', 'api_client', get_market_data('1m')),
+        Case('api_client.get_market_data_columnar', 'api_client', get_market_data('1m', columnar=True)),
+        Case('api_client.get_market_data_4h', 'api_client', get_market_data('4h', step=3600)),
+    ]
+
+
+def _alert_cases():
+    from src.services.alerts import AlertIndex, Rule
+
+    def index(n, symbols=1):
+        rng = np.random.default_rng(0)
+        thresholds = rng.uniform(0, 100, n).tolist()
+        return AlertIndex.build(
+            Rule(i, i % 1000, f'SYM{i % symbols}', 'price', 'crosses_above' if i % 2 else 'crosses_below',
+                 threshold, repeat=True)
+            for i, threshold in enumerate(thresholds)
+        )
+
+    def evaluate(n):
+        # `n` regras no mesmo símbolo; cada atualização cruza ~n/100k limiares
+        alerts = index(n)
+        prices = iter([50.0, 50.001] * 10**7)
+        return lambda: alerts.evaluate('SYM0', {'price': next(prices)})
+
+    def evaluate_spread(n):
+        # `n` regras em 1000 símbolos; avaliação de um símbolo que não cruza nada
+        alerts = index(n, symbols=1000)
+        prices = iter([10.0, 10.0001] * 10**7)
+        return lambda: alerts.evaluate('SYM7', {'price': next(prices)})
+
+    def build(n):
+        return lambda: index(n)
+
+    def add_remove(n):
+        # Uma regra criada e apagada num índice com `n` regras (CRUD pela API)
+        alerts = index(n)
+        rule = Rule(-1, 0, 'SYM0', 'price', 'crosses_above', 50.0)
+
+        def run():
+            alerts.add(rule)
+            alerts.remove(rule.id)
+        return run
+
+    return [
+        Case('alerts.evaluate', 'alerts', evaluate),
+        Case('alerts.evaluate_spread', 'alerts', evaluate_spread),
+        Case('alerts.build_index', 'alerts', build),
+        Case('alerts.add_remove', 'alerts', add_remove),
+    ]
+
+
+# --- Rotas de ponta a ponta ----------------------------------------------------
+
+class RouteContext:
+    """App Flask real com upstream falso, armazenamento de barras temporário e cache limpo"""
+
+    def __init__(self, app_module):
+        import src.routes.analysis as analysis
+        import src.routes.market_data as market_data
+        from src.services.bar_store import BarStore
+        from src.services.chart_cache import chart_cache
+
+        self.app = app_module.app
+        self.modules = (market_data, analysis)
+        self.cache = chart_cache
+        self.store_class = BarStore
+        self.root = tempfile.mkdtemp(prefix='bench-bars-')
+        self.originals = [(module, module.bar_store, module.client.client) for module in self.modules]
+        self.client = self.app.test_client()
+
+    def use(self, bars):
+        """Novo upstream com `bars` barras por série e armazenamento vazio"""
+        self.upstream = FakeChartClient(bars)
+        self.reset()
+
+    def reset(self):
+        self.cache.invalidate()
+        shutil.rmtree(self.root, ignore_errors=True)
+        store = self.store_class(self.root)
+        for module in self.modules:
+            module.bar_store = store
+            module.client.client = self.upstream
+
+    def get(self, url, **kwargs):
+        response = self.client.get(url, **kwargs)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: {response.status_code} {response.get_data(as_text=True)[:200]}')
+        return response
+
+    def close(self):
+        for module, store, client in self.originals:
+            module.bar_store = store
+            module.client.client = client
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def _route_cases(ctx):
+    def route(url, cold=False, headers=None):
+        def make(n):
+            ctx.use(n)
+
+            def run():
+                if cold:
+                    ctx.reset()
+                ctx.get(url, headers=headers)
+            return run
+        return make
+
+    data = f'/api/market/data/{BENCH_SYMBOL}?interval=1m&range=10y'
+    gzip_headers = {'Accept-Encoding': 'gzip'}
+    return [
+        Case('route.market_data_cold', 'routes', route(data, cold=True), route=True),
+        Case('route.market_data_warm', 'routes', route(data), route=True),
+        Case('route.market_data_warm_gzip', 'routes', route(data, headers=gzip_headers), route=True),
+        Case('route.market_data_columnar_warm', 'routes', route(data + '&format=columnar'), route=True),
+        Case('route.pattern_recognition', 'routes',
+             route(f'/api/analysis/pattern-recognition/{BENCH_SYMBOL}?interval=1m&range=10y'), route=True),
+        # Rotas de análise usam um período fixo (6 meses diários): não escalam com o tamanho
+        Case('route.indicators_series', 'routes',
+             route(f'/api/analysis/indicators/{BENCH_SYMBOL}?series=1'), scales=False, route=True),
+        Case('route.signals', 'routes', route(f'/api/analysis/signals/{BENCH_SYMBOL}'), scales=False, route=True),
+    ]
+
+
+# --- Execução ------------------------------------------------------------------
+
+def environment():
+    def version(name):
+        try:
+            return metadata.version(name)
+        except metadata.PackageNotFoundError:
+            return None
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+    except OSError:
+        commit, dirty = None, None
+    return {
+        'git_commit': commit or None,
+        'git_dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'packages': {name: version(name) for name in ('numpy', 'pandas', 'Flask', 'orjson', 'yfinance')}
+    }
+
+
+def run(sizes, name_filter=None, min_repeat=3, min_time=0.2, route_max_bars=ROUTE_MAX_BARS, log=print):
+    # Importar o app cria as tabelas e registra as rotas; o ruído dos logs fica de fora
+    import logging
+    import src.main as app_module
+    logging.getLogger().setLevel(logging.WARNING)
+
+    ctx = RouteContext(app_module)
+    cases = (_indicator_cases() + _parse_cases() + _serialize_cases(app_module.app)
+             + _api_client_cases() + _alert_cases() + _route_cases(ctx))
+    if name_filter:
+        cases = [case for case in cases if any(part in case.name for part in name_filter.split(','))]
+
+    results = []
+    try:
+        for case in cases:
+            case_sizes = sizes if case.scales else [None]
+            for n in case_sizes:
+                if case.route and n is not None and n > route_max_bars:
+                    continue
+                fn = case.make(n if n is not None else min(sizes))
+                samples = measure(fn, min_repeat, min_time)
+                median = statistics.median(samples)
+                result = {
+                    'name': case.name,
+                    'group': case.group,
+                    'bars': n,
+                    'iterations': len(samples),
+                    'min_s': min(samples),
+                    'median_s': median,
+                    'mean_s': statistics.fmean(samples),
+                    'stdev_s': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+                    'ns_per_bar': median / n * 1e9 if n else None
+                }
+                results.append(result)
+                log(f"{case.name:<40} {('-' if n is None else f'{n:,}'):>10} bars  "
+                    f"median {median * 1000:10.3f} ms  min {result['min_s'] * 1000:10.3f} ms  x{len(samples)}")
+    finally:
+        ctx.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Casos cuja mediana piorou mais que `tolerance` (fração) em relação à base"""
+    base = {(r['name'], r['bars']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        previous = base.get((result['name'], result['bars']))
+        if not previous or not previous['median_s']:
+            continue
+        ratio = result['median_s'] / previous['median_s']
+        result['baseline_median_s'] = previous['median_s']
+        result['ratio'] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='tamanhos em barras (ex.: 1k,100k,1M)')
+    parser.add_argument('--filter', help='só casos cujo nome contém algum destes trechos (separados por vírgula)')
+    parser.add_argument('--min-repeat', type=int, default=3)
+    parser.add_argument('--min-time', type=float, default=0.2, help='segundos mínimos por caso')
+    parser.add_argument('--route-max-bars', type=parse_size, default=ROUTE_MAX_BARS)
+    parser.add_argument('--output', help='arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='piora relativa aceita no --compare')
+    args = parser.parse_args(argv)
+
+    sizes = sorted(parse_size(size) for size in args.sizes.split(','))
+    np.random.seed(0)
+    log = lambda line: print(line, file=sys.stderr)
+    results = run(sizes, args.filter, args.min_repeat, args.min_time, args.route_max_bars, log=log)
+
+    report = {
+        'schema': SCHEMA_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'config': {'sizes': sizes, 'filter': args.filter, 'min_repeat': args.min_repeat,
+                   'min_time': args.min_time, 'route_max_bars': args.route_max_bars},
+        'results': results
+    }
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report['regressions'] = [(r['name'], r['bars'], round(r['ratio'], 3)) for r in regressions]
+        for r in regressions:
+            log(f"REGRESSÃO {r['name']} ({r['bars']} barras): {r['ratio']:.2f}x a base")
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Dados sintéticos para os benchmarks: barras OHLCV, respostas do gráfico e um upstream falso."""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.services.bar_store import INTERVAL_SECONDS, RANGE_SECONDS
+
+# Fim fixo das séries (múltiplo de 1 dia) para que as entradas sejam sempre as mesmas
+END = 1_700_006_400
+
+
+def ohlcv(n, step=60, seed=0, end=END, gaps=0.001):
+    """`n` barras em passeio aleatório terminando em `end`; uma fração `gaps` sem preço (NaN)"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.0005, n))
+    spread = np.abs(rng.normal(0, 0.001, n))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.integers(1_000, 1_000_000, n).astype(float)
+    missing = rng.random(n) < gaps
+    for values in (open_, high, low, close, volume):
+        values[missing] = np.nan
+    timestamps = end - step * np.arange(n - 1, -1, -1, dtype=np.int64)
+    return {'timestamp': timestamps, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+
+
+def valid_bars(columns):
+    """Só as barras completas (o que os indicadores recebem depois do parse)"""
+    valid = np.isfinite(columns['close'])
+    return {name: values[valid] for name, values in columns.items()}
+
+
+def _json_list(values):
+    """Lista como o JSON do upstream a entrega: buracos viram None"""
+    return [None if v != v else v for v in values.tolist()]
+
+
+def chart_result(columns, symbol='BENCH', interval='1m'):
+    """Um `chart.result[0]` no formato do Yahoo Finance"""
+    close = columns['close']
+    last = close[np.isfinite(close)]
+    price = float(last[-1]) if len(last) else 0.0
+    return {
+        'meta': {
+            'currency': 'USD', 'symbol': symbol, 'exchangeName': 'NMS',
+            'regularMarketPrice': price, 'chartPreviousClose': float(last[0]) if len(last) else 0.0,
+            'regularMarketTime': int(columns['timestamp'][-1]) if len(close) else 0,
+            'regularMarketVolume': 1_000_000, 'regularMarketDayHigh': price, 'regularMarketDayLow': price,
+            'timezone': 'EST', 'exchangeTimezoneName': 'America/New_York', 'dataGranularity': interval,
+            'currentTradingPeriod': {'regular': {'start': END - 23400, 'end': END}}
+        },
+        'timestamp': columns['timestamp'].tolist(),
+        'indicators': {'quote': [{name: _json_list(columns[name]) for name in ('open', 'high', 'low', 'close', 'volume')}]}
+    }
+
+
+def history_frame(columns, tz_name='America/New_York'):
+    """DataFrame no formato de yfinance.Ticker.history"""
+    index = pd.to_datetime(columns['timestamp'], unit='s', utc=True).tz_convert(tz_name)
+    return pd.DataFrame({
+        'Open': columns['open'], 'High': columns['high'], 'Low': columns['low'],
+        'Close': columns['close'], 'Volume': columns['volume']
+    }, index=index)
+
+
+class FakeChartClient:
+    """Upstream de gráficos local com a interface call_api dos clientes reais.
+
+    Cada (símbolo, intervalo) tem `bars` barras terminando no momento da
+    criação; a resposta é recortada ao período pedido e passa por
+    json.dumps/json.loads, como uma resposta HTTP de verdade.
+    """
+
+    def __init__(self, bars, latency=0.0, seed=0):
+        self.bars = bars
+        self.latency = latency
+        self.seed = seed
+        self.end = int(time.time()) // 86400 * 86400
+        self.calls = 0
+        self._series = {}
+        self._payloads = {}
+
+    def _columns(self, symbol, interval):
+        key = (symbol, interval)
+        if key not in self._series:
+            seed = self.seed + sum(map(ord, symbol))
+            self._series[key] = ohlcv(self.bars, INTERVAL_SECONDS[interval], seed=seed, end=self.end)
+        return self._series[key]
+
+    def call_api(self, api_name, query=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        symbol, interval = query['symbol'], query.get('interval', '1d')
+        range_period = query.get('range', '1mo')
+        key = (symbol, interval, range_period)
+        if key not in self._payloads:
+            columns = self._columns(symbol, interval)
+            start = self.end - RANGE_SECONDS.get(range_period, RANGE_SECONDS['10y'])
+            keep = columns['timestamp'] >= start
+            result = chart_result({name: values[keep] for name, values in columns.items()}, symbol, interval)
+            self._payloads[key] = json.dumps({'chart': {'result': [result], 'error': None}})
+        return json.loads(self._payloads[key])
@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+import tempfile
+
+# Servidor de produção: workers eventlet (compatíveis com websocket do Socket.IO)
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'eventlet')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+accesslog = '-'
+
+
+def on_starting(server):
+    # Vários workers precisam de uma fila compartilhada para repassar emits do Socket.IO;
+    # sem broker configurado, usa a fila local em arquivo (mesma máquina), num diretório
+    # privado (0700) criado agora: nome imprevisível, ninguém mais pode escrever nele
+    if server.cfg.workers > 1 and not os.environ.get('SOCKETIO_MESSAGE_QUEUE'):
+        path = tempfile.mkdtemp(prefix='analise-bot-socketio-')
+        os.environ['SOCKETIO_MESSAGE_QUEUE'] = f'file://{path}'
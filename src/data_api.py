@@ -1,17 +1,120 @@
+import os
+import logging
+import threading
+import time
+from collections import OrderedDict
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import yfinance as yf
 import random
+from src.services.serialize import columnar as columnar_format, index_strftime
+from src.services.cooperative import run_blocking
+from src.services.resample import resample
+from src.services.upstream import http_session, remaining, upstream
+from src.services.providers import FakeProvider, get_provider
+
+# `ticker.info` is a heavy extra request; market cap barely moves, so cache it for hours
+INFO_TTL = float(os.environ.get('TICKER_INFO_TTL', 6 * 3600))
+REQUEST_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 10))
+MAX_TICKERS = 512
+
+logger = logging.getLogger(__name__)
 
 class ApiClient:
-    def __init__(self):
+    # call_api name -> provider method
+    API_METHODS = {'YahooFinance/get_stock_chart': 'get_chart'}
+
+    def __init__(self, allow_mock=None, provider=None):
         self.base_url = "https://query1.finance.yahoo.com/v8/finance/chart/"
+        # Dados simulados só quando pedidos explicitamente (desenvolvimento/offline);
+        # em produção a falha sobe para o cache servir o último valor bom
+        if allow_mock is None:
+            allow_mock = os.environ.get('ALLOW_MOCK_DATA', '').lower() in ('1', 'true', 'yes')
+        self.allow_mock = allow_mock
+        # Shared keep-alive session and Ticker objects instead of a new Ticker per call
+        self.session = http_session()
+        self._tickers = OrderedDict()
+        self._info = OrderedDict()  # symbol -> (info, expires_at), bounded like _tickers
+        self._lock = threading.Lock()
+        # Chart data source (MARKET_DATA_PROVIDER: yahoo, sandbox or fake)
+        self.provider = provider if provider is not None else get_provider()
+        self._mock = None
+    
+    def call_api(self, api_name, query=None):
+        """Dispatch a named data API call to the configured provider"""
+        method = self.API_METHODS.get(api_name)
+        if method is None:
+            raise ValueError(f'Unknown API: {api_name}')
+        try:
+            return getattr(self.provider, method)(dict(query or {}))
+        except Exception as e:
+            logger.warning("Error calling %s for %s: %s", api_name, (query or {}).get('symbol'), e)
+            if not self.allow_mock:
+                raise
+            return getattr(self._mock_provider(), method)(dict(query or {}))
+    
+    def _mock_provider(self):
+        """Synthetic data used when allow_mock is set: no latency, no injected failures"""
+        if self._mock is None:
+            self._mock = FakeProvider(latency=0, jitter=0, error_rate=0, governed=False)
+        return self._mock
+    
+    def _ticker(self, symbol):
+        with self._lock:
+            ticker = self._tickers.get(symbol)
+            if ticker is None:
+                ticker = yf.Ticker(symbol, session=self.session)
+                self._tickers[symbol] = ticker
+                if len(self._tickers) > MAX_TICKERS:
+                    self._tickers.popitem(last=False)
+            else:
+                self._tickers.move_to_end(symbol)
+            return ticker
+    
+    def _history(self, ticker, **kwargs):
+        """ticker.history through the shared rate limiter, with backoff on 429/5xx"""
+        kwargs.setdefault('timeout', remaining(REQUEST_TIMEOUT))
+        return run_blocking(upstream.call, ticker.history, **kwargs)
+    
+    def _cached_info(self, symbol):
+        with self._lock:
+            cached = self._info.get(symbol)
+            if cached is None or cached[1] <= time.monotonic():
+                return None
+            self._info.move_to_end(symbol)
+            return cached[0]
+    
+    def get_info(self, symbol):
+        """Lazy, cached `ticker.info` (one upstream request per symbol every INFO_TTL seconds)"""
+        info = self._cached_info(symbol)
+        if info is not None:
+            return info
+        ticker = self._ticker(symbol)
+        info = run_blocking(upstream.call, lambda: ticker.info) or {}
+        with self._lock:
+            self._info[symbol] = (info, time.monotonic() + INFO_TTL)
+            self._info.move_to_end(symbol)
+            if len(self._info) > MAX_TICKERS:
+                self._info.popitem(last=False)
+        return info
+    
+    def get_market_cap(self, symbol):
+        try:
+            return self.get_info(symbol).get('marketCap', 0)
+        except Exception as e:
+            logger.warning("Error fetching info for %s: %s", symbol, e)
+            return 0
         
-    def get_market_data(self, symbol, interval='1d', range_period='1mo'):
-        """Get market data from Yahoo Finance"""
+    def get_market_data(self, symbol, interval='1d', range_period='1mo', columnar=False):
+        """Get market data from Yahoo Finance
+
+        With columnar=True returns {'t': [...], 'o': [...], 'h', 'l', 'c', 'v'}
+        instead of a list of per-bar dicts.
+        """
         try:
-            ticker = yf.Ticker(symbol)
+            ticker = self._ticker(symbol)
             
             # Map intervals
             interval_map = {
@@ -28,39 +131,69 @@ class ApiClient:
             yf_interval = interval_map.get(interval, '1d')
             yf_period = period_map.get(range_period, '1mo')
             
+            # yfinance has no 4h interval: fetch 1h bars and aggregate them locally
+            resample_to = None
+            if yf_interval == '4h':
+                yf_interval, resample_to = '1h', '4h'
+            
             # Get historical data
-            hist = ticker.history(period=yf_period, interval=yf_interval)
+            hist = self._history(ticker, period=yf_period, interval=yf_interval)
             
             if hist.empty:
-                return []
-            
-            # Convert to our format
-            data = []
-            for index, row in hist.iterrows():
-                data.append({
-                    'datetime': index.strftime('%Y-%m-%d %H:%M:%S'),
-                    'open': float(row['Open']),
-                    'high': float(row['High']),
-                    'low': float(row['Low']),
-                    'close': float(row['Close']),
-                    'volume': int(row['Volume']) if not pd.isna(row['Volume']) else 0
-                })
-            
-            return data
+                return {name: [] for name in ('t', 'o', 'h', 'l', 'c', 'v')} if columnar else []
+            
+            # Convert whole columns at once instead of iterating rows
+            columns = {
+                'timestamp': hist.index.asi8 // 10**9,
+                'open': hist['Open'].to_numpy(dtype=float),
+                'high': hist['High'].to_numpy(dtype=float),
+                'low': hist['Low'].to_numpy(dtype=float),
+                'close': hist['Close'].to_numpy(dtype=float),
+                'volume': hist['Volume'].to_numpy(dtype=float)
+            }
+            index = hist.index
+            if resample_to:
+                tz_name = str(index.tz) if index.tz is not None else 'UTC'
+                columns = resample(columns, resample_to, tz_name)
+                index = pd.to_datetime(columns['timestamp'], unit='s', utc=True).tz_convert(tz_name)
+            if columnar:
+                return columnar_format(columns, digits=None)
+            
+            datetimes = index_strftime(index)
+            opens, highs, lows, closes = (columns[name].tolist() for name in ('open', 'high', 'low', 'close'))
+            volumes = np.nan_to_num(columns['volume']).astype(np.int64).tolist()
+            return [
+                {
+                    'datetime': dt,
+                    'open': o,
+                    'high': h,
+                    'low': l,
+                    'close': c,
+                    'volume': v
+                }
+                for dt, o, h, l, c, v in zip(datetimes, opens, highs, lows, closes, volumes)
+            ]
             
         except Exception as e:
-            print(f"Error fetching data for {symbol}: {e}")
-            return self._generate_mock_data(symbol)
+            logger.warning("Error fetching data for %s: %s", symbol, e)
+            if not self.allow_mock:
+                raise
+            rows = self._generate_mock_data(symbol)
+            return self._mock_columnar(rows) if columnar else rows
     
-    def get_quote(self, symbol):
-        """Get current quote for symbol"""
+    def get_quote(self, symbol, include_market_cap=False):
+        """Get current quote for symbol
+
+        marketCap needs the heavy `info` request, so it is only fetched when
+        include_market_cap=True (and then cached). Otherwise the cached value
+        is used when available, and marketCap is None (unknown) when it is not.
+        """
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            hist = ticker.history(period='2d')
+            ticker = self._ticker(symbol)
+            hist = self._history(ticker, period='2d')
             
             if hist.empty:
-                return self._generate_mock_quote(symbol)
+                return self._generate_mock_quote(symbol) if self.allow_mock else None
             
             current_price = float(hist['Close'].iloc[-1])
             previous_close = float(hist['Close'].iloc[-2]) if len(hist) > 1 else current_price
@@ -77,14 +210,22 @@ class ApiClient:
                 'dayLow': float(hist['Low'].iloc[-1]),
                 'volume': int(hist['Volume'].iloc[-1]) if not pd.isna(hist['Volume'].iloc[-1]) else 0,
                 'previousClose': previous_close,
-                'marketCap': info.get('marketCap', 0),
+                'marketCap': self._market_cap(symbol, include_market_cap),
                 'timestamp': datetime.now().isoformat()
             }
             
         except Exception as e:
-            print(f"Error fetching quote for {symbol}: {e}")
+            logger.warning("Error fetching quote for %s: %s", symbol, e)
+            if not self.allow_mock:
+                raise
             return self._generate_mock_quote(symbol)
     
+    def _market_cap(self, symbol, fetch):
+        if fetch:
+            return self.get_market_cap(symbol)
+        info = self._cached_info(symbol)
+        return info.get('marketCap') if info is not None else None
+    
     def _generate_mock_data(self, symbol):
         """Generate mock market data for testing"""
         data = []
@@ -113,6 +254,16 @@ class ApiClient:
         
         return data
     
+    def _mock_columnar(self, rows):
+        """Mock rows in the same {'t', 'o', 'h', 'l', 'c', 'v'} shape as columnar=True"""
+        columns = {
+            'timestamp': np.array([int(datetime.strptime(row['datetime'], '%Y-%m-%d %H:%M:%S').timestamp())
+                                   for row in rows], dtype=np.int64)
+        }
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            columns[name] = np.array([row[name] for row in rows], dtype=float)
+        return columnar_format(columns, digits=None)
+    
     def _generate_mock_quote(self, symbol):
         """Generate mock quote data for testing"""
         base_price = 100.0 + random.uniform(-50, 50)
@@ -1,30 +1,82 @@
 import os
 import sys
+import logging
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, send_from_directory, request, g, Response
 from flask_cors import CORS
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room, leave_room, emit
 from src.models.user import db
 from src.routes.user import user_bp
-from src.routes.market_data import market_bp
-from src.routes.analysis import analysis_bp
+from src.routes.alerts import alerts_bp
+from src.routes.watchlists import watchlists_bp
+from src.routes.market_data import market_bp, fetch_quote_chart
+from src.routes.analysis import analysis_bp, build_snapshot
+from src.services.publisher import MarketPublisher
+from src.services.socket_queue import socketio_queue_options
+from src.services.chart_cache import track_data_age
+from src.services.live_candles import live_candles
+from src.services.alerts import alert_engine
+from src.services import bar_archive, compression, json_provider, metrics
+
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+# Corpo máximo das requisições (413 acima disso); a importação de barras tem limite próprio
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
 
 # Enable CORS for all routes
 CORS(app, origins="*")
 
 # Initialize SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Com vários workers, SOCKETIO_MESSAGE_QUEUE (redis://... ou file://caminho) repassa emits entre processos
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode=os.environ.get('SOCKETIO_ASYNC_MODE') or None,
+    **socketio_queue_options(os.environ.get('SOCKETIO_MESSAGE_QUEUE'))
+)
 
 # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
+app.register_blueprint(alerts_bp, url_prefix='/api')
+app.register_blueprint(watchlists_bp, url_prefix='/api')
 app.register_blueprint(market_bp, url_prefix='/api/market')
 app.register_blueprint(analysis_bp, url_prefix='/api/analysis')
 
+# JSON com orjson (arrays do numpy serializados direto), quando disponível
+json_provider.init_app(app)
+
+# Latência por rota, tempos por etapa e /metrics no formato do Prometheus
+metrics.init_app(app)
+
+# ETag/304 e gzip/brotli (registrado depois das métricas para entrar no tempo da rota)
+compression.init_app(app)
+
+# `flask export-bars` / `flask import-bars` (exportação em lote do armazenamento de barras)
+bar_archive.init_app(app)
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def start_data_age():
+    g.data_age = track_data_age()
+
+@app.after_request
+def mark_data_age(response):
+    """Marca respostas servidas do cache com a idade dos dados (e X-Data-Stale quando vencidos)"""
+    tracker = getattr(g, 'data_age', None)
+    if tracker and tracker['age'] >= 1:
+        response.headers['Age'] = str(int(tracker['age']))
+    if tracker and tracker['stale']:
+        response.headers['X-Data-Stale'] = '1'
+    return response
+
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -48,14 +100,73 @@ def serve(path):
         else:
             return "index.html not found", 404
 
+def build_market_update(symbol):
+    """Snapshot publicado para a sala de um símbolo.
+
+    A consulta leve de cotação (TTL curto) alimenta os candles ao vivo e a barra
+    do dia dos indicadores; o histórico diário continua vindo do cache.
+    """
+    quote_chart = fetch_quote_chart(symbol)
+    snapshot = build_snapshot(symbol, quote_chart=quote_chart)
+    update = {
+        'quote': snapshot['quote'],
+        'indicators': snapshot['indicators'],
+        'signal': snapshot['signal']
+    }
+    candles = live_candles.candles(symbol)
+    if candles:
+        update['candles'] = candles
+    return update
+
+# Símbolos com alertas também são consultados; cada snapshot passa pelas regras
+publisher = MarketPublisher(socketio, build_market_update,
+                            on_update=alert_engine.evaluate, extra_symbols=alert_engine.symbols)
+alert_engine.init_app(app, socketio, publisher)
+
 # SocketIO events
 @socketio.on('connect')
 def handle_connect():
-    print('Client connected')
+    logger.info('Client connected')
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print('Client disconnected')
+    publisher.drop(request.sid)
+    logger.info('Client disconnected')
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    symbol = (data or {}).get('symbol')
+    if not symbol:
+        return
+    join_room(symbol)
+    snapshot = publisher.subscribe(request.sid, symbol)
+    if snapshot is not None:
+        emit('market_update', dict(snapshot, symbol=symbol))
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    symbol = (data or {}).get('symbol')
+    if not symbol:
+        return
+    leave_room(symbol)
+    publisher.unsubscribe(request.sid, symbol)
+
+@socketio.on('subscribe_alerts')
+def handle_subscribe_alerts(data):
+    """Entra na sala `user:<id>`, para onde vão os alertas disparados do usuário"""
+    user_id = (data or {}).get('user_id')
+    if user_id is None:
+        return
+    join_room(f'user:{user_id}')
+    # Garante o ciclo de avaliação (os alertas chegam pela fila de qualquer worker)
+    publisher.start()
+
+@socketio.on('unsubscribe_alerts')
+def handle_unsubscribe_alerts(data):
+    user_id = (data or {}).get('user_id')
+    if user_id is None:
+        return
+    leave_room(f'user:{user_id}')
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from src.models.user import db, User
+
+
+class AlertRule(db.Model):
+    """Regra de alerta de um usuário: `metric` cruza `threshold` (ou a métrica `reference`)"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    symbol = db.Column(db.String(32), nullable=False)
+    metric = db.Column(db.String(32), nullable=False)
+    condition = db.Column(db.String(16), nullable=False)
+    threshold = db.Column(db.Float)
+    reference = db.Column(db.String(32))
+    repeat = db.Column(db.Boolean, nullable=False, default=False)
+    active = db.Column(db.Boolean, nullable=False, default=True, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    # Sincroniza os índices em memória dos outros workers
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now, index=True)
+    triggered_at = db.Column(db.DateTime)
+
+    user = db.relationship(User, backref=db.backref('alert_rules', lazy='dynamic', cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<AlertRule {self.id} {self.symbol} {self.metric} {self.condition}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'symbol': self.symbol,
+            'metric': self.metric,
+            'condition': self.condition,
+            'threshold': self.threshold,
+            'reference': self.reference,
+            'repeat': self.repeat,
+            'active': self.active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'triggered_at': self.triggered_at.isoformat() if self.triggered_at else None
+        }
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from src.models.user import db, User
+
+
+class Watchlist(db.Model):
+    """Lista de símbolos acompanhados por um usuário"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(80), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    user = db.relationship(User, backref=db.backref('watchlists', lazy='dynamic', cascade='all, delete-orphan'))
+    items = db.relationship('WatchlistItem', back_populates='watchlist', order_by='WatchlistItem.position',
+                            cascade='all, delete-orphan')
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'name'),)
+
+    def __repr__(self):
+        return f'<Watchlist {self.id} {self.name}>'
+
+    @property
+    def symbols(self):
+        return [item.symbol for item in self.items]
+
+    def set_symbols(self, symbols):
+        """Substitui os itens mantendo os já existentes (e sua data de inclusão)"""
+        current = {item.symbol: item for item in self.items}
+        self.items = [current.get(symbol) or WatchlistItem(symbol=symbol) for symbol in symbols]
+        for position, item in enumerate(self.items):
+            item.position = position
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'name': self.name,
+            'symbols': self.symbols,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class WatchlistItem(db.Model):
+    """Símbolo de uma watchlist, na ordem escolhida pelo usuário"""
+    id = db.Column(db.Integer, primary_key=True)
+    watchlist_id = db.Column(db.Integer, db.ForeignKey('watchlist.id'), nullable=False, index=True)
+    symbol = db.Column(db.String(32), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    added_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    watchlist = db.relationship(Watchlist, back_populates='items')
+
+    __table_args__ = (db.UniqueConstraint('watchlist_id', 'symbol'),)
+
+    def __repr__(self):
+        return f'<WatchlistItem {self.watchlist_id} {self.symbol}>'
@@ -0,0 +1,102 @@
+from flask import Blueprint, jsonify, request
+from src.models.user import User, db
+from src.models.alert import AlertRule
+from src.services.alerts import CONDITIONS, METRICS, alert_engine
+
+alerts_bp = Blueprint('alerts', __name__)
+
+MAX_RULES_PER_USER = 1000
+
+def _rule_fields(data, rule=None):
+    """Valida o corpo da requisição; levanta ValueError com a mensagem para o cliente"""
+    if not isinstance(data, dict):
+        raise ValueError('Corpo JSON inválido')
+    fields = {}
+    if rule is None or 'symbol' in data:
+        symbol = data.get('symbol')
+        if not isinstance(symbol, str) or not symbol.strip():
+            raise ValueError('Informe o símbolo')
+        fields['symbol'] = symbol.strip().upper()
+    for name in ('metric', 'reference'):
+        if name in data or (rule is None and name == 'metric'):
+            value = data.get(name)
+            if value is None and name == 'reference':
+                fields[name] = None
+            elif value not in METRICS:
+                raise ValueError(f"Métrica inválida: {value} (opções: {', '.join(METRICS)})")
+            else:
+                fields[name] = value
+    if rule is None or 'condition' in data:
+        condition = data.get('condition')
+        if condition not in CONDITIONS:
+            raise ValueError(f"Condição inválida: {condition} (opções: {', '.join(CONDITIONS)})")
+        fields['condition'] = condition
+    if 'threshold' in data:
+        threshold = data['threshold']
+        if threshold is not None and (isinstance(threshold, bool) or not isinstance(threshold, (int, float))):
+            raise ValueError('O limiar deve ser um número')
+        fields['threshold'] = None if threshold is None else float(threshold)
+    for name in ('repeat', 'active'):
+        if name in data:
+            fields[name] = bool(data[name])
+
+    # Exatamente um alvo: limiar fixo ou outra métrica
+    threshold = fields.get('threshold', rule.threshold if rule is not None else None)
+    reference = fields.get('reference', rule.reference if rule is not None else None)
+    if (threshold is None) == (reference is None):
+        raise ValueError('Informe o limiar (threshold) ou a métrica de referência (reference), não ambos')
+    metric = fields.get('metric', rule.metric if rule is not None else None)
+    if reference is not None and reference == metric:
+        raise ValueError('A referência deve ser outra métrica')
+    return fields
+
+@alerts_bp.route('/users/<int:user_id>/alerts', methods=['GET'])
+def get_alerts(user_id):
+    user = User.query.get_or_404(user_id)
+    query = user.alert_rules
+    if request.args.get('active', '').lower() in ('1', 'true'):
+        query = query.filter_by(active=True)
+    return jsonify([rule.to_dict() for rule in query.order_by(AlertRule.id)])
+
+@alerts_bp.route('/users/<int:user_id>/alerts', methods=['POST'])
+def create_alert(user_id):
+    user = User.query.get_or_404(user_id)
+    try:
+        fields = _rule_fields(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if user.alert_rules.count() >= MAX_RULES_PER_USER:
+        return jsonify({'error': f'Máximo de {MAX_RULES_PER_USER} alertas por usuário'}), 400
+
+    rule = AlertRule(user_id=user.id, **fields)
+    db.session.add(rule)
+    db.session.commit()
+    alert_engine.add(rule)
+    return jsonify(rule.to_dict()), 201
+
+@alerts_bp.route('/alerts/<int:rule_id>', methods=['GET'])
+def get_alert(rule_id):
+    rule = AlertRule.query.get_or_404(rule_id)
+    return jsonify(rule.to_dict())
+
+@alerts_bp.route('/alerts/<int:rule_id>', methods=['PUT'])
+def update_alert(rule_id):
+    rule = AlertRule.query.get_or_404(rule_id)
+    try:
+        fields = _rule_fields(request.get_json(silent=True), rule=rule)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    for name, value in fields.items():
+        setattr(rule, name, value)
+    db.session.commit()
+    alert_engine.add(rule)
+    return jsonify(rule.to_dict())
+
+@alerts_bp.route('/alerts/<int:rule_id>', methods=['DELETE'])
+def delete_alert(rule_id):
+    rule = AlertRule.query.get_or_404(rule_id)
+    db.session.delete(rule)
+    db.session.commit()
+    alert_engine.remove(rule_id)
+    return '', 204
@@ -1,52 +1,52 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
 import sys
 import os
+import shutil
+import tempfile
 sys.path.append('/opt/.manus/.sandbox-runtime')
 from data_api import ApiClient
+from src.services.chart_cache import CachedApiClient, chart_cache
+from src.services.fanout import fetch_many
+from src.services.bar_store import INTERVAL_SECONDS, RANGE_SECONDS, bar_store
+from src.services.bar_archive import EXTENSIONS, MIMETYPES, ArchiveError, export_archive, import_archive
+from src.services.live_candles import live_candles
+from src.services.resample import SOURCES, load_interval, load_stored
+from src.services.serialize import bar_rows, columnar
+from src.services.quotes import quote_from_chart
+from src.services.symbols import get_catalog, universe
+from src.services.screener import ScreenerError, parse_condition, screen
+from src.services.metrics import register_gauges, timed
+from src.services.universe_refresh import UniverseRefresher
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
 market_bp = Blueprint('market', __name__)
-client = ApiClient()
+# Chamadas de gráfico passam pelo cache compartilhado (TTL + single-flight)
+client = CachedApiClient(ApiClient())
+# O screener só lê o disco; o universo pedido é atualizado em segundo plano
+screener_refresher = UniverseRefresher(
+    bar_store, lambda query: client.call_api('YahooFinance/get_stock_chart', query=query)
+)
 
-# Cache para armazenar dados temporariamente
-market_cache = {}
+register_gauges(lambda: [
+    (f'screener_refresh_{name}', f'Atualização do universo do screener: {name}', value)
+    for name, value in screener_refresher.stats().items()
+])
+
+MAX_BATCH_SYMBOLS = 50
+MAX_SCREENER_SYMBOLS = 5000
+# Uploads de importação acima disso vão para um arquivo temporário em disco
+IMPORT_SPOOL_BYTES = 64 * 1024 * 1024
+# Tamanho máximo do upload de importação (413 acima disso)
+IMPORT_MAX_BYTES = int(os.environ.get('BAR_IMPORT_MAX_BYTES', 512 * 1024 * 1024))
 
 @market_bp.route('/symbols', methods=['GET'])
 def get_symbols():
-    """Retorna lista de símbolos disponíveis"""
-    symbols = {
-        'forex': [
-            {'symbol': 'EURUSD=X', 'name': 'EUR/USD', 'type': 'forex'},
-            {'symbol': 'GBPUSD=X', 'name': 'GBP/USD', 'type': 'forex'},
-            {'symbol': 'USDJPY=X', 'name': 'USD/JPY', 'type': 'forex'},
-            {'symbol': 'AUDUSD=X', 'name': 'AUD/USD', 'type': 'forex'},
-            {'symbol': 'USDCAD=X', 'name': 'USD/CAD', 'type': 'forex'},
-        ],
-        'stocks': [
-            {'symbol': 'AAPL', 'name': 'Apple Inc.', 'type': 'stock'},
-            {'symbol': 'GOOGL', 'name': 'Alphabet Inc.', 'type': 'stock'},
-            {'symbol': 'MSFT', 'name': 'Microsoft Corp.', 'type': 'stock'},
-            {'symbol': 'TSLA', 'name': 'Tesla Inc.', 'type': 'stock'},
-            {'symbol': 'AMZN', 'name': 'Amazon.com Inc.', 'type': 'stock'},
-        ],
-        'crypto': [
-            {'symbol': 'BTC-USD', 'name': 'Bitcoin', 'type': 'crypto'},
-            {'symbol': 'ETH-USD', 'name': 'Ethereum', 'type': 'crypto'},
-            {'symbol': 'ADA-USD', 'name': 'Cardano', 'type': 'crypto'},
-            {'symbol': 'DOT-USD', 'name': 'Polkadot', 'type': 'crypto'},
-            {'symbol': 'LINK-USD', 'name': 'Chainlink', 'type': 'crypto'},
-        ],
-        'indices': [
-            {'symbol': '^GSPC', 'name': 'S&P 500', 'type': 'index'},
-            {'symbol': '^DJI', 'name': 'Dow Jones', 'type': 'index'},
-            {'symbol': '^IXIC', 'name': 'NASDAQ', 'type': 'index'},
-            {'symbol': '^FTSE', 'name': 'FTSE 100', 'type': 'index'},
-            {'symbol': '^N225', 'name': 'Nikkei 225', 'type': 'index'},
-        ]
-    }
-    return jsonify(symbols)
+    """Retorna lista de símbolos disponíveis (destaques do catálogo; ?all=1 para todos)"""
+    featured_only = request.args.get('all', '').lower() not in ('1', 'true')
+    return jsonify(get_catalog().groups(featured_only=featured_only))
 
 @market_bp.route('/data/<symbol>', methods=['GET'])
 def get_market_data(symbol):
@@ -58,47 +58,36 @@ def get_market_data(symbol):
         # Mapear intervalos para o formato da API
         interval_map = {
             '1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m',
-            '1h': '60m', '4h': '60m', '1d': '1d', '1w': '1wk', '1M': '1mo'
+            '1h': '60m', '4h': '4h', '1d': '1d', '1w': '1wk', '1M': '1mo'
         }
         
         api_interval = interval_map.get(interval, '1d')
         
-        # Chamar a API do Yahoo Finance
-        response = client.call_api('YahooFinance/get_stock_chart', query={
-            'symbol': symbol,
-            'interval': api_interval,
-            'range': range_param,
-            'includePrePost': False,
-            'includeAdjustedClose': True
-        })
+        # Intradiário ao vivo: histórico do disco + candle montado pelas cotações, sem upstream
+        columns, meta = live_candles.load(symbol, api_interval, range_param)
         
-        if not response or 'chart' not in response:
-            return jsonify({'error': 'Dados não encontrados'}), 404
+        if columns is None:
+            # Barras servidas do armazenamento local; só o trecho final vem do upstream.
+            # 4h (e timeframes já cobertos por barras mais finas) são agregados localmente
+            columns, meta = load_interval(
+                bar_store,
+                lambda query: client.call_api('YahooFinance/get_stock_chart', query=query),
+                symbol, api_interval, range_param
+            )
             
-        chart_data = response['chart']['result'][0]
-        timestamps = chart_data['timestamp']
-        indicators = chart_data['indicators']['quote'][0]
+            if columns is None:
+                return jsonify({'error': 'Dados não encontrados'}), 404
+            
+            live_candles.track(symbol, api_interval, columns)
         
-        # Processar dados
-        data = []
-        for i, timestamp in enumerate(timestamps):
-            if (indicators['open'][i] is not None and 
-                indicators['high'][i] is not None and 
-                indicators['low'][i] is not None and 
-                indicators['close'][i] is not None):
-                
-                data.append({
-                    'timestamp': timestamp,
-                    'datetime': datetime.fromtimestamp(timestamp).isoformat(),
-                    'open': round(indicators['open'][i], 4),
-                    'high': round(indicators['high'][i], 4),
-                    'low': round(indicators['low'][i], 4),
-                    'close': round(indicators['close'][i], 4),
-                    'volume': indicators['volume'][i] if indicators['volume'][i] else 0
-                })
+        # Colunar ({'t': [...], 'o': [...], ...}) sob demanda: payload menor e parse mais rápido
+        with timed('serialize'):
+            if request.args.get('format') == 'columnar':
+                data = columnar(columns, arrays=True)
+            else:
+                data = bar_rows(columns)
         
         # Metadados
-        meta = chart_data['meta']
         result = {
             'symbol': symbol,
             'meta': {
@@ -111,142 +100,246 @@ def get_market_data(symbol):
             'data': data
         }
         
-        # Cache dos dados
-        market_cache[f"{symbol}_{interval}_{range_param}"] = result
-        
         return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def fetch_quote_chart(symbol):
+    """Gráfico diário de 1 dia (a consulta leve de cotação, com TTL curto no cache).
+
+    Toda cotação consultada alimenta os candles ao vivo do símbolo. Retorna
+    `chart.result[0]` ou None se o upstream não tiver dados.
+    """
+    response = client.call_api('YahooFinance/get_stock_chart', query={
+        'symbol': symbol,
+        'interval': '1d',
+        'range': '1d',
+        'includePrePost': False
+    })
+    
+    if not response or 'chart' not in response:
+        return None
+    
+    chart_data = response['chart']['result'][0]
+    live_candles.ingest(symbol, chart_data.get('meta') or {})
+    return chart_data
+
+def build_quote(symbol):
+    """Monta a cotação atual de um símbolo; retorna None se o upstream não tiver dados"""
+    chart_data = fetch_quote_chart(symbol)
+    
+    if chart_data is None:
+        return None
+        
+    return quote_from_chart(symbol, chart_data)
+
 @market_bp.route('/quote/<symbol>', methods=['GET'])
 def get_quote(symbol):
     """Obtém cotação atual de um símbolo"""
     try:
-        response = client.call_api('YahooFinance/get_stock_chart', query={
-            'symbol': symbol,
-            'interval': '1d',
-            'range': '1d',
-            'includePrePost': False
-        })
+        quote = build_quote(symbol)
         
-        if not response or 'chart' not in response:
+        if quote is None:
             return jsonify({'error': 'Cotação não encontrada'}), 404
-            
-        chart_data = response['chart']['result'][0]
-        meta = chart_data['meta']
-        
-        quote = {
-            'symbol': symbol,
-            'price': meta.get('regularMarketPrice', 0),
-            'currency': meta.get('currency', 'USD'),
-            'marketTime': meta.get('regularMarketTime', 0),
-            'dayHigh': meta.get('regularMarketDayHigh', 0),
-            'dayLow': meta.get('regularMarketDayLow', 0),
-            'volume': meta.get('regularMarketVolume', 0),
-            'previousClose': meta.get('chartPreviousClose', 0),
-            'change': 0,
-            'changePercent': 0
-        }
-        
-        # Calcular mudança
-        if quote['previousClose'] > 0:
-            quote['change'] = round(quote['price'] - quote['previousClose'], 4)
-            quote['changePercent'] = round((quote['change'] / quote['previousClose']) * 100, 2)
         
         return jsonify(quote)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@market_bp.route('/quotes', methods=['POST'])
+def get_quotes():
+    """Cotações de vários símbolos em uma única requisição"""
+    symbols = (request.get_json(silent=True) or {}).get('symbols') or []
+    
+    if not isinstance(symbols, list) or not symbols:
+        return jsonify({'error': 'Informe a lista de símbolos'}), 400
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        return jsonify({'error': f'Máximo de {MAX_BATCH_SYMBOLS} símbolos por requisição'}), 400
+    
+    quotes = []
+    for symbol, quote, error in fetch_many(symbols, build_quote):
+        if error is None and quote is None:
+            error = 'Cotação não encontrada'
+        quotes.append({'symbol': symbol, 'error': error} if error is not None else quote)
+    
+    return jsonify(quotes)
+
+@market_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Retorna contadores de hit/miss/eviction do cache de gráficos"""
+    return jsonify(chart_cache.stats())
+
+def _watchlist_item(symbol):
+    """Monta a entrada da watchlist de um símbolo a partir do gráfico diário"""
+    chart_data = fetch_quote_chart(symbol)
+    
+    if chart_data is None:
+        raise ValueError('Cotação não encontrada')
+    
+    meta = chart_data['meta']
+    
+    price = meta.get('regularMarketPrice', 0)
+    previous_close = meta.get('chartPreviousClose', 0)
+    change = round(price - previous_close, 4) if previous_close > 0 else 0
+    change_percent = round((change / previous_close) * 100, 2) if previous_close > 0 else 0
+    
+    return {
+        'symbol': symbol,
+        'name': meta.get('shortName', symbol),
+        'price': price,
+        'change': change,
+        'changePercent': change_percent,
+        'currency': meta.get('currency', 'USD')
+    }
+
+def watchlist_items(symbols):
+    """{símbolo: entrada da watchlist} com uma busca por símbolo distinto.
+
+    As cotações passam pelo cache compartilhado (TTL curto + single-flight): listas
+    de vários usuários com os mesmos símbolos custam uma chamada ao upstream por símbolo.
+    """
+    items = {}
+    # Busca todos os símbolos em paralelo; falhas viram marcadores de erro
+    for symbol, item, error in fetch_many(symbols, _watchlist_item):
+        items[symbol] = {'symbol': symbol, 'error': error} if error is not None else item
+    return items
+
 @market_bp.route('/watchlist', methods=['GET'])
 def get_watchlist():
-    """Retorna uma watchlist padrão com cotações"""
+    """Retorna uma watchlist padrão com cotações (as dos usuários ficam em /api/users/<id>/watchlists)"""
     default_symbols = ['AAPL', 'GOOGL', 'MSFT', 'EURUSD=X', 'BTC-USD']
-    watchlist = []
-    
-    for symbol in default_symbols:
-        try:
-            response = client.call_api('YahooFinance/get_stock_chart', query={
-                'symbol': symbol,
-                'interval': '1d',
-                'range': '1d'
-            })
-            
-            if response and 'chart' in response:
-                chart_data = response['chart']['result'][0]
-                meta = chart_data['meta']
-                
-                price = meta.get('regularMarketPrice', 0)
-                previous_close = meta.get('chartPreviousClose', 0)
-                change = round(price - previous_close, 4) if previous_close > 0 else 0
-                change_percent = round((change / previous_close) * 100, 2) if previous_close > 0 else 0
-                
-                watchlist.append({
-                    'symbol': symbol,
-                    'name': meta.get('shortName', symbol),
-                    'price': price,
-                    'change': change,
-                    'changePercent': change_percent,
-                    'currency': meta.get('currency', 'USD')
-                })
-        except:
-            continue
-    
-    return jsonify(watchlist)
+    items = watchlist_items(default_symbols)
+    
+    return jsonify([items[symbol] for symbol in default_symbols])
+
+@market_bp.route('/screener', methods=['POST'])
+def run_screener():
+    """Filtra o universo de símbolos por uma condição (ex.: rsi < 30 and close > sma_50)"""
+    payload = request.get_json(silent=True) or {}
+    symbols = payload.get('symbols') or universe(payload.get('types'))
+    interval = payload.get('interval', '1d')
+    range_period = payload.get('range', '1y')
+    
+    if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+        return jsonify({'error': 'Informe a lista de símbolos'}), 400
+    if len(symbols) > MAX_SCREENER_SYMBOLS:
+        return jsonify({'error': f'Máximo de {MAX_SCREENER_SYMBOLS} símbolos por requisição'}), 400
+    if range_period not in RANGE_SECONDS or (interval not in INTERVAL_SECONDS and interval not in SOURCES):
+        return jsonify({'error': f'Intervalo ou período inválido: {interval} / {range_period}'}), 400
+    limit = payload.get('limit')
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 1):
+        return jsonify({'error': 'limit deve ser um inteiro positivo'}), 400
+    
+    try:
+        parse_condition(payload.get('condition'))
+    except ScreenerError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # Só o que já está em disco é avaliado: buscar milhares de símbolos no
+        # upstream estouraria o prazo da requisição e o limitador. Os demais
+        # (e os já avaliados) são atualizados em segundo plano.
+        names, bar_list, pending = [], [], []
+        with timed('store'):
+            for symbol in dict.fromkeys(symbols):
+                columns, _ = load_stored(bar_store, symbol, interval, range_period)
+                if columns is None or not len(columns['close']):
+                    pending.append(symbol)
+                else:
+                    names.append(symbol)
+                    bar_list.append(columns)
+        screener_refresher.request([(symbol, interval, range_period) for symbol in dict.fromkeys(symbols)])
+        
+        with timed('compute'):
+            matches = screen(
+                names, bar_list, payload.get('condition'),
+                sort=payload.get('sort'),
+                descending=payload.get('order', 'desc') != 'asc',
+                limit=limit
+            )
+        
+        return jsonify({
+            'condition': payload.get('condition'),
+            'universe': len(symbols),
+            'evaluated': len(names),
+            'matches': matches,
+            'pending': pending,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except ScreenerError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @market_bp.route('/search', methods=['GET'])
 def search_symbols():
-    """Busca símbolos por nome ou código"""
-    query = request.args.get('q', '').upper()
+    """Busca símbolos por nome ou código (prefixo e aproximada, com filtro de tipo)"""
+    query = request.args.get('q', '')
+    types = [t for t in request.args.get('type', '').split(',') if t]
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
     
     if not query:
         return jsonify([])
     
-    # Lista expandida de símbolos para busca
-    all_symbols = [
-        # Forex
-        {'symbol': 'EURUSD=X', 'name': 'EUR/USD', 'type': 'forex'},
-        {'symbol': 'GBPUSD=X', 'name': 'GBP/USD', 'type': 'forex'},
-        {'symbol': 'USDJPY=X', 'name': 'USD/JPY', 'type': 'forex'},
-        {'symbol': 'AUDUSD=X', 'name': 'AUD/USD', 'type': 'forex'},
-        {'symbol': 'USDCAD=X', 'name': 'USD/CAD', 'type': 'forex'},
-        {'symbol': 'USDCHF=X', 'name': 'USD/CHF', 'type': 'forex'},
-        {'symbol': 'NZDUSD=X', 'name': 'NZD/USD', 'type': 'forex'},
-        {'symbol': 'EURGBP=X', 'name': 'EUR/GBP', 'type': 'forex'},
-        
-        # Stocks
-        {'symbol': 'AAPL', 'name': 'Apple Inc.', 'type': 'stock'},
-        {'symbol': 'GOOGL', 'name': 'Alphabet Inc.', 'type': 'stock'},
-        {'symbol': 'MSFT', 'name': 'Microsoft Corp.', 'type': 'stock'},
-        {'symbol': 'TSLA', 'name': 'Tesla Inc.', 'type': 'stock'},
-        {'symbol': 'AMZN', 'name': 'Amazon.com Inc.', 'type': 'stock'},
-        {'symbol': 'META', 'name': 'Meta Platforms Inc.', 'type': 'stock'},
-        {'symbol': 'NVDA', 'name': 'NVIDIA Corp.', 'type': 'stock'},
-        {'symbol': 'NFLX', 'name': 'Netflix Inc.', 'type': 'stock'},
-        
-        # Crypto
-        {'symbol': 'BTC-USD', 'name': 'Bitcoin', 'type': 'crypto'},
-        {'symbol': 'ETH-USD', 'name': 'Ethereum', 'type': 'crypto'},
-        {'symbol': 'ADA-USD', 'name': 'Cardano', 'type': 'crypto'},
-        {'symbol': 'DOT-USD', 'name': 'Polkadot', 'type': 'crypto'},
-        {'symbol': 'LINK-USD', 'name': 'Chainlink', 'type': 'crypto'},
-        {'symbol': 'LTC-USD', 'name': 'Litecoin', 'type': 'crypto'},
-        
-        # Indices
-        {'symbol': '^GSPC', 'name': 'S&P 500', 'type': 'index'},
-        {'symbol': '^DJI', 'name': 'Dow Jones', 'type': 'index'},
-        {'symbol': '^IXIC', 'name': 'NASDAQ', 'type': 'index'},
-        {'symbol': '^FTSE', 'name': 'FTSE 100', 'type': 'index'},
-        {'symbol': '^N225', 'name': 'Nikkei 225', 'type': 'index'},
-    ]
-    
-    # Filtrar símbolos que correspondem à busca
-    results = []
-    for item in all_symbols:
-        if (query in item['symbol'].upper() or 
-            query in item['name'].upper()):
-            results.append(item)
-    
-    return jsonify(results[:10])  # Limitar a 10 resultados
+    return jsonify(get_catalog().search(query, types=types, limit=limit))
+
+@market_bp.route('/export', methods=['GET'])
+def export_bars():
+    """Exporta em lote as barras gravadas (NPZ, Arrow IPC ou Parquet), em streaming"""
+    fmt = request.args.get('format', 'npz')
+    symbols = [s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    intervals = [i.strip() for i in request.args.get('intervals', '').split(',') if i.strip()]
+    flag = lambda name: request.args.get(name, '').lower() in ('1', 'true')
+
+    try:
+        series, chunks = export_archive(
+            bar_store, fmt, symbols, intervals,
+            start=request.args.get('start', type=int),
+            end=request.args.get('end', type=int),
+            indicators=flag('indicators'),
+            compress=flag('compress')
+        )
+    except ArchiveError as e:
+        return jsonify({'error': str(e)}), 400
+    if not series:
+        return jsonify({'error': 'Nenhuma série gravada para os filtros informados'}), 404
 
+    filename = f"bars-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{EXTENSIONS[fmt]}"
+    return Response(chunks, mimetype=MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename={filename}',
+        'X-Series-Count': str(len(series))
+    })
+
+@market_bp.route('/import', methods=['POST'])
+def import_bars():
+    """Pré-carrega o armazenamento de barras com um arquivo gerado pela exportação"""
+    fmt = request.args.get('format')
+    if fmt is not None and fmt not in MIMETYPES:
+        return jsonify({'error': f"Formato desconhecido: {fmt} (opções: {', '.join(MIMETYPES)})"}), 400
+
+    # Limite desta rota (maior que o padrão do app), aplicado antes de ler o corpo
+    request.max_content_length = IMPORT_MAX_BYTES
+    try:
+        upload = request.files.get('file')
+        source = upload.stream if upload is not None else request.stream
+        with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as spool:
+            shutil.copyfileobj(source, spool)
+            if not spool.tell():
+                return jsonify({'error': 'Envie o arquivo no corpo da requisição ou no campo "file"'}), 400
+            spool.seek(0)
+            summary = import_archive(bar_store, spool, fmt)
+        return jsonify({
+            'series': summary,
+            'imported': sum(item['imported'] for item in summary),
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Arquivo maior que {IMPORT_MAX_BYTES} bytes'}), 413
+    except ArchiveError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,169 @@
+from flask import Blueprint, jsonify, request
+from src.models.user import User, db
+from src.models.watchlist import Watchlist
+from src.routes.market_data import MAX_BATCH_SYMBOLS, watchlist_items
+
+watchlists_bp = Blueprint('watchlists', __name__)
+
+MAX_WATCHLISTS_PER_USER = 50
+# Uma lista cabe sempre em um lote de cotações; vários juntos também respeitam o limite
+MAX_WATCHLIST_SYMBOLS = MAX_BATCH_SYMBOLS
+MAX_SYMBOL_LENGTH = 32  # WatchlistItem.symbol
+# Listas (de qualquer usuário) resolvidas juntas em POST /watchlists/quotes
+MAX_BATCH_WATCHLISTS = 100
+
+def _symbols(value):
+    """Normaliza a lista de símbolos (maiúsculas, sem repetição, na ordem dada)"""
+    if not isinstance(value, list) or not all(isinstance(s, str) and s.strip() for s in value):
+        raise ValueError('Informe os símbolos como uma lista de textos')
+    symbols = list(dict.fromkeys(s.strip().upper() for s in value))
+    too_long = [s for s in symbols if len(s) > MAX_SYMBOL_LENGTH]
+    if too_long:
+        raise ValueError(f"Símbolo maior que {MAX_SYMBOL_LENGTH} caracteres: {too_long[0][:40]}")
+    if len(symbols) > MAX_WATCHLIST_SYMBOLS:
+        raise ValueError(f'Máximo de {MAX_WATCHLIST_SYMBOLS} símbolos por watchlist')
+    return symbols
+
+def _watchlist_fields(data, user_id, watchlist=None):
+    """Valida o corpo da requisição; levanta ValueError com a mensagem para o cliente"""
+    if not isinstance(data, dict):
+        raise ValueError('Corpo JSON inválido')
+    fields = {}
+    if watchlist is None or 'name' in data:
+        name = data.get('name')
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError('Informe o nome da watchlist')
+        fields['name'] = name.strip()[:80]
+        existing = Watchlist.query.filter_by(user_id=user_id, name=fields['name']).first()
+        if existing is not None and existing is not watchlist:
+            raise ValueError(f"Já existe uma watchlist chamada {fields['name']}")
+    if 'symbols' in data:
+        fields['symbols'] = _symbols(data['symbols'])
+    return fields
+
+def _with_quotes(watchlists):
+    """Serializa as listas com as cotações de todos os símbolos buscadas em um único lote.
+
+    Levanta ValueError se o lote passar de MAX_BATCH_SYMBOLS símbolos distintos.
+    """
+    symbols = list(dict.fromkeys(symbol for watchlist in watchlists for symbol in watchlist.symbols))
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        raise ValueError(f'As watchlists somam {len(symbols)} símbolos distintos; '
+                         f'máximo de {MAX_BATCH_SYMBOLS} por requisição')
+    items = watchlist_items(symbols)
+    result = []
+    for watchlist in watchlists:
+        data = watchlist.to_dict()
+        data['items'] = [items[symbol] for symbol in watchlist.symbols]
+        result.append(data)
+    return result
+
+def _wants_quotes(default):
+    value = request.args.get('quotes')
+    return default if value is None else value.lower() in ('1', 'true')
+
+@watchlists_bp.route('/users/<int:user_id>/watchlists', methods=['GET'])
+def get_watchlists(user_id):
+    """Watchlists do usuário (?quotes=1 inclui as cotações de todas em um só lote)"""
+    user = User.query.get_or_404(user_id)
+    watchlists = user.watchlists.order_by(Watchlist.id).all()
+    if _wants_quotes(False):
+        try:
+            return jsonify(_with_quotes(watchlists))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify([watchlist.to_dict() for watchlist in watchlists])
+
+@watchlists_bp.route('/users/<int:user_id>/watchlists', methods=['POST'])
+def create_watchlist(user_id):
+    user = User.query.get_or_404(user_id)
+    try:
+        fields = _watchlist_fields(request.get_json(silent=True), user.id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if user.watchlists.count() >= MAX_WATCHLISTS_PER_USER:
+        return jsonify({'error': f'Máximo de {MAX_WATCHLISTS_PER_USER} watchlists por usuário'}), 400
+
+    watchlist = Watchlist(user_id=user.id, name=fields['name'])
+    watchlist.set_symbols(fields.get('symbols', []))
+    db.session.add(watchlist)
+    db.session.commit()
+    return jsonify(watchlist.to_dict()), 201
+
+@watchlists_bp.route('/watchlists/<int:watchlist_id>', methods=['GET'])
+def get_watchlist(watchlist_id):
+    """Watchlist com as cotações dos símbolos (?quotes=0 só a lista)"""
+    watchlist = Watchlist.query.get_or_404(watchlist_id)
+    if _wants_quotes(True):
+        return jsonify(_with_quotes([watchlist])[0])
+    return jsonify(watchlist.to_dict())
+
+@watchlists_bp.route('/watchlists/<int:watchlist_id>', methods=['PUT'])
+def update_watchlist(watchlist_id):
+    """Renomeia e/ou substitui os símbolos (a ordem enviada é mantida)"""
+    watchlist = Watchlist.query.get_or_404(watchlist_id)
+    try:
+        fields = _watchlist_fields(request.get_json(silent=True), watchlist.user_id, watchlist=watchlist)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if 'name' in fields:
+        watchlist.name = fields['name']
+    if 'symbols' in fields:
+        watchlist.set_symbols(fields['symbols'])
+    db.session.commit()
+    return jsonify(watchlist.to_dict())
+
+@watchlists_bp.route('/watchlists/<int:watchlist_id>', methods=['DELETE'])
+def delete_watchlist(watchlist_id):
+    watchlist = Watchlist.query.get_or_404(watchlist_id)
+    db.session.delete(watchlist)
+    db.session.commit()
+    return '', 204
+
+@watchlists_bp.route('/watchlists/<int:watchlist_id>/symbols', methods=['POST'])
+def add_symbols(watchlist_id):
+    """Acrescenta símbolos ao fim da lista (os já presentes são ignorados)"""
+    watchlist = Watchlist.query.get_or_404(watchlist_id)
+    data = request.get_json(silent=True) or {}
+    try:
+        added = _symbols(data['symbols'] if 'symbols' in data else [data.get('symbol')])
+        symbols = _symbols(watchlist.symbols + added)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    watchlist.set_symbols(symbols)
+    db.session.commit()
+    return jsonify(watchlist.to_dict())
+
+@watchlists_bp.route('/watchlists/<int:watchlist_id>/symbols/<symbol>', methods=['DELETE'])
+def remove_symbol(watchlist_id, symbol):
+    watchlist = Watchlist.query.get_or_404(watchlist_id)
+    symbol = symbol.strip().upper()
+    if symbol not in watchlist.symbols:
+        return jsonify({'error': 'Símbolo não está na watchlist'}), 404
+
+    watchlist.set_symbols([s for s in watchlist.symbols if s != symbol])
+    db.session.commit()
+    return jsonify(watchlist.to_dict())
+
+@watchlists_bp.route('/watchlists/quotes', methods=['POST'])
+def get_watchlists_quotes():
+    """Cotações de várias watchlists (de um ou vários usuários), cada símbolo buscado uma vez"""
+    ids = (request.get_json(silent=True) or {}).get('ids') or []
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'error': 'Informe a lista de ids das watchlists'}), 400
+    if len(ids) > MAX_BATCH_WATCHLISTS:
+        return jsonify({'error': f'Máximo de {MAX_BATCH_WATCHLISTS} watchlists por requisição'}), 400
+
+    found = {w.id: w for w in Watchlist.query.filter(Watchlist.id.in_(ids))}
+    missing = [i for i in ids if i not in found]
+    if missing:
+        return jsonify({'error': f"Watchlists não encontradas: {', '.join(map(str, missing))}"}), 404
+
+    try:
+        return jsonify(_with_quotes([found[i] for i in dict.fromkeys(ids)]))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
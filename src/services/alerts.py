@@ -0,0 +1,385 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from src.models.alert import AlertRule
+from src.models.user import db
+from src.services.indicators import DEFAULT_PARAMS
+from src.services.metrics import register_gauges
+
+# Intervalo mínimo entre sincronizações do índice com o banco (regras criadas em outros workers)
+SYNC_INTERVAL = float(os.environ.get('ALERT_SYNC_INTERVAL', 10))
+# Uma regra com `repeat` é entregue no máximo uma vez nessa janela, por todos os workers juntos
+DEDUPE_WINDOW = float(os.environ.get('ALERT_DEDUPE_WINDOW', 10))
+
+CONDITIONS = ('crosses_above', 'crosses_below')
+
+# Métricas de um snapshot do publisher (indicadores diários com os parâmetros padrão)
+METRICS = (
+    'price', 'change_percent', 'volume', 'rsi',
+    'macd.macd', 'macd.signal', 'macd.histogram',
+    'bollinger.upper', 'bollinger.middle', 'bollinger.lower',
+    'stochastic.k', 'stochastic.d', 'avg_volume', 'current_volume'
+) + tuple(f'sma_{period}' for period in DEFAULT_PARAMS['sma_periods'])
+
+logger = logging.getLogger(__name__)
+
+
+def metric_values(update):
+    """{métrica: valor} de um snapshot do publisher ('price', 'rsi', 'bollinger.upper', ...)"""
+    quote = update.get('quote') or {}
+    values = {
+        'price': quote.get('price'),
+        'change_percent': quote.get('changePercent'),
+        'volume': quote.get('volume')
+    }
+    for name, value in (update.get('indicators') or {}).items():
+        if isinstance(value, dict):
+            for key, inner in value.items():
+                values[f'{name}.{key}'] = inner
+        else:
+            values[name] = value
+    return {
+        name: float(value) for name, value in values.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+    }
+
+
+class Rule:
+    """Cópia em memória de uma AlertRule ativa (só o que a avaliação precisa)"""
+
+    __slots__ = ('id', 'user_id', 'symbol', 'metric', 'condition', 'threshold', 'reference', 'repeat')
+
+    def __init__(self, id, user_id, symbol, metric, condition, threshold=None, reference=None, repeat=False):
+        self.id = id
+        self.user_id = user_id
+        self.symbol = symbol
+        self.metric = metric
+        self.condition = condition
+        self.threshold = threshold
+        self.reference = reference
+        self.repeat = repeat
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(model.id, model.user_id, model.symbol, model.metric, model.condition,
+                   model.threshold, model.reference, model.repeat)
+
+
+class AlertIndex:
+    """Regras indexadas por símbolo para avaliação incremental.
+
+    Regras com limiar fixo ficam em listas ordenadas por (símbolo, métrica,
+    condição): uma mudança de `anterior` para `atual` dispara exatamente os
+    limiares entre os dois, achados por duas buscas binárias. Regras contra
+    outra métrica (ex.: preço cruza a banda superior) são agrupadas por par e
+    disparam juntas quando a diferença troca de sinal. O custo de uma
+    atualização é O(métricas observadas do símbolo · log n + regras disparadas).
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self._thresholds = {}  # (símbolo, métrica, condição) -> ([limiares ordenados], [ids])
+        self._pairs = {}       # (símbolo, métrica, referência, condição) -> {ids}
+        self._watched = {}     # símbolo -> {(métrica, referência ou None): nº de regras}
+        self._last = {}        # (símbolo, métrica, referência ou None) -> último valor (ou diferença)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def symbols(self):
+        return list(self._watched)
+
+    def add(self, rule):
+        if rule.id in self.rules:
+            self.remove(rule.id)
+        self.rules[rule.id] = rule
+        if rule.reference is None:
+            thresholds, ids = self._thresholds.setdefault((rule.symbol, rule.metric, rule.condition), ([], []))
+            pos = bisect_right(thresholds, rule.threshold)
+            thresholds.insert(pos, rule.threshold)
+            ids.insert(pos, rule.id)
+        else:
+            self._pairs.setdefault((rule.symbol, rule.metric, rule.reference, rule.condition), set()).add(rule.id)
+        watched = self._watched.setdefault(rule.symbol, {})
+        key = (rule.metric, rule.reference)
+        watched[key] = watched.get(key, 0) + 1
+
+    @classmethod
+    def build(cls, rules):
+        """Índice com muitas regras de uma vez: cada lista é ordenada uma única vez
+        em vez de uma inserção ordenada por regra"""
+        index = cls()
+        pending = {}
+        for rule in rules:
+            index.rules[rule.id] = rule
+            if rule.reference is None:
+                pending.setdefault((rule.symbol, rule.metric, rule.condition), []).append((rule.threshold, rule.id))
+            else:
+                index._pairs.setdefault((rule.symbol, rule.metric, rule.reference, rule.condition), set()).add(rule.id)
+            watched = index._watched.setdefault(rule.symbol, {})
+            key = (rule.metric, rule.reference)
+            watched[key] = watched.get(key, 0) + 1
+        for key, entries in pending.items():
+            entries.sort()
+            index._thresholds[key] = ([threshold for threshold, _ in entries], [rule_id for _, rule_id in entries])
+        return index
+
+    def remove(self, rule_id):
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return None
+        if rule.reference is None:
+            key = (rule.symbol, rule.metric, rule.condition)
+            thresholds, ids = self._thresholds[key]
+            lo = bisect_left(thresholds, rule.threshold)
+            pos = ids.index(rule.id, lo, bisect_right(thresholds, rule.threshold))
+            del thresholds[pos]
+            del ids[pos]
+            if not ids:
+                del self._thresholds[key]
+        else:
+            key = (rule.symbol, rule.metric, rule.reference, rule.condition)
+            self._pairs[key].discard(rule.id)
+            if not self._pairs[key]:
+                del self._pairs[key]
+        watched = self._watched[rule.symbol]
+        key = (rule.metric, rule.reference)
+        watched[key] -= 1
+        if not watched[key]:
+            del watched[key]
+            self._last.pop((rule.symbol,) + key, None)
+            if not watched:
+                del self._watched[rule.symbol]
+        return rule
+
+    def evaluate(self, symbol, values):
+        """[(regra, valor da métrica)] que cruzaram desde a avaliação anterior do símbolo.
+
+        A primeira observação de uma métrica só registra o valor: um cruzamento
+        precisa de um antes e um depois.
+        """
+        watched = self._watched.get(symbol)
+        if not watched:
+            return []
+        fired = []
+        for metric, reference in watched:
+            value = values.get(metric)
+            if value is None:
+                continue
+            current = value
+            if reference is not None:
+                other = values.get(reference)
+                if other is None:
+                    continue
+                current = value - other
+            last_key = (symbol, metric, reference)
+            previous = self._last.get(last_key)
+            self._last[last_key] = current
+            if previous is None or previous == current:
+                continue
+
+            if reference is None:
+                condition = 'crosses_above' if current > previous else 'crosses_below'
+                entry = self._thresholds.get((symbol, metric, condition))
+                if entry is None:
+                    continue
+                thresholds, ids = entry
+                if condition == 'crosses_above':
+                    # anterior < limiar <= atual
+                    matched = ids[bisect_right(thresholds, previous):bisect_right(thresholds, current)]
+                else:
+                    # atual <= limiar < anterior
+                    matched = ids[bisect_left(thresholds, current):bisect_left(thresholds, previous)]
+            else:
+                if previous < 0 <= current:
+                    condition = 'crosses_above'
+                elif current <= 0 < previous:
+                    condition = 'crosses_below'
+                else:
+                    continue
+                matched = self._pairs.get((symbol, metric, reference, condition), ())
+            fired.extend((self.rules[rule_id], value) for rule_id in matched)
+        return fired
+
+
+class AlertEngine:
+    """Avalia as regras a cada atualização do publisher e envia os alertas disparados.
+
+    O índice em memória é carregado do banco na inicialização e sincronizado
+    periodicamente (regras criadas ou desativadas em outros workers). Todos os
+    workers avaliam as mesmas regras; cada disparo é reivindicado no banco com
+    um UPDATE condicional e só o worker que o reivindicou entrega o alerta, pela
+    fila do Socket.IO, na sala `user:<id>` (o cliente pode estar em outro
+    worker). Regras sem `repeat` são desativadas ao disparar.
+    """
+
+    def __init__(self, sync_interval=SYNC_INTERVAL, event='alert', dedupe_window=DEDUPE_WINDOW):
+        self.sync_interval = sync_interval
+        self.dedupe_window = dedupe_window
+        self.event = event
+        self.index = AlertIndex()
+        self.app = None
+        self.socketio = None
+        self.publisher = None
+        self._lock = threading.Lock()
+        self._synced_at = 0.0
+        self._watermark = None
+        self._stats = {'evaluations': 0, 'fired': 0, 'delivered': 0, 'syncs': 0, 'reloads': 0}
+
+    def init_app(self, app, socketio, publisher=None):
+        self.app = app
+        self.socketio = socketio
+        self.publisher = publisher
+        with app.app_context():
+            self.reload()
+        # Regras já gravadas valem desde a partida, sem esperar um cliente ou uma regra nova
+        if len(self.index) and publisher is not None:
+            publisher.start()
+
+    def reload(self):
+        """Recarrega todas as regras ativas do banco (precisa de app context)"""
+        rows = db.session.query(
+            AlertRule.id, AlertRule.user_id, AlertRule.symbol, AlertRule.metric, AlertRule.condition,
+            AlertRule.threshold, AlertRule.reference, AlertRule.repeat
+        ).filter(AlertRule.active.is_(True)).all()
+        watermark = db.session.query(db.func.max(AlertRule.updated_at)).scalar()
+        index = AlertIndex.build(Rule(*row) for row in rows)
+        with self._lock:
+            # Valores anteriores preservados: um cruzamento em curso não se perde
+            index._last = self.index._last
+            self.index = index
+            self._watermark = watermark
+            self._synced_at = time.monotonic()
+            self._stats['reloads'] += 1
+
+    def sync(self):
+        """Aplica as regras alteradas desde a última sincronização; recarrega tudo se
+        a contagem divergir (regras apagadas em outro worker)"""
+        query = AlertRule.query
+        if self._watermark is not None:
+            query = query.filter(AlertRule.updated_at >= self._watermark)
+        changed = query.all()
+        active = AlertRule.query.filter(AlertRule.active.is_(True)).count()
+        with self._lock:
+            for model in changed:
+                if model.active:
+                    self.index.add(Rule.from_model(model))
+                else:
+                    self.index.remove(model.id)
+                if self._watermark is None or model.updated_at > self._watermark:
+                    self._watermark = model.updated_at
+            self._synced_at = time.monotonic()
+            self._stats['syncs'] += 1
+            consistent = len(self.index) == active
+        if not consistent:
+            self.reload()
+
+    def symbols(self):
+        """Símbolos com regras ativas (o publisher os consulta mesmo sem assinantes)"""
+        if self.app is not None and time.monotonic() - self._synced_at >= self.sync_interval:
+            try:
+                with self.app.app_context():
+                    self.sync()
+            except Exception:
+                logger.exception('Error syncing alert rules')
+                self._synced_at = time.monotonic()
+        with self._lock:
+            return self.index.symbols()
+
+    def add(self, model):
+        """Regra criada/alterada neste worker: vale imediatamente, sem esperar a sincronização"""
+        with self._lock:
+            if model.active:
+                self.index.add(Rule.from_model(model))
+            else:
+                self.index.remove(model.id)
+        if model.active and self.publisher is not None:
+            self.publisher.start()
+
+    def remove(self, rule_id):
+        with self._lock:
+            self.index.remove(rule_id)
+
+    def evaluate(self, symbol, update):
+        """Avalia um snapshot do publisher; persiste e envia os alertas disparados"""
+        values = metric_values(update)
+        with self._lock:
+            self._stats['evaluations'] += 1
+            fired = self.index.evaluate(symbol, values)
+            for rule, _ in fired:
+                if not rule.repeat:
+                    self.index.remove(rule.id)
+            self._stats['fired'] += len(fired)
+        if not fired:
+            return []
+
+        now = datetime.now()
+        if self.app is not None:
+            claimed = self._claim(fired, now)
+            fired = [(rule, value) for rule, value in fired if rule.id in claimed]
+        events = []
+        for rule, value in fired:
+            event = {
+                'rule_id': rule.id,
+                'symbol': rule.symbol,
+                'metric': rule.metric,
+                'condition': rule.condition,
+                'threshold': rule.threshold,
+                'reference': rule.reference,
+                'value': value,
+                'reference_value': values.get(rule.reference) if rule.reference else None,
+                'triggered_at': now.isoformat()
+            }
+            events.append(event)
+            if self.socketio is not None:
+                # Pela fila: o worker com o socket do usuário entrega, seja qual for
+                self.socketio.emit(self.event, event, to=f'user:{rule.user_id}')
+        with self._lock:
+            self._stats['delivered'] += len(events)
+        return events
+
+    def _claim(self, fired, now):
+        """Registra os disparos no banco e devolve os ids que este worker deve entregar.
+
+        O UPDATE só afeta a regra se ela ainda estiver ativa (e, com `repeat`, se
+        não disparou dentro da janela), então entre workers que viram o mesmo
+        cruzamento exatamente um reivindica cada alerta.
+        """
+        claimed = set()
+        cutoff = now - timedelta(seconds=self.dedupe_window)
+        try:
+            with self.app.app_context():
+                for rule, _ in fired:
+                    query = AlertRule.query.filter(AlertRule.id == rule.id, AlertRule.active.is_(True))
+                    if rule.repeat:
+                        query = query.filter(db.or_(AlertRule.triggered_at.is_(None), AlertRule.triggered_at <= cutoff))
+                        changes = {'triggered_at': now}
+                    else:
+                        changes = {'triggered_at': now, 'active': False}
+                    if query.update(changes, synchronize_session=False):
+                        claimed.add(rule.id)
+                db.session.commit()
+        except Exception:
+            # Sem banco não há como coordenar: melhor um alerta duplicado que perdido
+            logger.exception('Error saving triggered alerts')
+            return {rule.id for rule, _ in fired}
+        return claimed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['rules'] = len(self.index)
+            stats['symbols'] = len(self.index.symbols())
+        return stats
+
+
+alert_engine = AlertEngine()
+
+register_gauges(lambda: [
+    (f'alerts_{name}', f'Alertas: {name}', value)
+    for name, value in alert_engine.stats().items()
+])
@@ -0,0 +1,212 @@
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.services.indicators import DEFAULT_PARAMS, compute_series
+from src.services.signals import score_series
+
+SECONDS_PER_YEAR = 365.25 * 86400
+
+# Compra quando a pontuação chega a BUY e sai quando cai a SELL; taxa por lado da operação
+DEFAULT_STRATEGY = {
+    'entry_score': 15,
+    'exit_score': -15,
+    'fee': 0.001,
+    'allow_short': False
+}
+
+MAX_GRID_SIZE = 500
+# Médias que a pontuação do sinal lê (sma_20, sma_50); sma_periods precisa incluí-las
+SIGNAL_SMA_PERIODS = (20, 50)
+# Métricas devolvidas por simulate (aceitas em rank_by)
+METRICS = ('total_return', 'cagr', 'max_drawdown', 'sharpe', 'volatility', 'trades',
+           'hit_rate', 'exposure', 'buy_hold_return', 'bars')
+WORKERS = int(os.environ.get('BACKTEST_WORKERS', 0)) or os.cpu_count() or 1
+
+_pool = None
+
+
+def positions(score, entry_score, exit_score, allow_short=False):
+    """Posição decidida no fechamento de cada barra (1 comprado, -1 vendido, 0 fora).
+
+    Entradas e saídas são eventos; entre eles a posição anterior é mantida
+    (forward fill vetorizado pelo índice do último evento).
+    """
+    target = np.full(score.shape, np.nan)
+    target[score <= exit_score] = -1.0 if allow_short else 0.0
+    target[score >= entry_score] = 1.0
+    has_event = ~np.isnan(target)
+    last_event = np.maximum.accumulate(np.where(has_event, np.arange(len(score)), -1))
+    return np.where(last_event >= 0, target[np.maximum(last_event, 0)], 0.0)
+
+
+def _max_drawdown(equity):
+    peaks = np.maximum.accumulate(equity)
+    return float(np.max(1 - equity / peaks)) if len(equity) else 0.0
+
+
+def simulate(close, timestamps, score, strategy=None):
+    """Simula a regra de posição sobre a série inteira e devolve as métricas.
+
+    A posição decidida no fechamento de t vale a partir da barra t+1 (sem
+    olhar o futuro); a taxa é cobrada sobre a variação da posição.
+    """
+    s = dict(DEFAULT_STRATEGY, **(strategy or {}))
+    close = np.asarray(close, dtype=float)
+    position = positions(score, s['entry_score'], s['exit_score'], s['allow_short'])
+
+    returns = np.zeros(close.shape)
+    returns[1:] = close[1:] / close[:-1] - 1
+    held = np.zeros(close.shape)
+    held[1:] = position[:-1]
+    turnover = np.abs(np.diff(position, prepend=0.0))
+    strategy_returns = held * returns - s['fee'] * turnover
+    equity = np.cumprod(1 + strategy_returns)
+
+    # Operações: trechos contínuos com a mesma posição não nula
+    changes = np.flatnonzero(np.diff(held, prepend=0.0) != 0)
+    starts = changes[held[changes] != 0]
+    trade_returns = np.empty(0)
+    if len(starts):
+        is_start = np.zeros(held.shape, dtype=bool)
+        is_start[starts] = True
+        trade_id = np.cumsum(is_start) - 1
+        in_trade = (held != 0) & (trade_id >= 0)
+        log_growth = np.bincount(trade_id[in_trade], weights=np.log1p(held * returns)[in_trade], minlength=len(starts))
+        # Taxa de ida e volta (a última operação pode ainda estar aberta)
+        trade_returns = np.expm1(log_growth) - 2 * s['fee']
+
+    years = (timestamps[-1] - timestamps[0]) / SECONDS_PER_YEAR if len(timestamps) > 1 else 0
+    periods_per_year = (len(close) - 1) / years if years > 0 else 252
+    total_return = float(equity[-1] - 1) if len(equity) else 0.0
+    volatility = float(np.std(strategy_returns[1:])) if len(close) > 2 else 0.0
+
+    return {
+        'total_return': round(total_return, 6),
+        'cagr': round(float((1 + total_return) ** (1 / years) - 1), 6) if years > 0 and total_return > -1 else None,
+        'max_drawdown': round(_max_drawdown(equity), 6),
+        'sharpe': round(float(np.mean(strategy_returns[1:]) / volatility * np.sqrt(periods_per_year)), 4) if volatility > 0 else None,
+        'volatility': round(float(volatility * np.sqrt(periods_per_year)), 6),
+        'trades': int(len(trade_returns)),
+        'hit_rate': round(float(np.mean(trade_returns > 0)), 4) if len(trade_returns) else None,
+        'exposure': round(float(np.mean(held != 0)), 4),
+        'buy_hold_return': round(float(close[-1] / close[0] - 1), 6) if len(close) else 0.0,
+        'bars': int(len(close))
+    }
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and np.isfinite(value)
+
+
+def _is_period(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def check_param(name, value):
+    """Valida um valor de indicador ou de estratégia; levanta ValueError com a mensagem para o cliente"""
+    if name == 'sma_periods':
+        valid = (isinstance(value, (list, tuple)) and all(_is_period(v) for v in value)
+                 and all(period in value for period in SIGNAL_SMA_PERIODS))
+        expected = 'uma lista de inteiros positivos incluindo 20 e 50 (usadas pelo sinal)'
+    elif name == 'allow_short':
+        valid, expected = isinstance(value, bool), 'true ou false'
+    elif name in ('entry_score', 'exit_score'):
+        valid, expected = _is_number(value), 'um número'
+    elif name == 'fee':
+        valid, expected = _is_number(value) and value >= 0, 'um número não negativo'
+    elif name == 'bb_std':
+        valid, expected = _is_number(value) and value > 0, 'um número positivo'
+    elif name in DEFAULT_PARAMS:
+        valid, expected = _is_period(value), 'um inteiro positivo'
+    else:
+        raise ValueError(f'Parâmetro desconhecido: {name}')
+    if not valid:
+        raise ValueError(f'{name} deve ser {expected} (recebido: {value!r:.40})')
+
+
+def expand_grid(grid):
+    """{'rsi_period': [7, 14], 'fee': [0.001]} -> lista de combinações (dicts)"""
+    if not grid:
+        return [{}]
+    names = sorted(grid)
+    values = [grid[name] if isinstance(grid[name], (list, tuple)) else [grid[name]] for name in names]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def run_symbol(bars, timestamps, combos, strategy=None):
+    """Roda todas as combinações para um símbolo, reaproveitando os indicadores entre
+    combinações que só mudam parâmetros da estratégia."""
+    results = []
+    scores = {}
+    for combo in combos:
+        indicator_params = {name: value for name, value in combo.items() if name in DEFAULT_PARAMS}
+        strategy_params = dict(strategy or {}, **{name: value for name, value in combo.items() if name in DEFAULT_STRATEGY})
+        cache_key = tuple(sorted(indicator_params.items()))
+        if cache_key not in scores:
+            series = compute_series(bars, indicator_params)
+            scores[cache_key] = score_series(series, bars['close'])
+        metrics = simulate(bars['close'], timestamps, scores[cache_key], strategy_params)
+        results.append({'params': combo, 'metrics': metrics})
+    return results
+
+
+def _run_task(args):
+    return run_symbol(*args)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: o processo do servidor tem threads (cache, publisher), fork não é seguro
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def validate_params(grid=None, strategy=None):
+    """Valida a grade e a estratégia e devolve as combinações; levanta ValueError"""
+    if grid is not None and not isinstance(grid, dict):
+        raise ValueError('grid deve ser um objeto {parâmetro: [valores]}')
+    if strategy is not None and not isinstance(strategy, dict):
+        raise ValueError('strategy deve ser um objeto {parâmetro: valor}')
+    unknown = [name for name in (grid or {}) if name not in DEFAULT_PARAMS and name not in DEFAULT_STRATEGY]
+    unknown += [name for name in (strategy or {}) if name not in DEFAULT_STRATEGY]
+    if unknown:
+        raise ValueError(f"Parâmetros desconhecidos: {', '.join(unknown)}")
+    for name, value in (strategy or {}).items():
+        check_param(name, value)
+    combos = expand_grid(grid)
+    if len(combos) > MAX_GRID_SIZE:
+        raise ValueError(f'Grade com {len(combos)} combinações (máximo {MAX_GRID_SIZE})')
+    for combo in combos:
+        for name, value in combo.items():
+            check_param(name, value)
+        if 'sma_periods' in combo:
+            combo['sma_periods'] = tuple(combo['sma_periods'])  # chave do cache de indicadores
+    return combos
+
+
+def run_backtests(symbol_bars, grid=None, strategy=None, parallel=None):
+    """Backtest de vários símbolos × grade de parâmetros.
+
+    `symbol_bars` é {símbolo: colunas (timestamp, open, ..., volume)}. Cada símbolo
+    vira uma tarefa no pool de processos; com uma única tarefa roda no próprio processo.
+    Retorna {símbolo: [{'params', 'metrics'}, ...]} na ordem da grade.
+    """
+    combos = validate_params(grid, strategy)
+
+    symbols = list(symbol_bars)
+    # Arrays comuns (não memmaps do armazenamento) para serializar para os processos
+    tasks = []
+    for symbol in symbols:
+        bars = {name: np.asarray(values) for name, values in symbol_bars[symbol].items()}
+        tasks.append((bars, bars['timestamp'], combos, strategy))
+    if parallel is None:
+        parallel = WORKERS > 1 and len(tasks) * len(combos) > 4
+    if not parallel:
+        return {symbol: _run_task(task) for symbol, task in zip(symbols, tasks)}
+
+    return dict(zip(symbols, _get_pool().map(_run_task, tasks)))
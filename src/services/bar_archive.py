@@ -0,0 +1,416 @@
+import json
+import os
+import time
+import zipfile
+
+import numpy as np
+
+from src.services.bar_store import COLUMNS, INTERVAL_SECONDS
+from src.services.indicators import compute_series
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional; sem ele só NPZ
+    pa = pq = None
+
+# Exportação/importação em lote do armazenamento de barras. O NPZ é um zip com
+# um .npy por coluna (np.load lê direto) e um manifest.json no fim; Arrow IPC
+# e Parquet têm uma linha por barra com símbolo e intervalo, e o manifesto vai
+# nos metadados do schema. Os três são gerados série a série, sem montar o
+# arquivo inteiro em memória.
+
+ARCHIVE_VERSION = 1
+MANIFEST = 'manifest.json'
+METADATA_KEY = b'analise-bot'
+MAX_SYMBOL_LENGTH = 32
+# Limites da importação (o arquivo vem de upload): cada coluna descomprimida e o manifesto
+MAX_COLUMN_BYTES = int(os.environ.get('BAR_IMPORT_MAX_COLUMN_BYTES', 64 * 1024 * 1024))
+MAX_MANIFEST_BYTES = 16 * 1024 * 1024
+
+MIMETYPES = {
+    'npz': 'application/zip',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet'
+}
+EXTENSIONS = {'npz': 'npz', 'arrow': 'arrows', 'parquet': 'parquet'}
+
+
+class ArchiveError(ValueError):
+    """Formato indisponível ou arquivo inválido"""
+
+
+def available_formats():
+    return ['npz'] + (['arrow', 'parquet'] if pa is not None else [])
+
+
+def format_for(filename):
+    """Formato pela extensão do arquivo (padrão: npz)"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    for fmt, ext in EXTENSIONS.items():
+        if extension in (ext, fmt):
+            return fmt
+    return 'npz'
+
+
+def select_series(store, symbols=None, intervals=None):
+    """(símbolo, intervalo) gravados, filtrados pelas listas informadas"""
+    symbols = set(symbols or ())
+    intervals = set(intervals or ())
+    return [
+        (symbol, interval) for symbol, interval in store.series()
+        if (not symbols or symbol in symbols) and (not intervals or interval in intervals)
+    ]
+
+
+class _ChunkSink:
+    """Arquivo só de escrita (sem seek) que acumula bytes até o gerador entregá-los"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _entry(store, symbol, interval, start=None):
+    """Descrição da série no manifesto; covered_from respeita o recorte pedido"""
+    info = store.info(symbol, interval) or {}
+    covered_from = info.get('covered_from')
+    if covered_from is not None and start is not None:
+        covered_from = max(covered_from, start)
+    return {'symbol': symbol, 'interval': interval, 'covered_from': covered_from, 'meta': info.get('meta')}
+
+
+def _read(store, symbol, interval, start, end, indicators):
+    columns = store.read(symbol, interval, start=start, end=end)
+    extra = compute_series(columns) if indicators and len(columns['timestamp']) else {}
+    return columns, extra
+
+
+def export_npz(store, series, start=None, end=None, indicators=False, compress=False):
+    """Gerador dos bytes de um .npz com as séries, entregue a cada coluna escrita"""
+    sink = _ChunkSink()
+    manifest = {'version': ARCHIVE_VERSION, 'created_at': int(time.time()), 'series': []}
+    mode = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(sink, 'w', compression=mode, allowZip64=True) as archive:
+        for symbol, interval in series:
+            columns, extra = _read(store, symbol, interval, start, end, indicators)
+            if not len(columns['timestamp']):
+                continue
+            path = f"series/{len(manifest['series'])}"
+            arrays = list(columns.items()) + [(f'indicators/{name}', values) for name, values in extra.items()]
+            for name, values in arrays:
+                with archive.open(f'{path}/{name}.npy', 'w', force_zip64=True) as f:
+                    np.lib.format.write_array(f, np.ascontiguousarray(values), allow_pickle=False)
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            entry = _entry(store, symbol, interval, start)
+            entry.update(path=path, rows=len(columns['timestamp']), indicators=list(extra))
+            manifest['series'].append(entry)
+        archive.writestr(MANIFEST, json.dumps(manifest))
+    yield sink.drain()
+
+
+def _arrow_batch(schema, symbol, interval, columns, extra):
+    rows = len(columns['timestamp'])
+    arrays = [pa.array([symbol] * rows, pa.string()), pa.array([interval] * rows, pa.string())]
+    for field in list(schema)[2:]:
+        values = columns.get(field.name, extra.get(field.name))
+        arrays.append(pa.array(np.full(rows, np.nan) if values is None else values, field.type))
+    return pa.record_batch(arrays, schema=schema)
+
+
+def export_arrow(store, series, start=None, end=None, indicators=False, parquet=False):
+    """Gerador dos bytes de um stream Arrow IPC (ou Parquet), um lote por série"""
+    if pa is None:
+        raise ArchiveError('Formato indisponível: instale pyarrow para Arrow/Parquet')
+    manifest = {'version': ARCHIVE_VERSION, 'created_at': int(time.time()),
+                'series': [_entry(store, symbol, interval, start) for symbol, interval in series]}
+    fields = [pa.field('symbol', pa.string()), pa.field('interval', pa.string())]
+    fields += [pa.field(name, pa.int64() if name == 'timestamp' else pa.float64()) for name in COLUMNS]
+    if indicators:
+        # Nomes fixos para os parâmetros padrão: calculados numa série mínima
+        sample = {name: np.zeros(1) for name in COLUMNS}
+        fields += [pa.field(name, pa.float64()) for name in compute_series(sample)]
+    schema = pa.schema(fields, metadata={METADATA_KEY: json.dumps(manifest)})
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    try:
+        for symbol, interval in series:
+            columns, extra = _read(store, symbol, interval, start, end, indicators)
+            if not len(columns['timestamp']):
+                continue
+            batch = _arrow_batch(schema, symbol, interval, columns, extra)
+            if parquet:
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_archive(store, fmt='npz', symbols=None, intervals=None, start=None, end=None,
+                   indicators=False, compress=False):
+    """(séries selecionadas, gerador de bytes) do arquivo no formato pedido"""
+    if fmt not in MIMETYPES:
+        raise ArchiveError(f"Formato desconhecido: {fmt} (opções: {', '.join(MIMETYPES)})")
+    if fmt not in available_formats():
+        raise ArchiveError('Formato indisponível: instale pyarrow para Arrow/Parquet')
+    series = select_series(store, symbols, intervals)
+    if fmt == 'npz':
+        return series, export_npz(store, series, start, end, indicators, compress)
+    return series, export_arrow(store, series, start, end, indicators, parquet=fmt == 'parquet')
+
+
+# --- Importação ----------------------------------------------------------------
+
+def _check_series(symbol, interval, columns, covered_from):
+    """Valida uma série vinda do arquivo (o upload não é confiável); levanta ArchiveError"""
+    if interval not in INTERVAL_SECONDS:
+        raise ArchiveError(f'Intervalo inválido no arquivo: {str(interval)[:40]}')
+    if (not isinstance(symbol, str) or not symbol.strip() or len(symbol) > MAX_SYMBOL_LENGTH
+            or not symbol.strip('.')):
+        raise ArchiveError(f'Símbolo inválido no arquivo: {str(symbol)[:40]}')
+    if covered_from is not None and (not isinstance(covered_from, int) or isinstance(covered_from, bool)):
+        raise ArchiveError(f'covered_from inválido para {symbol} {interval}')
+    missing = [name for name in COLUMNS if name not in columns]
+    if missing:
+        raise ArchiveError(f"Colunas ausentes para {symbol} {interval}: {', '.join(missing)}")
+    if len({len(columns[name]) for name in COLUMNS}) > 1:
+        raise ArchiveError(f'Colunas com tamanhos diferentes para {symbol} {interval}')
+
+
+def seed_series(store, symbol, interval, columns, meta=None, covered_from=None):
+    """Mescla barras importadas na série do armazenamento; as já gravadas prevalecem.
+
+    O período coberto só é estendido se o importado encostar no que já existe;
+    separados, vale o trecho mais recente (o buraco entre eles seria buscado
+    no upstream de qualquer forma). Levanta ArchiveError para séries inválidas.
+    """
+    _check_series(symbol, interval, columns, covered_from)
+    try:
+        columns = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+    except (TypeError, ValueError) as e:
+        raise ArchiveError(f'Valores inválidos para {symbol} {interval}: {e}')
+    if columns['timestamp'].ndim != 1:
+        raise ArchiveError(f'Colunas devem ser unidimensionais ({symbol} {interval})')
+    if not len(columns['timestamp']):
+        return 0
+    # Ordena e remove timestamps repetidos (fica a primeira ocorrência)
+    _, first = np.unique(columns['timestamp'], return_index=True)
+    columns = {name: values[first] for name, values in columns.items()}
+    imported = (covered_from if covered_from is not None else int(columns['timestamp'][0]),
+                int(columns['timestamp'][-1]))
+
+    existing = store.read(symbol, interval)
+    info = store.info(symbol, interval) or {}
+    if len(existing['timestamp']):
+        stored = (info.get('covered_from') if info.get('covered_from') is not None
+                  else int(existing['timestamp'][0]), int(existing['timestamp'][-1]))
+        merged = {name: np.concatenate([existing[name], columns[name]]) for name in COLUMNS}
+        _, first = np.unique(merged['timestamp'], return_index=True)
+        columns = {name: values[first] for name, values in merged.items()}
+        if imported[0] <= stored[1] and stored[0] <= imported[1]:
+            covered = min(imported[0], stored[0])
+        else:
+            covered = max(imported, stored, key=lambda span: span[1])[0]
+    else:
+        covered = imported[0]
+    store.replace(symbol, interval, columns, meta=info.get('meta') or meta, covered_from=covered)
+    return len(columns['timestamp'])
+
+
+def _npz_column(archive, member):
+    """Coluna 1-D de um .npy do NPZ; tamanhos declarados (zip e cabeçalho) conferidos antes de ler"""
+    try:
+        info = archive.getinfo(member)
+    except KeyError:
+        raise ArchiveError(f'Coluna ausente no NPZ: {member}')
+    if info.file_size > MAX_COLUMN_BYTES:
+        raise ArchiveError(f'Coluna maior que {MAX_COLUMN_BYTES} bytes no NPZ: {member}')
+    with archive.open(member) as f:
+        try:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+            elif version == (2, 0):
+                shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+            else:
+                raise ValueError(f'versão {version} do .npy não suportada')
+        except ValueError as e:
+            raise ArchiveError(f'Coluna inválida no NPZ ({member}): {e}')
+        size = shape[0] * dtype.itemsize if len(shape) == 1 else -1
+        if dtype.hasobject or size < 0 or size > info.file_size:
+            raise ArchiveError(f'Coluna inválida no NPZ: {member}')
+        data = f.read(size)
+    if len(data) != size:
+        raise ArchiveError(f'Coluna truncada no NPZ: {member}')
+    return np.frombuffer(data, dtype=dtype)
+
+
+def _npz_series(source):
+    try:
+        archive = zipfile.ZipFile(source)
+        if archive.getinfo(MANIFEST).file_size > MAX_MANIFEST_BYTES:
+            raise ValueError('manifesto grande demais')
+        manifest = json.loads(archive.read(MANIFEST))
+    except (ValueError, OSError, KeyError, zipfile.BadZipFile) as e:
+        raise ArchiveError(f'Arquivo NPZ inválido: {e}')
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('series', []), list):
+        raise ArchiveError('Manifesto do NPZ inválido')
+    with archive:
+        for entry in manifest.get('series', []):
+            if not isinstance(entry, dict) or not isinstance(entry.get('path'), str):
+                raise ArchiveError('Série inválida no manifesto do NPZ')
+            columns = {name: _npz_column(archive, f"{entry['path']}/{name}.npy") for name in COLUMNS}
+            yield entry, columns
+
+
+def _arrow_series(source, parquet=False):
+    if pa is None:
+        raise ArchiveError('Formato indisponível: instale pyarrow para Arrow/Parquet')
+    try:
+        if parquet:
+            reader = pq.ParquetFile(source)
+            schema = reader.schema_arrow
+            batches = reader.iter_batches()
+        else:
+            reader = pa.ipc.open_stream(source)
+            schema = reader.schema
+            batches = reader
+        manifest = json.loads((schema.metadata or {}).get(METADATA_KEY, b'{}'))
+    except (pa.ArrowInvalid, ValueError, OSError) as e:
+        raise ArchiveError(f'Arquivo Arrow/Parquet inválido: {e}')
+    entries = {(entry['symbol'], entry['interval']): entry for entry in manifest.get('series', [])}
+
+    # As séries vêm contíguas: cada troca de (símbolo, intervalo) fecha a anterior
+    key, parts = None, []
+    for batch in batches:
+        symbols = batch.column('symbol').to_numpy(zero_copy_only=False)
+        intervals = batch.column('interval').to_numpy(zero_copy_only=False)
+        data = {name: batch.column(name).to_numpy(zero_copy_only=False) for name in COLUMNS}
+        bounds = np.flatnonzero((symbols[1:] != symbols[:-1]) | (intervals[1:] != intervals[:-1])) + 1
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(symbols)]):
+            current = (str(symbols[lo]), str(intervals[lo]))
+            if current != key and parts:
+                yield entries.get(key, {'symbol': key[0], 'interval': key[1]}), _join(parts)
+                parts = []
+            key = current
+            parts.append({name: values[lo:hi] for name, values in data.items()})
+    if parts:
+        yield entries.get(key, {'symbol': key[0], 'interval': key[1]}), _join(parts)
+
+
+def _join(parts):
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+
+def detect_format(source):
+    """Formato pelo início do arquivo: zip (npz), PAR1 (parquet) ou stream Arrow"""
+    head = source.read(4)
+    source.seek(0)
+    if head[:2] == b'PK':
+        return 'npz'
+    if head == b'PAR1':
+        return 'parquet'
+    if head == b'\xff\xff\xff\xff':  # marcador de continuação das mensagens IPC
+        return 'arrow'
+    raise ArchiveError('Formato do arquivo não reconhecido (esperado NPZ, Arrow IPC ou Parquet)')
+
+
+def import_archive(store, source, fmt=None):
+    """Pré-carrega o armazenamento com as séries de um arquivo exportado.
+
+    `source` é um arquivo binário com seek. Retorna um resumo por série.
+    """
+    fmt = fmt or detect_format(source)
+    if fmt == 'npz':
+        series = _npz_series(source)
+    elif fmt in ('arrow', 'parquet'):
+        series = _arrow_series(source, parquet=fmt == 'parquet')
+    else:
+        raise ArchiveError(f"Formato desconhecido: {fmt} (opções: {', '.join(MIMETYPES)})")
+
+    summary = []
+    for entry, columns in series:
+        rows = seed_series(store, entry['symbol'], entry['interval'], columns,
+                           meta=entry.get('meta'), covered_from=entry.get('covered_from'))
+        summary.append({'symbol': entry['symbol'], 'interval': entry['interval'],
+                        'imported': len(columns['timestamp']), 'rows': rows})
+    return summary
+
+
+def init_app(app):
+    """Comandos `flask export-bars` e `flask import-bars` sobre o armazenamento de barras"""
+    import click
+
+    from src.services.bar_store import bar_store
+
+    def split(value):
+        return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+    @app.cli.command('export-bars')
+    @click.argument('output', type=click.Path(dir_okay=False))
+    @click.option('--symbols', help='Símbolos separados por vírgula (padrão: todos os gravados)')
+    @click.option('--intervals', help='Intervalos separados por vírgula (padrão: todos)')
+    @click.option('--format', 'fmt', type=click.Choice(list(MIMETYPES)), help='Padrão: pela extensão')
+    @click.option('--start', type=int, help='Epoch inicial')
+    @click.option('--end', type=int, help='Epoch final')
+    @click.option('--indicators', is_flag=True, help='Inclui as séries completas dos indicadores')
+    @click.option('--compress', is_flag=True, help='Comprime as colunas do NPZ (deflate)')
+    def export_bars(output, symbols, intervals, fmt, start, end, indicators, compress):
+        """Exporta as séries do armazenamento de barras para OUTPUT"""
+        try:
+            symbols = [symbol.upper() for symbol in split(symbols) or ()]
+            series, chunks = export_archive(bar_store, fmt or format_for(output), symbols,
+                                            split(intervals), start, end, indicators, compress)
+            with open(output, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        except ArchiveError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'{len(series)} séries exportadas para {output}')
+
+    @app.cli.command('import-bars')
+    @click.argument('source', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(list(MIMETYPES)), help='Padrão: detectado pelo conteúdo')
+    def import_bars(source, fmt):
+        """Importa um arquivo exportado para o armazenamento de barras"""
+        try:
+            with open(source, 'rb') as f:
+                summary = import_archive(bar_store, f, fmt)
+        except ArchiveError as e:
+            raise click.ClickException(str(e))
+        for item in summary:
+            click.echo(f"{item['symbol']} {item['interval']}: {item['imported']} barras importadas, {item['rows']} no total")
+        click.echo(f'{len(summary)} séries importadas')
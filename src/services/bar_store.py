@@ -0,0 +1,348 @@
+import fcntl
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from src.services.chart_parse import parse_chart
+
+# Armazenamento local de candles: um diretório por (símbolo, intervalo) com
+# segmentos imutáveis, cada um com um arquivo .npy por coluna lido via memmap.
+COLUMNS = {
+    'timestamp': np.int64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64
+}
+
+INTERVAL_SECONDS = {
+    '1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800,
+    '60m': 3600, '90m': 5400, '1h': 3600, '1d': 86400,
+    '5d': 5 * 86400, '1wk': 7 * 86400, '1mo': 31 * 86400, '3mo': 92 * 86400
+}
+
+# Períodos aceitos pelo upstream, do menor para o maior
+RANGE_SECONDS = {
+    '1d': 86400, '5d': 5 * 86400, '1mo': 31 * 86400, '3mo': 92 * 86400,
+    '6mo': 183 * 86400, '1y': 366 * 86400, '2y': 731 * 86400,
+    '5y': 1827 * 86400, '10y': 3653 * 86400
+}
+
+MAX_SEGMENTS = 16
+# Séries com segmentos mapeados em memória ao mesmo tempo (descritores e mapas do processo)
+MAX_OPEN_SERIES = int(os.environ.get('BAR_STORE_MAX_OPEN_SERIES', 256))
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'bars')
+
+
+def _safe_name(value):
+    """Nome de diretório para um símbolo/intervalo; ponto inicial também é escapado ('.', '..')"""
+    return re.sub(r'^\.|[^A-Za-z0-9._-]', lambda m: '%%%02X' % ord(m.group()), value)
+
+
+def _unsafe_name(value):
+    return re.sub(r'%([0-9A-F]{2})', lambda m: chr(int(m.group(1), 16)), value)
+
+
+def empty_columns():
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+
+def _slice(columns, mask_or_slice):
+    return {name: values[mask_or_slice] for name, values in columns.items()}
+
+
+def _concat(parts):
+    if not parts:
+        return empty_columns()
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+
+class BarStore:
+    """Séries OHLCV em disco, append-only, lidas por memmap sem criar objetos por barra"""
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get('BAR_STORE_DIR', DEFAULT_ROOT)
+        self._locks = {}
+        self._segments = OrderedDict()  # diretório da série -> {nome do segmento: colunas memmap} (LRU)
+        self._lock = threading.Lock()
+
+    def _dir(self, symbol, interval):
+        if not symbol or not interval:
+            raise ValueError('Símbolo e intervalo são obrigatórios')
+        return os.path.join(self.root, _safe_name(symbol), _safe_name(interval))
+
+    @contextmanager
+    def _series_lock(self, path):
+        """Exclusão mútua na escrita da série entre threads e entre processos (workers do gunicorn)"""
+        with self._lock:
+            lock = self._locks.setdefault(path, threading.Lock())
+        with lock:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, '.lock'), 'a') as f:
+                # Sem bloquear o hub do eventlet: tenta de novo com sleep cooperativo
+                while True:
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        time.sleep(0.005)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _open_segments(self, path):
+        """Segmentos atuais da série; segmentos são imutáveis e ficam mapeados em memória"""
+        try:
+            names = sorted(n for n in os.listdir(path) if n.startswith('seg-'))
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            cached = self._segments.get(path)
+            if cached is None:
+                cached = self._segments[path] = {}
+                while len(self._segments) > MAX_OPEN_SERIES:
+                    self._segments.popitem(last=False)  # memmaps fecham quando ninguém mais os usa
+            self._segments.move_to_end(path)
+            for name in list(cached):
+                if name not in names:
+                    del cached[name]
+        segments = []
+        for name in names:
+            columns = cached.get(name)
+            if columns is None:
+                try:
+                    columns = {
+                        column: np.load(os.path.join(path, name, column + '.npy'), mmap_mode='r')
+                        for column in COLUMNS
+                    }
+                except (FileNotFoundError, ValueError):
+                    continue  # segmento removido por uma compactação concorrente
+                cached[name] = columns
+            if len(columns['timestamp']):
+                segments.append(columns)
+        segments.sort(key=lambda columns: int(columns['timestamp'][0]))
+        return segments
+
+    def read(self, symbol, interval, start=None, end=None):
+        """Colunas com timestamp em [start, end]; cada segmento é fatiado por busca binária"""
+        parts = []
+        for columns in self._open_segments(self._dir(symbol, interval)):
+            t = columns['timestamp']
+            lo = 0 if start is None else int(np.searchsorted(t, start, side='left'))
+            hi = len(t) if end is None else int(np.searchsorted(t, end, side='right'))
+            if hi > lo:
+                parts.append(_slice(columns, slice(lo, hi)))
+        result = _concat(parts)
+        t = result['timestamp']
+        if len(parts) > 1 and len(t) > 1 and not np.all(t[1:] > t[:-1]):
+            # Segmentos sobrepostos (escritas concorrentes ou compactação em curso)
+            _, first = np.unique(t, return_index=True)
+            result = _slice(result, first)
+        return result
+
+    def info(self, symbol, interval):
+        path = os.path.join(self._dir(symbol, interval), 'meta.json')
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def last_timestamp(self, symbol, interval):
+        segments = self._open_segments(self._dir(symbol, interval))
+        if not segments:
+            return None
+        return max(int(columns['timestamp'][-1]) for columns in segments)
+
+    def _write_json(self, path, data):
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _write_segment(self, path, columns):
+        tmp = os.path.join(path, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(tmp)
+        for name, dtype in COLUMNS.items():
+            np.save(os.path.join(tmp, name + '.npy'), np.ascontiguousarray(columns[name], dtype=dtype))
+        existing = [int(n[4:]) for n in os.listdir(path) if n.startswith('seg-')]
+        seq = max(existing, default=0) + 1
+        while True:
+            try:
+                os.rename(tmp, os.path.join(path, 'seg-%08d' % seq))
+                return
+            except OSError:
+                seq += 1  # outro processo gravou o mesmo número
+
+    def append(self, symbol, interval, columns, meta=None, covered_from=None, provisional=False):
+        """Acrescenta as barras mais novas que a última gravada como um novo segmento.
+
+        `provisional` marca as barras como aproximadas (candles montados pelas
+        cotações): o trecho a partir de `provisional_from` no meta.json é trocado
+        pelas barras do upstream no próximo append normal que o cubra.
+        """
+        path = self._dir(symbol, interval)
+        with self._series_lock(path):
+            info = self.info(symbol, interval)
+            pending = (info or {}).get('provisional_from')
+            t = columns['timestamp']
+            settled = not provisional and pending is not None and len(t) > 0 and int(t[0]) <= pending
+            if settled:
+                pending = self._splice(path, _slice(columns, t >= pending), pending, int(t[-1]))
+                written = True
+            else:
+                last = self.last_timestamp(symbol, interval)
+                if last is not None and len(t):
+                    columns = _slice(columns, t > last)
+                written = len(columns['timestamp']) > 0
+                if written:
+                    self._write_segment(path, columns)
+
+            if info is not None and not written and covered_from is None:
+                return
+            info = info or {}
+            if settled:
+                # Barras gravadas depois do trecho buscado continuam marcadas
+                info.pop('provisional_from')
+                if pending is not None:
+                    info['provisional_from'] = pending
+            elif provisional and written:
+                first = int(columns['timestamp'][0])
+                info['provisional_from'] = min(first, pending) if pending is not None else first
+            if meta is not None:
+                info['meta'] = meta
+            if covered_from is not None:
+                info['covered_from'] = min(covered_from, info.get('covered_from', covered_from))
+            info['updated_at'] = int(time.time())
+            self._write_json(os.path.join(path, 'meta.json'), info)
+
+            if len(self._open_segments(path)) > MAX_SEGMENTS:
+                self._compact(symbol, interval, path)
+
+    def _splice(self, path, columns, start, end):
+        """Troca as barras com timestamp em [start, end] pelas colunas dadas (chamado com o lock da série).
+
+        Devolve o primeiro timestamp gravado depois de `end` (None se não houver).
+        """
+        old, before, after = [], [], []
+        for name in sorted(n for n in os.listdir(path) if n.startswith('seg-')):
+            t = np.load(os.path.join(path, name, 'timestamp.npy'), mmap_mode='r')
+            if not len(t) or t[-1] < start:
+                continue
+            old.append(name)
+            segment = {column: np.load(os.path.join(path, name, column + '.npy'), mmap_mode='r')
+                       for column in COLUMNS}
+            before.append(_slice(segment, segment['timestamp'] < start))
+            after.append(_slice(segment, segment['timestamp'] > end))
+        after = [part for part in after if len(part['timestamp'])]
+        merged = _concat([part for part in before if len(part['timestamp'])] + [columns] + after)
+        if len(merged['timestamp']):
+            self._write_segment(path, merged)
+        for name in old:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        return min((int(part['timestamp'][0]) for part in after), default=None)
+
+    def replace(self, symbol, interval, columns, meta=None, covered_from=None):
+        """Substitui toda a série (usado quando o período pedido vai além do que está em disco)"""
+        path = self._dir(symbol, interval)
+        with self._series_lock(path):
+            old = [n for n in os.listdir(path) if n.startswith('seg-')]
+            if len(columns['timestamp']):
+                self._write_segment(path, columns)
+            for name in old:
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+            info = {'meta': meta, 'covered_from': covered_from, 'updated_at': int(time.time())}
+            self._write_json(os.path.join(path, 'meta.json'), info)
+
+    def _compact(self, symbol, interval, path):
+        old = [n for n in os.listdir(path) if n.startswith('seg-')]
+        merged = self.read(symbol, interval)
+        self._write_segment(path, {name: np.array(values) for name, values in merged.items()})
+        for name in old:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    def series(self):
+        """Lista (símbolo, intervalo) das séries gravadas"""
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for symbol_dir in sorted(os.listdir(self.root)):
+            for interval_dir in sorted(os.listdir(os.path.join(self.root, symbol_dir))):
+                result.append((_unsafe_name(symbol_dir), _unsafe_name(interval_dir)))
+        return result
+
+
+def _tail_range(seconds, requested_range):
+    """Menor período do upstream que cobre `seconds`, limitado ao período pedido"""
+    limit = RANGE_SECONDS[requested_range]
+    for name, span in RANGE_SECONDS.items():
+        if span >= limit:
+            break
+        if span >= seconds:
+            return name
+    return requested_range
+
+
+def load_bars(store, fetch_chart, symbol, interval, range_period, prepost=False):
+    """Serve o período do disco e busca no upstream apenas o trecho que falta.
+
+    `fetch_chart(query)` devolve a resposta do gráfico. Só barras já fechadas
+    são persistidas; a barra em formação vem sempre da busca mais recente.
+    Retorna (colunas, meta) ou (None, None) se o upstream não tiver dados.
+    """
+    query = {'symbol': symbol, 'interval': interval, 'includePrePost': prepost}
+    if range_period not in RANGE_SECONDS or interval not in INTERVAL_SECONDS or prepost:
+        response = fetch_chart(dict(query, range=range_period))
+        if not response or 'chart' not in response:
+            return None, None
+        chart_data = response['chart']['result'][0]
+        return parse_chart(chart_data)[0], chart_data.get('meta', {})
+
+    now = int(time.time())
+    start = now - RANGE_SECONDS[range_period]
+    step = INTERVAL_SECONDS[interval]
+    info = store.info(symbol, interval)
+    last = store.last_timestamp(symbol, interval)
+    full = info is None or last is None or info.get('covered_from') is None or info['covered_from'] > start
+
+    # Barras provisórias (candles ao vivo) são buscadas de novo para serem trocadas pelas do upstream
+    since = last if full or info.get('provisional_from') is None else min(last, info['provisional_from'])
+    fetch_range = range_period if full else _tail_range(now - since + step, range_period)
+    response = fetch_chart(dict(query, range=fetch_range))
+    if not response or 'chart' not in response:
+        return None, None
+    chart_data = response['chart']['result'][0]
+    meta = chart_data.get('meta', {})
+    fetched, _ = parse_chart(chart_data)
+
+    # A resposta pode vir do cache: fechada é a barra que já tinha terminado quando o upstream respondeu
+    as_of = meta.get('regularMarketTime')
+    as_of = min(now, as_of) if isinstance(as_of, (int, float)) and as_of > 0 else now
+    closed = _slice(fetched, fetched['timestamp'] + step <= as_of)
+    if full:
+        store.replace(symbol, interval, closed, meta=meta, covered_from=start)
+        return _slice(fetched, fetched['timestamp'] >= start), meta
+
+    if fetch_range == range_period:
+        store.append(symbol, interval, closed, meta=meta)
+        return _slice(fetched, fetched['timestamp'] >= start), meta
+
+    store.append(symbol, interval, closed, meta=meta)
+    stored = store.read(symbol, interval, start=start)
+    newest = stored['timestamp'][-1] if len(stored['timestamp']) else -1
+    return _concat([stored, _slice(fetched, fetched['timestamp'] > newest)]), meta
+
+
+bar_store = BarStore()
@@ -0,0 +1,299 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.services.cooperative import run_blocking
+from src.services.fanout import CALL_TIMEOUT
+from src.services.metrics import register_gauges, timed
+from src.services.upstream import remaining
+
+CHART_API = 'YahooFinance/get_stock_chart'
+
+# TTL (segundos) por intervalo do gráfico; barras mais finas mudam mais rápido
+DEFAULT_TTLS = {
+    '1m': 15, '2m': 30, '5m': 60, '15m': 120, '30m': 300,
+    '60m': 300, '90m': 600, '1h': 300, '1d': 60, '5d': 600,
+    '1wk': 900, '1mo': 1800, '3mo': 3600
+}
+DEFAULT_TTL = 60
+# Gráfico diário de 1 dia = consulta de cotação: TTL curto, é a fonte dos candles ao vivo
+QUOTE_TTL = float(os.environ.get('QUOTE_CACHE_TTL', 5))
+
+logger = logging.getLogger(__name__)
+
+
+def chart_cache_key(query):
+    """Normaliza a query do gráfico em uma chave (symbol, interval, range, prepost)"""
+    return (
+        query['symbol'],
+        query.get('interval', '1d'),
+        query.get('range', '1mo'),
+        bool(query.get('includePrePost', False))
+    )
+
+
+def canonical_chart_query(key):
+    """Query enviada ao upstream para uma chave; sempre pede adjclose para servir todas as rotas"""
+    symbol, interval, range_period, prepost = key
+    return {
+        'symbol': symbol,
+        'interval': interval,
+        'range': range_period,
+        'includePrePost': prepost,
+        'includeAdjustedClose': True
+    }
+
+
+class _Flight:
+    """Carregamento em andamento compartilhado pelas requisições concorrentes da mesma chave"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _Entry:
+    def __init__(self, value, ttl, loader):
+        now = time.monotonic()
+        self.value = value
+        self.stored_at = now
+        self.expires_at = now + ttl
+        self.loader = loader
+        self.last_access = now
+
+
+# Rastreador de idade dos dados servidos na requisição atual (ver track_data_age)
+_data_age = contextvars.ContextVar('chart_data_age', default=None)
+
+
+def track_data_age():
+    """Inicia o rastreamento da idade dos dados para a requisição atual e devolve o registro"""
+    tracker = {'age': 0.0, 'stale': False}
+    _data_age.set(tracker)
+    return tracker
+
+
+def _record_age(age, stale):
+    tracker = _data_age.get()
+    if tracker is not None:
+        tracker['age'] = max(tracker['age'], age)
+        tracker['stale'] = tracker['stale'] or stale
+
+
+class ChartCache:
+    """Cache LRU com TTL por intervalo, single-flight e stale-while-revalidate.
+
+    Entradas vencidas continuam sendo servidas na hora (até `max_stale`
+    segundos) enquanto uma atualização roda em segundo plano; se o upstream
+    falhar, o último valor bom (dentro do mesmo limite) é devolvido. Quem
+    espera a carga de outra requisição desiste após `wait_timeout`. Um
+    agendador atualiza as chaves acessadas recentemente pouco antes de vencerem.
+    """
+
+    def __init__(self, max_entries=512, ttls=None, default_ttl=DEFAULT_TTL,
+                 max_stale=3600, refresh_ahead=0.2, refresh_workers=4, quote_ttl=QUOTE_TTL,
+                 wait_timeout=CALL_TIMEOUT):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.quote_ttl = quote_ttl
+        self.max_stale = max_stale
+        self.wait_timeout = wait_timeout
+        self.refresh_ahead = refresh_ahead
+        self._entries = OrderedDict()  # key -> _Entry
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='chart-refresh')
+        self._scheduler = None
+        self._stats = {
+            'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0, 'loads': 0,
+            'load_errors': 0, 'stale_if_error': 0, 'wait_timeouts': 0, 'refreshes': 0,
+            'scheduled_refreshes': 0, 'evictions': 0, 'expirations': 0
+        }
+
+    def ttl_for(self, interval, range_period=None):
+        if interval == '1d' and range_period == '1d':
+            return self.quote_ttl
+        return self.ttls.get(interval, self.default_ttl)
+
+    def get_or_load(self, key, loader):
+        """Retorna o valor em cache ou chama `loader()` uma única vez para todos os concorrentes"""
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None:
+                age = now - entry.stored_at
+                if entry.expires_at > now or now - entry.expires_at <= self.max_stale:
+                    self._entries.move_to_end(key)
+                    entry.last_access = now
+                    stale = entry.expires_at <= now
+                    if stale:
+                        self._stats['stale_hits'] += 1
+                        self._start_refresh(key, loader)
+                    else:
+                        self._stats['hits'] += 1
+                    _record_age(age, stale)
+                    return entry.value
+                self._stats['expirations'] += 1
+
+            self._stats['misses'] += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            # Carga travada no upstream não prende os seguidores além do timeout da chamada
+            if not flight.done.wait(remaining(self.wait_timeout)):
+                with self._lock:
+                    self._stats['wait_timeouts'] += 1
+                raise TimeoutError('timeout')
+            if flight.error is not None:
+                raise flight.error
+            _record_age(0.0, False)
+            return flight.value
+
+        try:
+            value = self._load(key, loader, flight)
+        except Exception:
+            # Upstream falhou: melhor um valor antigo do que nenhum, até max_stale
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None or time.monotonic() - entry.expires_at > self.max_stale:
+                    raise
+                self._stats['stale_if_error'] += 1
+                _record_age(time.monotonic() - entry.stored_at, True)
+                return entry.value
+        _record_age(0.0, False)
+        return value
+
+    def _load(self, key, loader, flight):
+        try:
+            value = loader()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._stats['load_errors'] += 1
+                del self._inflight[key]
+            flight.done.set()
+            raise
+
+        flight.value = value
+        with self._lock:
+            self._stats['loads'] += 1
+            # Respostas vazias não são guardadas para não fixar falhas do upstream
+            if value:
+                self._store(key, value, loader)
+            del self._inflight[key]
+        flight.done.set()
+        return value
+
+    def _start_refresh(self, key, loader):
+        """Agenda a atualização de uma chave em segundo plano (chamado com o lock)"""
+        if key in self._inflight:
+            return
+        flight = _Flight()
+        self._inflight[key] = flight
+        self._stats['refreshes'] += 1
+
+        def refresh():
+            try:
+                self._load(key, loader, flight)
+            except Exception:
+                pass  # o valor antigo continua em cache
+
+        self._refresher.submit(contextvars.Context().run, refresh)
+
+    def _store(self, key, value, loader):
+        self._entries[key] = _Entry(value, self.ttl_for(key[1], key[2]), loader)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+        if self._scheduler is None:
+            self._scheduler = threading.Thread(target=self._schedule, name='chart-cache-scheduler', daemon=True)
+            self._scheduler.start()
+
+    def refresh_due(self):
+        """Atualiza chaves quentes (acessadas dentro do último TTL) prestes a vencer"""
+        with self._lock:
+            now = time.monotonic()
+            due = 0
+            for key, entry in self._entries.items():
+                ttl = entry.expires_at - entry.stored_at
+                if (entry.expires_at - now <= ttl * self.refresh_ahead and
+                        now - entry.last_access <= ttl and
+                        entry.last_access > entry.stored_at and
+                        key not in self._inflight):
+                    self._start_refresh(key, entry.loader)
+                    self._stats['scheduled_refreshes'] += 1
+                    due += 1
+            return due
+
+    def _schedule(self):
+        while True:
+            time.sleep(1)
+            try:
+                self.refresh_due()
+            except Exception:
+                logger.exception('Error refreshing chart cache')
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+            stats['inflight'] = len(self._inflight)
+        stats['max_entries'] = self.max_entries
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0
+        return stats
+
+
+# Instância única compartilhada por todos os blueprints
+chart_cache = ChartCache(
+    max_entries=int(os.environ.get('CHART_CACHE_MAX_ENTRIES', 512)),
+    max_stale=int(os.environ.get('CHART_CACHE_MAX_STALE', 3600))
+)
+
+register_gauges(lambda: [
+    (f'chart_cache_{name}', f'Cache de gráficos: {name}', value)
+    for name, value in chart_cache.stats().items()
+])
+
+
+class CachedApiClient:
+    """Envolve o ApiClient e roteia as chamadas de gráfico pelo cache compartilhado"""
+
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache or chart_cache
+
+    def call_api(self, api_name, query=None):
+        if api_name != CHART_API or not query or 'symbol' not in query:
+            return self.client.call_api(api_name, query=query)
+
+        key = chart_cache_key(query)
+
+        def load():
+            with timed('upstream'):
+                return run_blocking(self.client.call_api, CHART_API, query=canonical_chart_query(key))
+
+        return self.cache.get_or_load(key, load)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -0,0 +1,48 @@
+from array import array
+
+import numpy as np
+
+from src.services.metrics import timed
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+FIELDS = PRICE_FIELDS + ('volume',)
+
+
+def _column(values, n):
+    """Lista do JSON -> float64 com None como NaN (conversão em C, sem laço Python)"""
+    if values is None:
+        return np.full(n, np.nan)
+    values = values[:n] if len(values) > n else values
+    try:
+        # Caminho rápido para listas sem buracos (a maioria); com None cai no np.array
+        column = np.frombuffer(array('d', values), dtype=float)
+    except TypeError:
+        column = np.array(values, dtype=float)
+    if len(column) < n:
+        column = np.concatenate([column, np.full(n - len(column), np.nan)])
+    return column
+
+
+def parse_chart(chart_data):
+    """`chart.result[0]` do upstream -> (colunas alinhadas, máscara de validade).
+
+    Todos os campos são convertidos juntos e filtrados pela mesma máscara: uma
+    barra entra só se tiver timestamp, abertura, máxima, mínima e fechamento;
+    volume ausente vira 0. `valid` tem o tamanho do payload original, para
+    alinhar outras séries da resposta (ex.: adjclose).
+    """
+    with timed('parse'):
+        timestamps = (chart_data or {}).get('timestamp') or []
+        quotes = ((chart_data or {}).get('indicators') or {}).get('quote') or [{}]
+        quote = quotes[0] or {}
+        n = len(timestamps)
+
+        columns = {'timestamp': np.array(timestamps, dtype=np.int64)}
+        for name in FIELDS:
+            columns[name] = _column(quote.get(name), n)
+
+        valid = np.logical_and.reduce([np.isfinite(columns[name]) for name in PRICE_FIELDS]) if n else np.zeros(0, dtype=bool)
+        if not valid.all():
+            columns = {name: values[valid] for name, values in columns.items()}
+        columns['volume'] = np.nan_to_num(columns['volume'])
+    return columns, valid
@@ -0,0 +1,67 @@
+import gzip
+import hashlib
+import os
+
+from src.services.metrics import timed
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só gzip
+    brotli = None
+
+# Respostas menores que isso não compensam o custo de compressão
+MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+# Nível 1: ~4x menor em payloads de barras com uma fração da CPU do nível 6
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 1))
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'text/css', 'application/javascript')
+
+
+def body_etag(data):
+    """ETag fraco do conteúdo (antes da compressão, válido para qualquer codificação)"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def choose_encoding(accept_encodings):
+    """Melhor codificação aceita pelo cliente entre as disponíveis ('br', 'gzip' ou None)"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def init_app(app):
+    """ETag/304 para respostas JSON e compressão gzip/brotli acima de MIN_SIZE"""
+    from flask import request
+
+    @app.after_request
+    def condition_and_compress(response):
+        if (response.direct_passthrough or response.status_code != 200
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        data = response.get_data()
+        if request.method in ('GET', 'HEAD') and response.mimetype == 'application/json':
+            # If-None-Match com o mesmo conteúdo: 304 sem corpo
+            response.set_etag(body_etag(data), weak=True)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings) if len(data) >= MIN_SIZE else None
+        if encoding is None:
+            return response
+        with timed('compress'):
+            response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
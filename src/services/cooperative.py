@@ -0,0 +1,36 @@
+import contextvars
+
+
+def _green():
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('socket')
+
+
+def run_blocking(fn, *args, **kwargs):
+    """Executa uma chamada bloqueante sem travar o hub do eventlet.
+
+    Sockets Python puros ficam cooperativos com o monkey patch, mas extensões
+    em C (curl_cffi usado pelo yfinance) não; essas vão para o pool de threads
+    nativas do eventlet (com o contexto atual, ex.: o prazo da chamada). Fora
+    do eventlet a chamada é direta.
+    """
+    if _green():
+        from eventlet import tpool
+        return tpool.execute(contextvars.copy_context().run, fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+def native_lock():
+    """Lock do sistema operacional mesmo com monkey patch.
+
+    Para estado tocado tanto por greenlets quanto pelas threads nativas do
+    tpool (ex.: o limitador do upstream); seções críticas precisam ser curtas.
+    """
+    if _green():
+        from eventlet import patcher
+        return patcher.original('threading').Lock()
+    import threading
+    return threading.Lock()
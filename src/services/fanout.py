@@ -0,0 +1,88 @@
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from src.services.metrics import fanout_calls
+from src.services.upstream import call_deadline
+
+# Pool compartilhado: limita o total de chamadas simultâneas ao upstream
+MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', 16))
+CALL_TIMEOUT = float(os.environ.get('FANOUT_CALL_TIMEOUT', 8))
+REQUEST_DEADLINE = float(os.environ.get('FANOUT_REQUEST_DEADLINE', 12))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='fanout')
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_many(keys, fetch, call_timeout=None, deadline=None):
+    """Executa `fetch(key)` em paralelo e devolve [(key, valor, erro)] na ordem das chaves.
+
+    Cada chamada tem seu próprio timeout (contado a partir do início da execução)
+    e a requisição inteira respeita um prazo; chaves que não terminam a tempo
+    voltam com erro 'timeout' em vez de bloquear a resposta.
+    """
+    call_timeout = CALL_TIMEOUT if call_timeout is None else call_timeout
+    deadline = REQUEST_DEADLINE if deadline is None else deadline
+    keys = list(dict.fromkeys(keys))
+    started = {}
+
+    def run(key):
+        started[key] = time.monotonic()
+        # O prazo desce até o limitador e o timeout HTTP: a thread é liberada quando
+        # ele vence, mesmo que ninguém espere mais pelo resultado
+        with call_deadline(call_timeout):
+            return fetch(key)
+
+    request_start = time.monotonic()
+    futures = {}
+    for key in keys:
+        ctx = contextvars.copy_context()
+        futures[_executor.submit(ctx.run, run, key)] = key
+
+    outcome = {}
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        remaining = request_start + deadline - now
+        if remaining <= 0:
+            break
+
+        # Chamadas que já estouraram o timeout individual são abandonadas
+        for future in list(pending):
+            start = started.get(futures[future])
+            if start is not None and now - start >= call_timeout:
+                pending.discard(future)
+                outcome[futures[future]] = (None, 'timeout')
+        if not pending:
+            break
+
+        waits = [remaining] + [
+            started[futures[f]] + call_timeout - now
+            for f in pending if futures[f] in started
+        ]
+        done, pending = wait(pending, timeout=max(min(waits), 0.01), return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is None:
+                outcome[futures[future]] = (future.result(), None)
+            else:
+                outcome[futures[future]] = (None, str(error) or error.__class__.__name__)
+
+    for future in pending:
+        # Só as que nem começaram saem da fila; as em execução terminam no próprio prazo
+        future.cancel()
+        outcome[futures[future]] = (None, 'timeout')
+
+    # Falhas viram marcadores na resposta, mas continuam visíveis no log e nas métricas
+    for key in keys:
+        error = outcome[key][1]
+        if error is None:
+            fanout_calls.inc('ok')
+        else:
+            fanout_calls.inc('timeout' if error == 'timeout' else 'error')
+            logger.warning('%s failed for %s: %s', getattr(fetch, '__name__', 'fetch'), key, error)
+
+    return [(key,) + outcome[key] for key in keys]
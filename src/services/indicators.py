@@ -0,0 +1,256 @@
+import numpy as np
+
+# Todas as funções operam no último eixo, então aceitam uma série (n,) ou um
+# lote (símbolos, n) alinhado à esquerda com NaN no final das séries curtas.
+
+DEFAULT_PARAMS = {
+    'rsi_period': 14,
+    'macd_fast': 12,
+    'macd_slow': 26,
+    'macd_signal': 9,
+    'bb_period': 20,
+    'bb_std': 2,
+    'sma_periods': (20, 50, 200),
+    'stoch_k': 14,
+    'stoch_d': 3,
+    'volume_period': 20
+}
+
+
+def _nan_like(x):
+    return np.full(x.shape, np.nan)
+
+
+def _ewm(x, alpha, seed):
+    """Recursão y_t = (1 - alpha) * y_{t-1} + alpha * x_t a partir de `seed`, vetorizada em blocos.
+
+    Dentro de cada bloco usa a forma fechada y_t = d^(t+1) * (seed + alpha * cumsum(x_j / d^(j+1)));
+    o tamanho do bloco mantém d^-L abaixo de ~1e100 para não perder precisão.
+    """
+    x = np.asarray(x, dtype=float)
+    decay = 1.0 - alpha
+    if decay <= 0:
+        return x.copy()
+
+    out = np.empty_like(x)
+    n = x.shape[-1]
+    block = max(1, int(230 / -np.log(decay)))
+    state = np.asarray(seed, dtype=float)
+    for start in range(0, n, block):
+        chunk = x[..., start:start + block]
+        powers = decay ** np.arange(1, chunk.shape[-1] + 1)
+        y = powers * (state[..., None] + alpha * np.cumsum(chunk / powers, axis=-1))
+        out[..., start:start + block] = y
+        state = y[..., -1]
+    return out
+
+
+def ema(x, span, offset=0):
+    """EMA semeada com a média simples dos primeiros `span` valores a partir de `offset`"""
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    first = offset + span - 1
+    if x.shape[-1] <= first:
+        return out
+    seed = x[..., offset:first + 1].mean(axis=-1)
+    out[..., first] = seed
+    out[..., first + 1:] = _ewm(x[..., first + 1:], 2.0 / (span + 1), seed)
+    return out
+
+
+def rolling_mean(x, window, offset=0):
+    """Média móvel simples via somas acumuladas (centradas para reduzir erro numérico)"""
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    if x.shape[-1] - offset < window:
+        return out
+    values = x[..., offset:]
+    centered = values - values[..., :1]
+    csum = np.cumsum(centered, axis=-1)
+    sums = csum[..., window - 1:].copy()
+    sums[..., 1:] -= csum[..., :-window]
+    out[..., offset + window - 1:] = sums / window + values[..., :1]
+    return out
+
+
+def rolling_std(x, window, ddof=1, offset=0):
+    """Desvio padrão móvel via somas acumuladas de valores e quadrados centrados"""
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    if x.shape[-1] - offset < window:
+        return out
+    values = x[..., offset:]
+    centered = values - values[..., :1]
+    s1 = np.cumsum(centered, axis=-1)
+    s2 = np.cumsum(centered * centered, axis=-1)
+    w1 = s1[..., window - 1:].copy()
+    w2 = s2[..., window - 1:].copy()
+    w1[..., 1:] -= s1[..., :-window]
+    w2[..., 1:] -= s2[..., :-window]
+    var = (w2 - w1 * w1 / window) / (window - ddof)
+    out[..., offset + window - 1:] = np.sqrt(np.maximum(var, 0))
+    return out
+
+
+def _rolling_extreme(x, window, ufunc):
+    """Mínimo/máximo móvel em O(n) (van Herk/Gil-Werman): acumulados por bloco de `window`
+    da esquerda e da direita; cada janela cobre o fim de um bloco e o início do seguinte."""
+    x = np.asarray(x, dtype=float)
+    out = _nan_like(x)
+    n = x.shape[-1]
+    if n < window:
+        return out
+    padded_len = -(-n // window) * window
+    padded = np.full(x.shape[:-1] + (padded_len,), np.nan)
+    padded[..., :n] = x
+    blocks = padded.reshape(x.shape[:-1] + (padded_len // window, window))
+    prefix = ufunc.accumulate(blocks, axis=-1).reshape(padded.shape)
+    suffix = ufunc.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+    out[..., window - 1:] = ufunc(suffix[..., :n - window + 1], prefix[..., window - 1:n])
+    return out
+
+
+def rolling_min(x, window):
+    return _rolling_extreme(x, window, np.minimum)
+
+
+def rolling_max(x, window):
+    return _rolling_extreme(x, window, np.maximum)
+
+
+def rsi(close, period=14):
+    """RSI com suavização de Wilder (alpha = 1/period), alinhado ao índice dos fechamentos"""
+    close = np.asarray(close, dtype=float)
+    out = _nan_like(close)
+    if close.shape[-1] <= period:
+        return out
+    deltas = np.diff(close, axis=-1)
+    gains = np.maximum(deltas, 0)
+    losses = np.maximum(-deltas, 0)
+
+    avg_gain = np.empty_like(deltas)
+    avg_loss = np.empty_like(deltas)
+    avg_gain[..., period - 1] = gains[..., :period].mean(axis=-1)
+    avg_loss[..., period - 1] = losses[..., :period].mean(axis=-1)
+    avg_gain[..., period:] = _ewm(gains[..., period:], 1.0 / period, avg_gain[..., period - 1])
+    avg_loss[..., period:] = _ewm(losses[..., period:], 1.0 / period, avg_loss[..., period - 1])
+
+    ag = avg_gain[..., period - 1:]
+    al = avg_loss[..., period - 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(al == 0, 100.0, 100.0 - 100.0 / (1.0 + ag / al))
+    out[..., period:] = values
+    return out
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """Linha MACD, linha de sinal e histograma"""
+    close = np.asarray(close, dtype=float)
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal, offset=slow - 1)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, period=20, std_dev=2):
+    """Bandas de Bollinger (superior, média, inferior)"""
+    middle = rolling_mean(close, period)
+    std = rolling_std(close, period)
+    return middle + std * std_dev, middle, middle - std * std_dev
+
+
+def stochastic(high, low, close, k_period=14, d_period=3):
+    """%K e %D (média simples de %K) do Oscilador Estocástico"""
+    close = np.asarray(close, dtype=float)
+    lowest = rolling_min(low, k_period)
+    highest = rolling_max(high, k_period)
+    spread = highest - lowest
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.where(spread == 0, 50.0, (close - lowest) / spread * 100)
+    k = np.where(np.isnan(spread), np.nan, k)
+    d = rolling_mean(k, d_period, offset=k_period - 1)
+    return k, d
+
+
+def compute_series(bars, params=None):
+    """Calcula todas as séries de indicadores em uma passada, compartilhando intermediários.
+
+    `bars` é um dict com arrays 'open', 'high', 'low', 'close' e 'volume'.
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    close = np.asarray(bars['close'], dtype=float)
+    high = np.asarray(bars['high'], dtype=float)
+    low = np.asarray(bars['low'], dtype=float)
+    volume = np.asarray(bars['volume'], dtype=float)
+
+    series = {'rsi': rsi(close, p['rsi_period'])}
+    series['macd'], series['macd_signal'], series['macd_histogram'] = macd(
+        close, p['macd_fast'], p['macd_slow'], p['macd_signal'])
+
+    # A SMA do período de Bollinger é reaproveitada como média móvel de mesmo período
+    smas = {period: rolling_mean(close, period) for period in p['sma_periods']}
+    middle = smas.get(p['bb_period'])
+    if middle is None:
+        middle = rolling_mean(close, p['bb_period'])
+    band = rolling_std(close, p['bb_period']) * p['bb_std']
+    series['bb_upper'], series['bb_middle'], series['bb_lower'] = middle + band, middle, middle - band
+    for period, values in smas.items():
+        series[f'sma_{period}'] = values
+
+    series['stoch_k'], series['stoch_d'] = stochastic(high, low, close, p['stoch_k'], p['stoch_d'])
+    series['avg_volume'] = rolling_mean(volume, p['volume_period'])
+    return series
+
+
+def _last(values, digits):
+    value = values[-1] if len(values) else np.nan
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def latest_values(series, volume):
+    """Resumo com o último valor de cada indicador, no formato usado pelas rotas"""
+    indicators = {
+        'rsi': _last(series['rsi'], 2),
+        'macd': {
+            'macd': _last(series['macd'], 6),
+            'signal': _last(series['macd_signal'], 6),
+            'histogram': _last(series['macd_histogram'], 6)
+        },
+        'bollinger': {
+            'upper': _last(series['bb_upper'], 4),
+            'middle': _last(series['bb_middle'], 4),
+            'lower': _last(series['bb_lower'], 4)
+        },
+        'stochastic': {
+            'k': _last(series['stoch_k'], 2),
+            'd': _last(series['stoch_d'], 2)
+        }
+    }
+    for name, values in series.items():
+        if name.startswith('sma_'):
+            indicators[name] = _last(values, 4)
+
+    avg_volume = _last(series['avg_volume'], 0)
+    if avg_volume is not None:
+        indicators['avg_volume'] = avg_volume
+        indicators['current_volume'] = int(volume[-1])
+    return indicators
+
+
+def compute_indicators(bars, params=None):
+    """Retorna {'latest': valores atuais, 'series': arrays completos} para as barras"""
+    series = compute_series(bars, params)
+    return {'latest': latest_values(series, np.asarray(bars['volume'])), 'series': series}
+
+
+def series_to_lists(series, digits=6, arrays=False):
+    """Converte as séries para listas JSON (NaN vira None).
+
+    Com arrays=True só arredonda e mantém os arrays do numpy; o provider JSON
+    do app os serializa direto, com NaN como null.
+    """
+    if arrays:
+        return {name: np.round(values, digits) for name, values in series.items()}
+    return {
+        name: [None if v != v else v for v in np.round(values, digits).tolist()]
+        for name, values in series.items()
+    }
@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider, _default
+
+from src.services.metrics import timed
+
+try:
+    import orjson
+except ImportError:  # sem orjson o provider padrão do Flask continua valendo
+    orjson = None
+
+
+def _numpy_default(value):
+    """Tipos do numpy para o encoder padrão (NaN vira null, como no orjson)"""
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'f':
+            return [None if math.isnan(v) else v for v in value.tolist()]
+        return value.tolist()
+    if isinstance(value, np.generic):
+        value = value.item()
+        return None if isinstance(value, float) and math.isnan(value) else value
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Provider padrão do Flask que também aceita arrays e escalares do numpy"""
+
+    @staticmethod
+    def default(o):
+        try:
+            return _numpy_default(o)
+        except TypeError:
+            return _default(o)
+
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+class OrjsonProvider(NumpyJSONProvider):
+    """Serializa com orjson: arrays do numpy direto do buffer, sem passar por listas Python.
+
+    Objetos que o orjson não conhece caem no `default` do Flask; chamadas com
+    opções do json (como `indent`) usam o encoder padrão. NaN sai como null.
+    """
+
+    def _options(self):
+        # datas e dataclasses passam pelo `default` do Flask para manter o mesmo formato
+        options = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+                   | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def _dumpb(self, obj):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options())
+        except TypeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            with timed('serialize'):
+                data = self._dumpb(obj)
+            if data is not None:
+                return data.decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(obj)
+        with timed('serialize'):
+            data = self._dumpb(obj)
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
+
+
+def init_app(app):
+    """Troca o provider JSON do app pelo orjson (ou o padrão com suporte a numpy, sem orjson)"""
+    app.json = (OrjsonProvider if orjson is not None else NumpyJSONProvider)(app)
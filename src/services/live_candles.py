@@ -0,0 +1,277 @@
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from src.services.bar_store import INTERVAL_SECONDS, RANGE_SECONDS, bar_store
+from src.services.metrics import register_gauges
+
+# Candles intradiários montados a partir das cotações consultadas (preço e
+# volume acumulado do dia no `meta` do gráfico). Enquanto uma série está ao
+# vivo o gráfico sai do disco + candle em formação, sem baixar o período de
+# novo; cada candle fechado é acrescentado ao armazenamento de barras.
+
+# Só intervalos alinhados ao relógio (o bucket é o horário da negociação truncado)
+LIVE_INTERVALS = tuple(
+    i for i in os.environ.get('LIVE_CANDLE_INTERVALS', '1m,2m,5m,15m,30m').split(',') if i
+)
+# Sem cotação nova há mais que isso a série deixa de ser servida ao vivo
+MAX_QUOTE_AGE = float(os.environ.get('LIVE_CANDLE_MAX_AGE', 15))
+# Séries que ninguém lê (rota ou publisher) por esse tempo são descartadas
+IDLE_TTL = float(os.environ.get('LIVE_CANDLE_IDLE_TTL', 900))
+MAX_SERIES = int(os.environ.get('LIVE_CANDLE_MAX_SERIES', 2048))
+# Campos do meta que a cotação atualiza na resposta servida ao vivo
+QUOTE_FIELDS = ('regularMarketPrice', 'regularMarketTime', 'regularMarketVolume',
+                'regularMarketDayHigh', 'regularMarketDayLow')
+
+
+def merge_forming(bars, latest, step):
+    """Substitui (ou acrescenta) a última barra de `bars` pela barra mais nova de `latest`.
+
+    Barras a menos de meio intervalo da última são o mesmo período (o horário de
+    início pode variar um pouco entre respostas, ex.: horário de verão).
+    """
+    if not len(latest['timestamp']):
+        return bars
+    newest = int(latest['timestamp'][-1])
+    if not len(bars['timestamp']):
+        return {name: values[-1:] for name, values in latest.items()}
+    last = int(bars['timestamp'][-1])
+    if newest - last < step / 2:
+        if newest < last - step / 2:
+            return bars
+        keep = len(bars['timestamp']) - 1
+    else:
+        keep = len(bars['timestamp'])
+    return {name: np.append(values[:keep], latest[name][-1:]) for name, values in bars.items()}
+
+
+class _Series:
+    """Candle em formação de um (símbolo, intervalo) e o último candle fechado no disco"""
+
+    def __init__(self, step):
+        self.step = step
+        self.candle = None     # {'t', 'o', 'h', 'l', 'c', 'v'}
+        self.previous = None   # timestamp da barra anterior ao candle; None = continuidade perdida
+        self.updated = 0.0     # relógio da última cotação aplicada
+        self.touched = time.monotonic()
+
+
+class CandleAggregator:
+    """Agrega cotações em candles por intervalo ativo e persiste os fechados"""
+
+    def __init__(self, store, intervals=LIVE_INTERVALS, max_quote_age=MAX_QUOTE_AGE,
+                 idle_ttl=IDLE_TTL, max_series=MAX_SERIES, clock=time.time):
+        self.store = store
+        self.intervals = set(intervals)
+        self.max_quote_age = max_quote_age
+        self.idle_ttl = idle_ttl
+        self.max_series = max_series
+        self.clock = clock
+        self._series = {}   # símbolo -> {intervalo: _Series}
+        self._quotes = {}   # símbolo -> (regularMarketTime, volume acumulado, meta)
+        self._lock = threading.Lock()
+        # Candles fechados aguardando gravação (fora do lock principal, em ordem)
+        self._closed = deque()
+        self._persist_lock = threading.Lock()
+        self._stats = {'quotes': 0, 'closed': 0, 'persisted': 0, 'breaks': 0, 'live_reads': 0}
+
+    def track(self, symbol, interval, columns):
+        """Passa a acompanhar a série a partir das barras que a rota acabou de carregar.
+
+        A barra em formação vira o candle inicial e a anterior deve ser a última
+        gravada. Uma série já ao vivo não é sobrescrita (as cotações são mais novas).
+        """
+        step = INTERVAL_SECONDS.get(interval)
+        timestamps = columns['timestamp']
+        if interval not in self.intervals or step is None or not len(timestamps):
+            return
+        now = self.clock()
+        last = int(timestamps[-1])
+        if last % step:
+            return  # upstream não alinha esse intervalo ao relógio
+        with self._lock:
+            series = self._series.setdefault(symbol, {}).get(interval)
+            if series is not None and self._is_live(series, now):
+                series.touched = time.monotonic()
+                return
+            series = _Series(step)
+            if last + step > now:
+                series.candle = {name[0]: float(columns[name][-1]) for name in ('open', 'high', 'low', 'close', 'volume')}
+                series.candle['t'] = last
+                series.previous = int(timestamps[-2]) if len(timestamps) > 1 else None
+            else:
+                series.previous = last
+            series.updated = now
+            self._series[symbol][interval] = series
+            self._evict()
+
+    def ingest(self, symbol, meta):
+        """Aplica uma cotação (`meta` do gráfico) a todas as séries acompanhadas do símbolo"""
+        price = meta.get('regularMarketPrice')
+        market_time = meta.get('regularMarketTime')
+        if price is None or market_time is None or symbol not in self._series:
+            return
+        price, market_time = float(price), int(market_time)
+        cumulative = float(meta.get('regularMarketVolume') or 0)
+        now = self.clock()
+        with self._lock:
+            seen = self._quotes.get(symbol)
+            if seen is not None and seen[0] == market_time and seen[1] == cumulative:
+                # Mesma cotação (ex.: servida pelo cache) — só renova a validade
+                for series in self._series.get(symbol, {}).values():
+                    series.updated = now
+                return
+            # Volume do meta é o acumulado do dia: o candle recebe a diferença
+            if seen is None:
+                volume = 0.0
+            else:
+                volume = cumulative - seen[1] if cumulative >= seen[1] else cumulative
+            self._quotes[symbol] = (market_time, cumulative, meta)
+            self._stats['quotes'] += 1
+            for interval, series in self._series.get(symbol, {}).items():
+                self._apply(symbol, interval, series, market_time, price, volume)
+                series.updated = now
+        if self._closed:
+            self._flush()
+
+    def _apply(self, symbol, interval, series, market_time, price, volume):
+        bucket = market_time // series.step * series.step
+        candle = series.candle
+        if candle is not None and bucket == candle['t']:
+            candle['h'] = max(candle['h'], price)
+            candle['l'] = min(candle['l'], price)
+            candle['c'] = price
+            candle['v'] += volume
+            return
+        if candle is not None and bucket < candle['t']:
+            return  # cotação mais velha que o candle
+        if candle is not None:
+            self._stats['closed'] += 1
+            if series.previous is not None:
+                # Gravado depois, fora do lock; se não continuar o disco, _persist desfaz
+                self._closed.append((symbol, interval, series, candle, series.previous))
+                series.previous = candle['t']
+        newest = candle['t'] if candle is not None else series.previous
+        if series.previous is not None and newest is not None and bucket != newest + series.step:
+            # Buckets sem nenhuma cotação (publisher parado, mercado fechado): o
+            # upstream pode ter barras que não vimos, então a série volta a ser carregada
+            series.previous = None
+            self._stats['breaks'] += 1
+        series.candle = {'t': bucket, 'o': price, 'h': price, 'l': price, 'c': price, 'v': volume}
+
+    def _flush(self):
+        """Grava os candles fechados na ordem em que fecharam, sem segurar o lock principal"""
+        with self._persist_lock:
+            while True:
+                with self._lock:
+                    if not self._closed:
+                        return
+                    item = self._closed.popleft()
+                self._persist(*item)
+
+    def _persist(self, symbol, interval, series, candle, previous):
+        """Grava o candle fechado se ele continuar exatamente a série do disco"""
+        last = self.store.last_timestamp(symbol, interval)
+        if last == candle['t']:
+            return  # já gravado (ex.: pela carga normal da rota)
+        if last != previous:
+            with self._lock:
+                series.previous = None
+                self._stats['breaks'] += 1
+            return
+        columns = {
+            'timestamp': np.array([candle['t']], dtype=np.int64),
+            'open': np.array([candle['o']]),
+            'high': np.array([candle['h']]),
+            'low': np.array([candle['l']]),
+            'close': np.array([candle['c']]),
+            'volume': np.array([candle['v']])
+        }
+        # Provisório: máxima/mínima amostradas e volume por diferença; o upstream substitui depois
+        self.store.append(symbol, interval, columns, provisional=True)
+        with self._lock:
+            self._stats['persisted'] += 1
+
+    def _is_live(self, series, now):
+        candle = series.candle
+        return (candle is not None and series.previous is not None and
+                now - series.updated <= self.max_quote_age and
+                now < candle['t'] + series.step + self.max_quote_age)
+
+    def load(self, symbol, interval, range_period):
+        """(colunas, meta) do período servidos do disco + candle em formação, ou (None, None)
+        se a série não estiver ao vivo ou o disco não cobrir o período"""
+        if interval not in self.intervals or range_period not in RANGE_SECONDS:
+            return None, None
+        now = self.clock()
+        with self._lock:
+            series = self._series.get(symbol, {}).get(interval)
+            if series is None or not self._is_live(series, now):
+                return None, None
+            series.touched = time.monotonic()
+            candle = dict(series.candle)
+            previous = series.previous
+            quote = self._quotes.get(symbol)
+        start = int(now) - RANGE_SECONDS[range_period]
+        info = self.store.info(symbol, interval)
+        if not info or info.get('covered_from') is None or info['covered_from'] > start:
+            return None, None
+        stored = self.store.read(symbol, interval, start=start)
+        if not len(stored['timestamp']) or int(stored['timestamp'][-1]) != previous:
+            return None, None
+        forming = {
+            'timestamp': np.array([candle['t']], dtype=np.int64),
+            **{name: np.array([candle[name[0]]]) for name in ('open', 'high', 'low', 'close', 'volume')}
+        }
+        columns = {name: np.concatenate([stored[name], forming[name]]) for name in stored}
+        meta = dict(info.get('meta') or {})
+        if quote is not None:
+            meta.update({name: quote[2][name] for name in QUOTE_FIELDS if name in quote[2]})
+        with self._lock:
+            self._stats['live_reads'] += 1
+        return columns, meta
+
+    def candles(self, symbol):
+        """Candle em formação de cada intervalo acompanhado ({intervalo: {'t', 'o', ...}})"""
+        with self._lock:
+            result = {}
+            for interval, series in self._series.get(symbol, {}).items():
+                series.touched = time.monotonic()
+                if series.candle is not None:
+                    result[interval] = dict(series.candle)
+            return result
+
+    def _evict(self):
+        """Descarta séries ociosas e, acima do limite, as lidas há mais tempo (chamado com o lock)"""
+        cutoff = time.monotonic() - self.idle_ttl
+        entries = [(series.touched, symbol, interval)
+                   for symbol, by_interval in self._series.items()
+                   for interval, series in by_interval.items()]
+        excess = len(entries) - self.max_series
+        entries.sort()
+        for i, (touched, symbol, interval) in enumerate(entries):
+            if touched >= cutoff and i >= excess:
+                break
+            del self._series[symbol][interval]
+            if not self._series[symbol]:
+                del self._series[symbol]
+                self._quotes.pop(symbol, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['series'] = sum(len(by_interval) for by_interval in self._series.values())
+            stats['live'] = sum(self._is_live(series, self.clock())
+                                for by_interval in self._series.values() for series in by_interval.values())
+        return stats
+
+
+live_candles = CandleAggregator(bar_store)
+
+register_gauges(lambda: [
+    (f'live_candles_{name}', f'Candles ao vivo: {name}', value)
+    for name, value in live_candles.stats().items()
+])
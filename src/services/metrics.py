@@ -0,0 +1,185 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from src.services.cooperative import native_lock
+
+# Limites (segundos) dos buckets de latência, no estilo do cliente oficial do Prometheus
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = native_lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [contagens por bucket..., soma, total]
+        self._lock = native_lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[-1] if series else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, [("le", bound)])} {count}')
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {series[-1]}')
+        return lines
+
+
+request_latency = Histogram(
+    'http_request_duration_seconds', 'Latência das requisições HTTP por rota',
+    labels=('blueprint', 'route', 'method', 'status')
+)
+stage_latency = Histogram(
+    'stage_duration_seconds', 'Tempo gasto em cada etapa do caminho quente',
+    labels=('stage',)
+)
+upstream_requests = Counter(
+    'upstream_requests_total', 'Chamadas ao provedor de dados por resultado',
+    labels=('outcome',)
+)
+fanout_calls = Counter(
+    'fanout_calls_total', 'Chamadas por símbolo das rotas em lote por resultado',
+    labels=('outcome',)
+)
+
+_metrics = [request_latency, stage_latency, upstream_requests, fanout_calls]
+_gauges = []
+
+# Etapas medidas na requisição atual, para o cabeçalho Server-Timing
+_timings = contextvars.ContextVar('stage_timings', default=None)
+
+
+def register_gauges(collect):
+    """Registra uma função que devolve [(nome, ajuda, valor)] lida a cada scrape"""
+    _gauges.append(collect)
+
+
+def start_request_timings():
+    timings = {}
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def timed(stage):
+    """Mede um trecho (upstream, parse, compute, serialize) no histograma e no Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_latency.observe(elapsed, stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def server_timing_header(timings, total=None):
+    parts = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in timings.items()]
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def render():
+    """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _gauges:
+        try:
+            gauges = collect()
+        except Exception:
+            continue
+        for name, help, value in gauges:
+            lines.extend([f'# HELP {name} {help}', f'# TYPE {name} gauge', f'{name} {value}'])
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Mede a latência de cada rota e, com SERVER_TIMING=1, devolve o cabeçalho Server-Timing"""
+    from flask import g, request
+    from flask.json.provider import DefaultJSONProvider
+
+    class TimedJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            with timed('serialize'):
+                return super().dumps(obj, **kwargs)
+
+    if type(app.json) is DefaultJSONProvider:
+        app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.stage_timings = start_request_timings()
+
+    @app.after_request
+    def record_latency(response):
+        start = getattr(g, 'metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_latency.observe(elapsed, request.blueprint or 'app', route, request.method, str(response.status_code))
+        if SERVER_TIMING:
+            response.headers['Server-Timing'] = server_timing_header(g.stage_timings, elapsed)
+        return response
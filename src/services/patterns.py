@@ -0,0 +1,173 @@
+import numpy as np
+
+
+def _shift(values, periods):
+    """Desloca o array para a direita preenchendo com NaN (valor da vela `periods` atrás)"""
+    shifted = np.full(values.shape, np.nan)
+    if periods < len(values):
+        shifted[periods:] = values[:len(values) - periods]
+    return shifted
+
+
+class Candles:
+    """Grandezas de cada vela (e das anteriores) calculadas uma vez sobre os arrays inteiros"""
+
+    def __init__(self, opens, highs, lows, closes):
+        self.o = np.asarray(opens, dtype=float)
+        self.h = np.asarray(highs, dtype=float)
+        self.l = np.asarray(lows, dtype=float)
+        self.c = np.asarray(closes, dtype=float)
+        self.body = np.abs(self.c - self.o)
+        self.range = self.h - self.l
+        self.top = np.maximum(self.o, self.c)
+        self.bottom = np.minimum(self.o, self.c)
+        self.upper_shadow = self.h - self.top
+        self.lower_shadow = self.bottom - self.l
+        self.green = self.c > self.o
+        self.red = self.o > self.c
+
+    def __len__(self):
+        return len(self.c)
+
+    def prev(self, name, periods=1):
+        values = getattr(self, name)
+        if values.dtype == bool:
+            shifted = np.zeros(values.shape, dtype=bool)
+            if periods < len(values):
+                shifted[periods:] = values[:len(values) - periods]
+            return shifted
+        return _shift(values, periods)
+
+
+def doji(k):
+    return (k.range > 0) & (k.body < k.range * 0.1)
+
+
+def hammer(k):
+    return k.green & (k.h - k.c < k.body * 0.3) & (k.o - k.l > k.body * 2)
+
+
+def shooting_star(k):
+    return k.red & (k.c - k.l < k.body * 0.3) & (k.h - k.o > k.body * 2)
+
+
+def bullish_engulfing(k):
+    po, pc = k.prev('o'), k.prev('c')
+    return (po > pc) & k.green & (k.o < pc) & (k.c > po)
+
+
+def bearish_engulfing(k):
+    po, pc = k.prev('o'), k.prev('c')
+    return (pc > po) & k.red & (k.o > pc) & (k.c < po)
+
+
+def bullish_harami(k):
+    po, pc = k.prev('o'), k.prev('c')
+    return (po > pc) & k.green & (k.o > pc) & (k.c < po)
+
+
+def bearish_harami(k):
+    po, pc = k.prev('o'), k.prev('c')
+    return (pc > po) & k.red & (k.o < pc) & (k.c > po)
+
+
+def _long_body(k, periods):
+    return k.prev('body', periods) >= k.prev('range', periods) * 0.5
+
+
+def morning_star(k):
+    # Vela longa de baixa, vela pequena abaixo dela e vela de alta fechando acima do meio da primeira
+    first_mid = (k.prev('o', 2) + k.prev('c', 2)) / 2
+    return (
+        k.prev('red', 2) & _long_body(k, 2) &
+        (k.prev('body') < k.prev('body', 2) * 0.3) &
+        (k.prev('top') <= k.prev('c', 2)) &
+        k.green & (k.c > first_mid)
+    )
+
+
+def evening_star(k):
+    first_mid = (k.prev('o', 2) + k.prev('c', 2)) / 2
+    return (
+        k.prev('green', 2) & _long_body(k, 2) &
+        (k.prev('body') < k.prev('body', 2) * 0.3) &
+        (k.prev('bottom') >= k.prev('c', 2)) &
+        k.red & (k.c < first_mid)
+    )
+
+
+def _advancing(k, periods):
+    """Vela `periods` atrás é de alta, fecha acima da anterior e abre dentro do corpo anterior"""
+    o, c = k.prev('o', periods), k.prev('c', periods)
+    po, pc = k.prev('o', periods + 1), k.prev('c', periods + 1)
+    return (c > o) & (c > pc) & (o > po) & (o <= pc)
+
+
+def _declining(k, periods):
+    o, c = k.prev('o', periods), k.prev('c', periods)
+    po, pc = k.prev('o', periods + 1), k.prev('c', periods + 1)
+    return (o > c) & (c < pc) & (o < po) & (o >= pc)
+
+
+def three_white_soldiers(k):
+    return k.prev('green', 2) & _advancing(k, 1) & _advancing(k, 0)
+
+
+def three_black_crows(k):
+    return k.prev('red', 2) & _declining(k, 1) & _declining(k, 0)
+
+
+def inside_bar(k):
+    return (k.h < k.prev('h')) & (k.l > k.prev('l'))
+
+
+def outside_bar(k):
+    return (k.h > k.prev('h')) & (k.l < k.prev('l'))
+
+
+# Catálogo: nome -> (detector, tipo, significado)
+PATTERNS = {
+    'Doji': (doji, 'Indecisão', 'Possível reversão de tendência'),
+    'Hammer': (hammer, 'Bullish', 'Possível reversão de alta'),
+    'Shooting Star': (shooting_star, 'Bearish', 'Possível reversão de baixa'),
+    'Bullish Engulfing': (bullish_engulfing, 'Bullish', 'Forte sinal de alta'),
+    'Bearish Engulfing': (bearish_engulfing, 'Bearish', 'Forte sinal de baixa'),
+    'Bullish Harami': (bullish_harami, 'Bullish', 'Perda de força da queda'),
+    'Bearish Harami': (bearish_harami, 'Bearish', 'Perda de força da alta'),
+    'Morning Star': (morning_star, 'Bullish', 'Reversão de alta em três velas'),
+    'Evening Star': (evening_star, 'Bearish', 'Reversão de baixa em três velas'),
+    'Three White Soldiers': (three_white_soldiers, 'Bullish', 'Continuação forte de alta'),
+    'Three Black Crows': (three_black_crows, 'Bearish', 'Continuação forte de baixa'),
+    'Inside Bar': (inside_bar, 'Indecisão', 'Compressão de volatilidade'),
+    'Outside Bar': (outside_bar, 'Indecisão', 'Expansão de volatilidade')
+}
+
+
+def scan(bars, names=None):
+    """Avalia os padrões pedidos sobre o histórico inteiro; retorna nome -> máscara booleana"""
+    candles = Candles(bars['open'], bars['high'], bars['low'], bars['close'])
+    return {name: PATTERNS[name][0](candles) for name in (names or PATTERNS)}
+
+
+def find_patterns(bars, timestamps=None, names=None, lookback=None):
+    """Lista todas as ocorrências (ordenadas por vela) no formato da rota.
+
+    `lookback` limita às ocorrências nas últimas N velas.
+    """
+    masks = scan(bars, names)
+    start = max(0, len(bars['close']) - lookback) if lookback else 0
+    occurrences = []
+    for name, mask in masks.items():
+        _, pattern_type, significance = PATTERNS[name]
+        for index in np.flatnonzero(mask[start:]) + start:
+            item = {
+                'pattern': name,
+                'type': pattern_type,
+                'significance': significance,
+                'candle_index': int(index)
+            }
+            if timestamps is not None:
+                item['timestamp'] = int(timestamps[index])
+            occurrences.append(item)
+    occurrences.sort(key=lambda item: item['candle_index'])
+    return occurrences
@@ -0,0 +1,274 @@
+import importlib.util
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from src.services.bar_store import INTERVAL_SECONDS, RANGE_SECONDS
+from src.services.cooperative import native_lock, run_blocking
+from src.services.upstream import http_session, remaining, upstream
+
+CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/'
+SANDBOX_RUNTIME = os.environ.get('SANDBOX_RUNTIME', '/opt/.manus/.sandbox-runtime')
+DEFAULT_PROVIDER = os.environ.get('MARKET_DATA_PROVIDER', 'yahoo')
+REQUEST_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 10))
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """Falha do provedor de dados, com o status HTTP equivalente (usado pelo governador)"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class MarketDataProvider:
+    """Interface dos provedores: `get_chart(query)` devolve a resposta do gráfico
+    no formato do Yahoo ({'chart': {'result': [...], 'error': None}}) ou None
+    se o símbolo não existir."""
+
+    name = None
+
+    def get_chart(self, query):
+        raise NotImplementedError
+
+
+class YahooProvider(MarketDataProvider):
+    """API de gráficos do Yahoo Finance via HTTP, pela sessão e pelo limitador compartilhados"""
+
+    name = 'yahoo'
+
+    def __init__(self, session=None, governor=None, base_url=CHART_URL, timeout=REQUEST_TIMEOUT):
+        self.session = session or http_session()
+        self.governor = governor or upstream
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def _fetch(self, query):
+        params = {key: value for key, value in query.items() if key != 'symbol' and value is not None}
+        for key, value in params.items():
+            if isinstance(value, bool):
+                params[key] = 'true' if value else 'false'
+        # Nunca além do prazo da chamada: a thread do fan-out é liberada quando ele vence
+        response = self.session.get(self.base_url + query['symbol'], params=params,
+                                    timeout=remaining(self.timeout))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def get_chart(self, query):
+        data = run_blocking(self.governor.call, self._fetch, query)
+        if not data or not (data.get('chart') or {}).get('result'):
+            return None
+        return data
+
+
+class SandboxProvider(MarketDataProvider):
+    """ApiClient do runtime externo do sandbox (o `call_api` original das rotas)"""
+
+    name = 'sandbox'
+
+    def __init__(self, runtime=SANDBOX_RUNTIME):
+        path = os.path.join(runtime, 'data_api.py')
+        if not os.path.exists(path):
+            raise ProviderError(f'Runtime do sandbox não encontrado em {runtime}')
+        # Carregado pelo caminho: o nome `data_api` já é o módulo deste projeto
+        spec = importlib.util.spec_from_file_location('sandbox_data_api', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.client = module.ApiClient()
+
+    def get_chart(self, query):
+        return self.client.call_api('YahooFinance/get_stock_chart', query=query)
+
+
+# Passeio aleatório determinístico: o log do preço é uma soma de ruídos de
+# valor em escalas de 1 minuto a ~2 anos (amplitude ∝ √escala), função só do
+# tempo. O mesmo instante tem sempre o mesmo preço, em qualquer intervalo,
+# período ou processo.
+_OCTAVE_SECONDS = 60 * 2 ** np.arange(21, dtype=np.uint64)
+# Cada oitava contribui (2/3)/escala à variância por minuto; a soma dá 4/3, daí o √(3/4)
+_OCTAVE_WEIGHTS = np.sqrt(2.0 ** np.arange(21)) * np.sqrt(0.75)
+_MASK53 = 2.0 ** -53
+
+
+def _mix(x):
+    """splitmix64 vetorizado (uint64 -> uint64 bem espalhado)"""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _uniform(key, values):
+    """Uniforme em [0, 1) determinística por (chave, valor)"""
+    return (_mix(np.asarray(values, dtype=np.uint64) ^ np.uint64(key)) >> np.uint64(11)) * _MASK53
+
+
+class FakeProvider(MarketDataProvider):
+    """Upstream local e determinístico para desenvolvimento offline e testes de carga.
+
+    Gera OHLCV em passeio aleatório com semente (por símbolo), com latência
+    (`latency` + até `jitter` segundos) e falhas injetadas (`error_rate`,
+    respondidas com `error_status`). Mercado 24h em UTC. Com `governed` as
+    chamadas passam pelo limitador e pelas novas tentativas do upstream real.
+    """
+
+    name = 'fake'
+
+    def __init__(self, seed=None, latency=None, jitter=None, error_rate=None, error_status=None,
+                 governed=None, daily_volatility=0.02, gap_rate=0.0005, clock=time.time):
+        env = os.environ.get
+        if governed is None:
+            governed = env('FAKE_PROVIDER_GOVERNED', '').lower() in ('1', 'true', 'yes')
+        self.governor = upstream if governed else None
+        self.seed = int(env('FAKE_PROVIDER_SEED', 0) if seed is None else seed)
+        self.latency = float(env('FAKE_PROVIDER_LATENCY_MS', 0)) / 1000 if latency is None else latency
+        self.jitter = float(env('FAKE_PROVIDER_JITTER_MS', 0)) / 1000 if jitter is None else jitter
+        self.error_rate = float(env('FAKE_PROVIDER_ERROR_RATE', 0) if error_rate is None else error_rate)
+        self.error_status = int(env('FAKE_PROVIDER_ERROR_STATUS', 503) if error_status is None else error_status)
+        # Desvio por minuto que resulta em `daily_volatility` ao dia
+        self.minute_sigma = daily_volatility / np.sqrt(1440)
+        self.gap_rate = gap_rate
+        self.clock = clock
+        self._random = random.Random(self.seed)
+        self._lock = native_lock()
+        self.stats = {'calls': 0, 'errors': 0}
+
+    def _key(self, symbol, salt=0):
+        return (zlib.crc32(symbol.encode()) << 20) ^ (self.seed * 0x9E3779B1 + salt) & 0xFFFFFFFFFFFFFFFF
+
+    def log_price(self, symbol, timestamps):
+        """Log do preço em cada instante (epoch em segundos)"""
+        key = self._key(symbol)
+        base = np.log(10.0) * (1 + 2.5 * _uniform(key, [0])[0])
+        t = np.asarray(timestamps, dtype=np.uint64)[:, None]
+        node = t // _OCTAVE_SECONDS
+        frac = (t % _OCTAVE_SECONDS) / _OCTAVE_SECONDS.astype(float)
+        salt = np.arange(1, len(_OCTAVE_SECONDS) + 1, dtype=np.uint64) << np.uint64(48)
+        left = _uniform(key, node ^ salt) * 2 - 1
+        right = _uniform(key, (node + np.uint64(1)) ^ salt) * 2 - 1
+        noise = left + (right - left) * frac
+        return base + self.minute_sigma * (noise @ _OCTAVE_WEIGHTS)
+
+    def bars(self, symbol, interval, range_period, now=None):
+        """Colunas OHLCV das barras do período terminando em `now` (a última ainda em formação)"""
+        step = INTERVAL_SECONDS[interval]
+        now = int(self.clock() if now is None else now)
+        count = max(1, RANGE_SECONDS[range_period] // step)
+        starts = (now // step - np.arange(count - 1, -1, -1)) * step
+        # Abertura de cada barra = fechamento da anterior; a última fecha em `now`
+        prices = np.exp(self.log_price(symbol, np.append(starts, now)))
+        open_, close = prices[:-1], prices[1:]
+        key = self._key(symbol, 1)
+        spread = self.minute_sigma * np.sqrt(step / 60) * _uniform(key, starts)
+        high = np.maximum(open_, close) * np.exp(spread)
+        low = np.minimum(open_, close) * np.exp(-spread * _uniform(key ^ 1, starts))
+        volume = np.floor(1e6 * (step / 86400) * np.exp(2 * _uniform(key ^ 2, starts)))
+        gaps = _uniform(key ^ 3, starts) < self.gap_rate
+        gaps[-1] = False
+        return {'timestamp': starts, 'open': open_, 'high': high, 'low': low, 'close': close,
+                'volume': volume, 'gaps': gaps}
+
+    def _maybe_fail(self):
+        with self._lock:
+            self.stats['calls'] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+            if fail:
+                self.stats['errors'] += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ProviderError(f'Falha injetada ({self.error_status})', status=self.error_status)
+
+    def get_chart(self, query):
+        if self.governor is not None:
+            return self.governor.call(self._chart, query)
+        return self._chart(query)
+
+    def _chart(self, query):
+        self._maybe_fail()
+        symbol = query['symbol']
+        interval = query.get('interval', '1d')
+        range_period = query.get('range', '1mo')
+        if interval not in INTERVAL_SECONDS or range_period not in RANGE_SECONDS:
+            raise ProviderError(f'Intervalo/período inválido: {interval}/{range_period}', status=422)
+
+        now = int(self.clock())
+        columns = self.bars(symbol, interval, range_period, now)
+        gaps = columns.pop('gaps')
+        quote = {}
+        for name, values in columns.items():
+            if name == 'timestamp':
+                continue
+            values = np.round(values, 4) if name != 'volume' else values.astype(np.int64)
+            values = values.tolist()
+            for i in np.flatnonzero(gaps).tolist():
+                values[i] = None
+            quote[name] = values
+
+        day_start = now // 86400 * 86400
+        day = self.bars(symbol, '1d', '1d', now)
+        close = columns['close']
+        meta = {
+            'currency': 'USD',
+            'symbol': symbol,
+            'exchangeName': 'FAKE',
+            'instrumentType': 'EQUITY',
+            'regularMarketTime': now,
+            'regularMarketPrice': round(float(close[-1]), 4),
+            'chartPreviousClose': round(float(columns['open'][0]), 4),
+            'regularMarketDayHigh': round(float(day['high'][-1]), 4),
+            'regularMarketDayLow': round(float(day['low'][-1]), 4),
+            # Acumulado do dia até agora, como no upstream real
+            'regularMarketVolume': int(day['volume'][-1] * (now - day_start) / 86400),
+            'gmtoffset': 0,
+            'timezone': 'UTC',
+            'exchangeTimezoneName': 'UTC',
+            'currentTradingPeriod': {'regular': {'timezone': 'UTC', 'start': day_start, 'end': day_start + 86400, 'gmtoffset': 0}},
+            'dataGranularity': interval,
+            'range': range_period
+        }
+        return {'chart': {'result': [{
+            'meta': meta,
+            'timestamp': columns['timestamp'].tolist(),
+            'indicators': {'quote': [quote], 'adjclose': [{'adjclose': quote['close']}]}
+        }], 'error': None}}
+
+
+PROVIDERS = {
+    'yahoo': YahooProvider,
+    'sandbox': SandboxProvider,
+    'fake': FakeProvider
+}
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def create_provider(name=None):
+    """Novo provedor pelo nome (yahoo, sandbox ou fake)"""
+    name = (name or DEFAULT_PROVIDER).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Provedor desconhecido: {name} (opções: {', '.join(PROVIDERS)})")
+    logger.info('Market data provider: %s', name)
+    return PROVIDERS[name]()
+
+
+def get_provider():
+    """Provedor do processo, configurado em MARKET_DATA_PROVIDER (padrão: yahoo)"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider()
+    return _provider
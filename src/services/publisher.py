@@ -0,0 +1,139 @@
+import logging
+import os
+import threading
+
+from src.services.fanout import fetch_many
+
+PUBLISH_INTERVAL = float(os.environ.get('PUBLISH_INTERVAL', 5))
+
+logger = logging.getLogger(__name__)
+
+
+def diff_snapshot(old, new):
+    """Somente as folhas que mudaram entre dois snapshots aninhados (dicts)"""
+    if old is None:
+        return new
+    delta = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            changed = diff_snapshot(previous, value)
+            if changed:
+                delta[key] = changed
+        elif value != previous:
+            delta[key] = value
+    return delta
+
+
+class MarketPublisher:
+    """Publica cotações/indicadores por sala de símbolo via Socket.IO.
+
+    Cada símbolo com pelo menos um assinante é consultado uma vez por ciclo,
+    independente do número de clientes, e só as mudanças são emitidas.
+    """
+
+    def __init__(self, socketio, build_update, interval=PUBLISH_INTERVAL, event='market_update',
+                 on_update=None, extra_symbols=None):
+        self.socketio = socketio
+        self.build_update = build_update
+        self.interval = interval
+        self.event = event
+        # on_update(símbolo, snapshot) recebe cada snapshot novo (ex.: avaliação de alertas);
+        # extra_symbols() lista símbolos consultados mesmo sem assinantes
+        self.on_update = on_update
+        self.extra_symbols = extra_symbols
+        self.rooms = {}      # símbolo -> sids assinantes
+        self.sessions = {}   # sid -> símbolos assinados
+        self.last = {}       # símbolo -> último snapshot emitido
+        self._lock = threading.Lock()
+        self._task = None
+
+    def subscribe(self, sid, symbol):
+        """Registra o cliente na sala e devolve o último snapshot conhecido (ou None)"""
+        with self._lock:
+            self.rooms.setdefault(symbol, set()).add(sid)
+            self.sessions.setdefault(sid, set()).add(symbol)
+            snapshot = self.last.get(symbol)
+            self._start()
+        return snapshot
+
+    def start(self):
+        """Inicia o ciclo de publicação, se ainda não estiver rodando"""
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self._task is None:
+            self._task = self.socketio.start_background_task(self._run)
+
+    def unsubscribe(self, sid, symbol):
+        with self._lock:
+            self._remove(sid, symbol)
+
+    def drop(self, sid):
+        """Remove um cliente desconectado de todas as salas"""
+        with self._lock:
+            for symbol in list(self.sessions.get(sid, ())):
+                self._remove(sid, symbol)
+
+    def _remove(self, sid, symbol):
+        sids = self.rooms.get(symbol)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self.rooms[symbol]
+                self.last.pop(symbol, None)
+        symbols = self.sessions.get(sid)
+        if symbols is not None:
+            symbols.discard(symbol)
+            if not symbols:
+                del self.sessions[sid]
+
+    def symbols(self):
+        with self._lock:
+            symbols = list(self.rooms)
+        if self.extra_symbols is not None:
+            symbols = list(dict.fromkeys(symbols + list(self.extra_symbols())))
+        return symbols
+
+    def stats(self):
+        with self._lock:
+            return {
+                'symbols': len(self.rooms),
+                'clients': len(self.sessions),
+                'running': self._task is not None
+            }
+
+    def tick(self):
+        """Um ciclo: busca cada símbolo assinado (ou extra) uma vez e emite os deltas"""
+        symbols = self.symbols()
+        if not symbols:
+            return 0
+        emitted = 0
+        for symbol, snapshot, error in fetch_many(symbols, self.build_update):
+            if error is not None:
+                continue
+            if self.on_update is not None:
+                try:
+                    self.on_update(symbol, snapshot)
+                except Exception:
+                    logger.exception('Error handling market update for %s', symbol)
+            with self._lock:
+                if symbol not in self.rooms:
+                    continue
+                delta = diff_snapshot(self.last.get(symbol), snapshot)
+                self.last[symbol] = snapshot
+            if delta:
+                # Cada worker publica só para os próprios clientes; passar pela fila
+                # duplicaria a mensagem nos workers que também acompanham o símbolo
+                self.socketio.emit(self.event, dict(delta, symbol=symbol), to=symbol, ignore_queue=True)
+                emitted += 1
+        return emitted
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                logger.exception('Error publishing market updates')
+            self.socketio.sleep(self.interval)
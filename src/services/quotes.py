@@ -0,0 +1,27 @@
+def quote_from_chart(symbol, chart_data, previous_close=None):
+    """Monta a cotação a partir do `meta` de uma resposta do gráfico.
+
+    `chartPreviousClose` só é o fechamento anterior quando o período é de 1 dia;
+    para períodos maiores o chamador informa `previous_close` (penúltimo fechamento).
+    """
+    meta = chart_data['meta']
+
+    quote = {
+        'symbol': symbol,
+        'price': meta.get('regularMarketPrice', 0),
+        'currency': meta.get('currency', 'USD'),
+        'marketTime': meta.get('regularMarketTime', 0),
+        'dayHigh': meta.get('regularMarketDayHigh', 0),
+        'dayLow': meta.get('regularMarketDayLow', 0),
+        'volume': meta.get('regularMarketVolume', 0),
+        'previousClose': meta.get('chartPreviousClose', 0) if previous_close is None else previous_close,
+        'change': 0,
+        'changePercent': 0
+    }
+
+    # Calcular mudança
+    if quote['previousClose'] > 0:
+        quote['change'] = round(quote['price'] - quote['previousClose'], 4)
+        quote['changePercent'] = round((quote['change'] / quote['previousClose']) * 100, 2)
+
+    return quote
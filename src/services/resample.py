@@ -0,0 +1,160 @@
+import time
+
+import numpy as np
+import pandas as pd
+from dateutil import tz as dateutil_tz
+
+from src.services.bar_store import INTERVAL_SECONDS, RANGE_SECONDS, load_bars
+
+DAY = 86400
+
+# Tamanho do bucket de cada intervalo derivável; dia/semana/mês seguem o calendário local
+TARGETS = {
+    '5m': 300, '15m': 900, '30m': 1800, '60m': 3600, '1h': 3600, '4h': 4 * 3600,
+    '1d': 'day', '1wk': 'week', '1mo': 'month'
+}
+
+# Intervalos mais finos de onde cada alvo pode ser montado, do preferido ao último recurso
+SOURCES = {
+    '5m': ('1m',),
+    '15m': ('5m', '1m'),
+    '30m': ('15m', '5m'),
+    '60m': ('30m', '15m'),
+    '4h': ('60m', '30m'),
+    '1d': ('60m',),
+    '1wk': ('1d',),
+    '1mo': ('1d',)
+}
+
+
+def exchange_timezone(meta):
+    """Fuso IANA da bolsa a partir do meta do gráfico (exchangeTimezoneName, depois timezone)"""
+    for name in ((meta or {}).get('exchangeTimezoneName'), (meta or {}).get('timezone')):
+        if name and dateutil_tz.gettz(name) is not None:
+            return name
+    return 'UTC'
+
+
+def session_start(meta, tz_name):
+    """Horário local (segundos do dia) de abertura do pregão regular, se o meta informar"""
+    period = ((meta or {}).get('currentTradingPeriod') or {}).get('regular') or {}
+    start = period.get('start')
+    if start is None:
+        return None
+    return int(local_seconds([start], tz_name)[0] % DAY)
+
+
+def local_seconds(timestamps, tz_name='UTC'):
+    """Epoch UTC -> segundos no relógio local do fuso (respeita horário de verão)"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if tz_name in (None, 'UTC') or not len(timestamps):
+        return timestamps.copy()
+    local = pd.to_datetime(timestamps, unit='s', utc=True).tz_convert(tz_name).tz_localize(None)
+    return local.asi8 // 10**9
+
+
+def bucket_keys(timestamps, target, tz_name='UTC', session_open=None):
+    """Chave do bucket de cada barra e o início do bucket em epoch UTC.
+
+    Buckets intradiários nunca atravessam dias locais e são ancorados na
+    abertura do pregão (`session_open`) ou, sem ela, na primeira barra do dia.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    local = local_seconds(timestamps, tz_name)
+    day = local // DAY
+    size = TARGETS[target]
+
+    if size == 'day':
+        return day, None
+    if size == 'week':
+        # 1970-01-01 foi quinta; semanas começam na segunda
+        return (day - 4) // 7, None
+    if size == 'month':
+        return local.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64), None
+
+    tod = local - day * DAY
+    if session_open is None:
+        first = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+        anchor = np.repeat(tod[first], np.diff(np.r_[first, len(day)]))
+    else:
+        anchor = np.full(tod.shape, session_open)
+    # O início local do bucket identifica o bucket (barras antes da âncora caem em slots negativos)
+    bucket_local = day * DAY + anchor + (tod - anchor) // size * size
+    return bucket_local, timestamps - (local - bucket_local)
+
+
+def resample(columns, target, tz_name='UTC', session_open=None):
+    """Agrega barras OHLCV ordenadas em um intervalo maior, sem laço por barra"""
+    timestamps = np.asarray(columns['timestamp'], dtype=np.int64)
+    if not len(timestamps):
+        return {name: np.asarray(values)[:0] for name, values in columns.items()}
+
+    keys, starts_utc = bucket_keys(timestamps, target, tz_name, session_open)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    return {
+        # Intradiário: início do bucket; diário ou maior: primeira barra do período
+        'timestamp': (starts_utc if starts_utc is not None else timestamps)[starts],
+        'open': np.asarray(columns['open'], dtype=float)[starts],
+        'high': np.maximum.reduceat(np.asarray(columns['high'], dtype=float), starts),
+        'low': np.minimum.reduceat(np.asarray(columns['low'], dtype=float), starts),
+        'close': np.asarray(columns['close'], dtype=float)[ends],
+        'volume': np.add.reduceat(np.asarray(columns['volume'], dtype=float), starts)
+    }
+
+
+def _covers(store, symbol, interval, range_period):
+    info = store.info(symbol, interval)
+    if not info or info.get('covered_from') is None:
+        return False
+    return info['covered_from'] <= int(time.time()) - RANGE_SECONDS[range_period]
+
+
+def load_interval(store, fetch_chart, symbol, interval, range_period, prepost=False):
+    """Como load_bars, mas monta o intervalo a partir de barras mais finas quando possível.
+
+    Intervalos que o upstream não tem (4h) sempre são derivados; os demais são
+    derivados quando o armazenamento já cobre o período com um intervalo mais
+    fino e ainda não com o próprio intervalo — trocar de timeframe no gráfico
+    reaproveita as barras já baixadas.
+    """
+    source = None
+    if interval not in INTERVAL_SECONDS:
+        source = next(iter(SOURCES.get(interval, ())), None)
+        if source is None:
+            return load_bars(store, fetch_chart, symbol, interval, range_period, prepost)
+    elif interval in SOURCES and range_period in RANGE_SECONDS and not prepost:
+        if not _covers(store, symbol, interval, range_period):
+            source = next((s for s in SOURCES[interval] if _covers(store, symbol, s, range_period)), None)
+
+    if source is None:
+        return load_bars(store, fetch_chart, symbol, interval, range_period, prepost)
+
+    columns, meta = load_bars(store, fetch_chart, symbol, source, range_period, prepost)
+    if columns is None:
+        return None, None
+    tz_name = exchange_timezone(meta)
+    return resample(columns, interval, tz_name, session_start(meta, tz_name)), meta
+
+
+def load_stored(store, symbol, interval, range_period):
+    """(colunas, meta) do período só a partir do armazenamento, sem chamar o upstream.
+
+    Usa o próprio intervalo ou um mais fino reamostrado; (None, None) se nenhum
+    cobrir o período.
+    """
+    if range_period not in RANGE_SECONDS:
+        return None, None
+    start = int(time.time()) - RANGE_SECONDS[range_period]
+    sources = ((interval,) if interval in INTERVAL_SECONDS else ()) + SOURCES.get(interval, ())
+    for source in sources:
+        if not _covers(store, symbol, source, range_period):
+            continue
+        columns = store.read(symbol, source, start=start)
+        meta = (store.info(symbol, source) or {}).get('meta') or {}
+        if source == interval:
+            return columns, meta
+        tz_name = exchange_timezone(meta)
+        return resample(columns, interval, tz_name, session_start(meta, tz_name)), meta
+    return None, None
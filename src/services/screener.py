@@ -0,0 +1,178 @@
+import ast
+import operator
+
+import numpy as np
+
+from src.services.indicators import compute_series
+
+MAX_EXPRESSION_LENGTH = 500
+# Potências só com expoente constante e pequeno (9**9**9 travaria o worker)
+MAX_EXPONENT = 10
+
+# Campos disponíveis nas condições (último valor de cada símbolo)
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+FIELDS = PRICE_FIELDS + (
+    'price', 'change', 'change_percent', 'rsi', 'macd', 'macd_signal', 'macd_histogram',
+    'bb_upper', 'bb_middle', 'bb_lower', 'sma_20', 'sma_50', 'sma_200',
+    'stoch_k', 'stoch_d', 'avg_volume'
+)
+
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.Mod: operator.mod
+}
+_COMPARE = {
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt,
+    ast.GtE: operator.ge, ast.Eq: operator.eq, ast.NotEq: operator.ne
+}
+
+
+class ScreenerError(ValueError):
+    """Condição inválida enviada ao screener"""
+
+
+def _evaluate(node, values):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, values)
+    if isinstance(node, ast.BoolOp):
+        masks = [_mask(_evaluate(value, values)) for value in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        result = masks[0]
+        for mask in masks[1:]:
+            result = combine(result, mask)
+        return result
+    if isinstance(node, ast.UnaryOp):
+        operand = _evaluate(node.operand, values)
+        if isinstance(node.op, ast.Not):
+            return ~_mask(operand)
+        if isinstance(node.op, ast.USub):
+            return -operand
+        if isinstance(node.op, ast.UAdd):
+            return operand
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+        exponent = _evaluate(node.right, values)
+        if isinstance(exponent, np.ndarray) or abs(exponent) > MAX_EXPONENT:
+            raise ScreenerError(f'O expoente deve ser uma constante entre -{MAX_EXPONENT} e {MAX_EXPONENT}')
+        return _evaluate(node.left, values) ** exponent
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        return _BINARY[type(node.op)](_evaluate(node.left, values), _evaluate(node.right, values))
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+        # Comparações encadeadas (a < b < c) viram (a < b) and (b < c)
+        left = _evaluate(node.left, values)
+        result = None
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _evaluate(comparator, values)
+            mask = _COMPARE[type(op)](left, right)
+            result = mask if result is None else result & mask
+            left = right
+        return result
+    if isinstance(node, ast.Name):
+        if node.id not in values:
+            raise ScreenerError(f'Campo desconhecido: {node.id}')
+        return values[node.id]
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return float(node.value)
+    raise ScreenerError(f'Expressão não suportada: {ast.dump(node)[:60]}')
+
+
+def _mask(value):
+    if not isinstance(value, np.ndarray) or value.dtype != bool:
+        raise ScreenerError('Use comparações (ex.: rsi < 30) combinadas com and/or/not')
+    return value
+
+
+def parse_condition(expression):
+    """Valida a condição e devolve a árvore e os campos usados; só operações aritméticas e comparações"""
+    if not isinstance(expression, str) or not expression.strip():
+        raise ScreenerError('Informe a condição')
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ScreenerError(f'Condição maior que {MAX_EXPRESSION_LENGTH} caracteres')
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError:
+        raise ScreenerError('Condição com sintaxe inválida')
+    names = sorted({node.id for node in ast.walk(tree) if isinstance(node, ast.Name)})
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown:
+        raise ScreenerError(f"Campos desconhecidos: {', '.join(unknown)}")
+    return tree, names
+
+
+def stack_bars(bar_list):
+    """Empilha séries de tamanhos diferentes em matrizes (símbolos, tempo) alinhadas à esquerda com NaN à direita"""
+    lengths = np.array([len(bars['close']) for bars in bar_list], dtype=np.int64)
+    width = int(lengths.max()) if len(lengths) else 0
+    matrix = {}
+    for name in PRICE_FIELDS:
+        values = np.full((len(bar_list), width), np.nan)
+        for row, bars in enumerate(bar_list):
+            values[row, :lengths[row]] = bars[name]
+        matrix[name] = values
+    return matrix, lengths
+
+
+def latest_matrix(bar_list, params=None):
+    """Último valor de cada campo para todos os símbolos, calculando os indicadores em lote 2-D"""
+    matrix, lengths = stack_bars(bar_list)
+    series = compute_series(matrix, params)
+    last = np.maximum(lengths - 1, 0)[:, None]
+    prev = np.maximum(lengths - 2, 0)[:, None]
+
+    def take(values, index=last):
+        return np.take_along_axis(values, index, axis=-1)[:, 0]
+
+    latest = {name: take(values) for name, values in series.items()}
+    for name in PRICE_FIELDS:
+        latest[name] = take(matrix[name])
+    latest['price'] = latest['close']
+    previous = np.where(lengths > 1, take(matrix['close'], prev), np.nan)
+    latest['change'] = latest['close'] - previous
+    with np.errstate(divide='ignore', invalid='ignore'):
+        latest['change_percent'] = latest['change'] / previous * 100
+    return latest
+
+
+def screen(symbols, bar_list, expression, params=None, sort=None, descending=True, limit=None):
+    """Avalia a condição sobre todos os símbolos de uma vez.
+
+    Retorna os símbolos aprovados com os valores dos campos usados na condição
+    (e no `sort`), ordenados pelo campo `sort` se informado.
+    """
+    tree, names = parse_condition(expression)
+    if sort is not None and sort not in FIELDS:
+        raise ScreenerError(f'Campo de ordenação desconhecido: {sort}')
+    if not symbols:
+        return []
+
+    latest = latest_matrix(bar_list, params)
+    try:
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            passed = _mask(np.broadcast_to(_evaluate(tree, latest), (len(symbols),)))
+    except (ArithmeticError, ValueError) as e:
+        # Constantes são floats do Python: 1 % 0 ou overflow levantam em vez de virar NaN/inf
+        if isinstance(e, ScreenerError):
+            raise
+        raise ScreenerError(f'Erro aritmético na condição: {e}')
+
+    rows = np.flatnonzero(passed)
+    if sort is not None:
+        keys = latest[sort][rows]
+        order = np.argsort(-keys if descending else keys, kind='stable')
+        # NaN sempre no final
+        order = order[np.argsort(np.isnan(keys[order]), kind='stable')]
+        rows = rows[order]
+    if limit:
+        rows = rows[:limit]
+
+    fields = list(dict.fromkeys(['close'] + names + ([sort] if sort else [])))
+    values = {name: latest[name][rows] for name in fields}
+    return [
+        {
+            'symbol': symbols[row],
+            'values': {
+                name: (round(float(values[name][i]), 6) if np.isfinite(values[name][i]) else None)
+                for name in fields
+            }
+        }
+        for i, row in enumerate(rows)
+    ]
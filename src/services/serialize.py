@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+
+DAY = 86400
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+# Nomes curtos do formato colunar
+SHORT_NAMES = {'timestamp': 't', 'open': 'o', 'high': 'h', 'low': 'l', 'close': 'c', 'volume': 'v'}
+
+
+def local_offsets(timestamps):
+    """Deslocamento (segundos) do fuso local do servidor em cada timestamp.
+
+    O SO é consultado no início e no fim de cada dia; só nos dias com troca de
+    horário de verão cada barra é consultada individualmente.
+    """
+    days = timestamps // DAY
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    starts = np.array([time.localtime(day * DAY).tm_gmtoff for day in unique_days.tolist()], dtype=np.int64)
+    ends = np.array([time.localtime(day * DAY + DAY - 1).tm_gmtoff for day in unique_days.tolist()], dtype=np.int64)
+    offsets = starts[inverse]
+    for i in np.flatnonzero((starts != ends)[inverse]).tolist():
+        offsets[i] = time.localtime(int(timestamps[i])).tm_gmtoff
+    return offsets
+
+
+def local_isoformat(timestamps):
+    """Equivalente vetorizado de datetime.fromtimestamp(t).isoformat() (horário local do servidor)"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if not len(timestamps):
+        return []
+    local = (timestamps + local_offsets(timestamps)).astype('datetime64[s]')
+    return np.datetime_as_string(local, unit='s').tolist()
+
+
+def index_strftime(index):
+    """Formata um DatetimeIndex como '%Y-%m-%d %H:%M:%S' no próprio fuso, sem laço por linha"""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    strings = np.datetime_as_string(index.values.astype('datetime64[s]'), unit='s')
+    return np.char.replace(strings, 'T', ' ').tolist()
+
+
+def rounded(values, digits=4, arrays=False):
+    values = np.asarray(values, dtype=float)
+    values = values if digits is None else np.round(values, digits)
+    return values if arrays else values.tolist()
+
+
+def columnar(columns, digits=4, arrays=False):
+    """Formato colunar compacto {'t': [...], 'o': [...], ...}.
+
+    Com arrays=True as colunas ficam como arrays do numpy, para o provider
+    JSON serializá-las direto do buffer.
+    """
+    result = {'t': np.asarray(columns['timestamp'], dtype=np.int64)}
+    for name in PRICE_COLUMNS:
+        result[SHORT_NAMES[name]] = rounded(columns[name], digits, arrays=True)
+    result['v'] = np.nan_to_num(np.asarray(columns['volume'], dtype=float)).astype(np.int64)
+    if not arrays:
+        result = {name: values.tolist() for name, values in result.items()}
+    return result
+
+
+def bar_rows(columns, digits=4):
+    """Lista de dicts por barra, com as colunas convertidas em bloco antes de montar as linhas"""
+    cols = columnar(columns, digits)
+    datetimes = local_isoformat(columns['timestamp'])
+    return [
+        {
+            'timestamp': t,
+            'datetime': dt,
+            'open': o,
+            'high': h,
+            'low': l,
+            'close': c,
+            'volume': v
+        }
+        for t, dt, o, h, l, c, v in zip(cols['t'], datetimes, cols['o'], cols['h'], cols['l'], cols['c'], cols['v'])
+    ]
@@ -0,0 +1,121 @@
+import numpy as np
+
+# Regras do sinal de trading, compartilhadas pela versão escalar (rotas) e pela
+# vetorizada (backtest). Cada grupo só vale quando todas as entradas existem
+# (None/NaN/0 contam como ausentes, como nas checagens de verdade originais);
+# o primeiro caso verdadeiro do grupo soma os pontos. Condição None = "senão".
+SIGNAL_RULES = [
+    (('rsi',), [
+        (lambda rsi: rsi < 30, 20, "RSI indica sobrevendido (possível compra)"),
+        (lambda rsi: rsi > 70, -20, "RSI indica sobrecomprado (possível venda)"),
+        (lambda rsi: (40 <= rsi) & (rsi <= 60), 5, "RSI em zona neutra"),
+    ]),
+    (('macd', 'macd_signal'), [
+        (lambda macd, signal: macd > signal, 15, "MACD acima da linha de sinal (bullish)"),
+        (None, -15, "MACD abaixo da linha de sinal (bearish)"),
+    ]),
+    (('bb_upper', 'bb_lower', 'close'), [
+        (lambda upper, lower, close: close > upper, -10, "Preço acima da banda superior (sobrecomprado)"),
+        (lambda upper, lower, close: close < lower, 10, "Preço abaixo da banda inferior (sobrevendido)"),
+        (None, 0, "Preço dentro das bandas de Bollinger"),
+    ]),
+    (('sma_20', 'sma_50'), [
+        (lambda sma_20, sma_50: sma_20 > sma_50, 10, "SMA 20 acima da SMA 50 (tendência de alta)"),
+        (None, -10, "SMA 20 abaixo da SMA 50 (tendência de baixa)"),
+    ]),
+    (('close', 'sma_20'), [
+        (lambda close, sma_20: close > sma_20, 5, "Preço acima da SMA 20"),
+        (None, -5, "Preço abaixo da SMA 20"),
+    ]),
+]
+
+# (pontuação mínima, recomendação, força); abaixo da última faixa é STRONG_SELL
+RECOMMENDATIONS = [
+    (30, 'STRONG_BUY', 'FORTE'),
+    (15, 'BUY', 'MODERADO'),
+    (-15, 'HOLD', 'NEUTRO'),
+    (-30, 'SELL', 'MODERADO'),
+]
+LOWEST_RECOMMENDATION = ('STRONG_SELL', 'FORTE')
+
+# Casas decimais usadas nos valores do resumo (latest_values); o backtest
+# arredonda igual para reproduzir exatamente o sinal servido pelas rotas
+ROUNDING = {
+    'rsi': 2, 'macd': 6, 'macd_signal': 6, 'bb_upper': 4, 'bb_lower': 4,
+    'sma_20': 4, 'sma_50': 4
+}
+
+
+def flat_inputs(indicators, current_price):
+    """Achata o resumo de indicadores das rotas nos nomes usados pelas regras"""
+    macd = indicators.get('macd', {})
+    bollinger = indicators.get('bollinger', {})
+    return {
+        'rsi': indicators.get('rsi'),
+        'macd': macd.get('macd'),
+        'macd_signal': macd.get('signal'),
+        'bb_upper': bollinger.get('upper'),
+        'bb_lower': bollinger.get('lower'),
+        'sma_20': indicators.get('sma_20'),
+        'sma_50': indicators.get('sma_50'),
+        'close': current_price
+    }
+
+
+def recommend(score):
+    for threshold, recommendation, strength in RECOMMENDATIONS:
+        if score >= threshold:
+            return recommendation, strength
+    return LOWEST_RECOMMENDATION
+
+
+def generate_trading_signal(indicators, current_price):
+    """Gera sinal de trading baseado nos indicadores"""
+    inputs = flat_inputs(indicators, current_price)
+    signals = []
+    score = 0
+
+    for names, cases in SIGNAL_RULES:
+        values = [inputs[name] for name in names]
+        if not all(values):
+            continue
+        for condition, points, message in cases:
+            if condition is None or condition(*values):
+                signals.append(message)
+                score += points
+                break
+
+    recommendation, strength = recommend(score)
+    confidence = min(abs(score) / 50, 1.0)
+
+    return {
+        'recommendation': recommendation,
+        'strength': strength,
+        'confidence': round(confidence, 2),
+        'score': score,
+        'signals': signals
+    }
+
+
+def score_series(series, close):
+    """Pontuação do sinal em cada barra, vetorizada no eixo do tempo.
+
+    `series` são as séries de compute_series; o resultado é igual a chamar
+    generate_trading_signal com o resumo de cada barra.
+    """
+    close = np.asarray(close, dtype=float)
+    inputs = {name: np.round(series[name], digits) for name, digits in ROUNDING.items()}
+    inputs['close'] = close
+    score = np.zeros(close.shape)
+
+    with np.errstate(invalid='ignore'):
+        for names, cases in SIGNAL_RULES:
+            values = [inputs[name] for name in names]
+            pending = np.ones(close.shape, dtype=bool)
+            for value in values:
+                pending &= np.isfinite(value) & (value != 0)
+            for condition, points, _ in cases:
+                hit = pending if condition is None else pending & condition(*values)
+                score[hit] += points
+                pending &= ~hit
+    return score
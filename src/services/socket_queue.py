@@ -0,0 +1,138 @@
+import fcntl
+import json
+import os
+import stat
+import struct
+import time
+
+import socketio
+
+_HEADER = struct.Struct('>I')
+MAX_QUEUE_BYTES = 16 * 1024 * 1024
+# Gerações antigas só são apagadas depois disso (um leitor vivo já passou delas)
+RETENTION_SECONDS = 60
+
+
+def _jsonable(value):
+    """Valores do numpy que escapam para os emits (tolist/item viram tipos do Python)"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__} não é serializável')
+
+
+class FileQueueManager(socketio.PubSubManager):
+    """Fila de mensagens do Socket.IO baseada em arquivos compartilhados (IPC local).
+
+    Permite que vários workers na mesma máquina repassem emits entre si sem
+    Redis. O diretório da fila precisa ser do próprio usuário e sem acesso de
+    outros (0700). Cada mensagem é um quadro (tamanho + JSON) gravado com append
+    sob flock no arquivo da geração atual; quando ele passa de MAX_QUEUE_BYTES
+    o escritor abre a geração seguinte e os leitores só mudam de arquivo depois
+    de consumir a anterior até o fim. Para mais de uma máquina use um broker de
+    verdade (redis://...).
+    """
+    name = 'file'
+
+    def __init__(self, url, channel='flask-socketio', write_only=False, logger=None,
+                 poll_interval=0.05):
+        self.path = url[len('file://'):] if url.startswith('file://') else url
+        self.poll_interval = poll_interval
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        info = os.stat(self.path)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise ValueError(f'Diretório da fila do Socket.IO inseguro (precisa ser 0700 e do usuário): {self.path}')
+        self._lock_path = os.path.join(self.path, 'lock')
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _segment(self, generation):
+        return os.path.join(self.path, f'{generation}.queue')
+
+    def _generation(self):
+        """Geração mais recente existente (0 se a fila estiver vazia)"""
+        generations = [int(name.split('.')[0]) for name in os.listdir(self.path)
+                       if name.endswith('.queue') and name.split('.')[0].isdigit()]
+        return max(generations, default=0)
+
+    def _publish(self, data):
+        payload = json.dumps({'channel': self.channel, 'data': data}, default=_jsonable).encode()
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                generation = self._generation()
+                path = self._segment(generation)
+                if os.path.exists(path) and os.path.getsize(path) > MAX_QUEUE_BYTES:
+                    generation += 1
+                    path = self._segment(generation)
+                    self._remove_old(generation)
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                with os.fdopen(fd, 'ab') as f:
+                    f.write(_HEADER.pack(len(payload)) + payload)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _remove_old(self, current):
+        """Apaga as gerações anteriores sem escrita há mais de RETENTION_SECONDS (chamado com o flock)"""
+        cutoff = time.time() - RETENTION_SECONDS
+        for name in os.listdir(self.path):
+            prefix = name.split('.')[0]
+            if not name.endswith('.queue') or not prefix.isdigit() or int(prefix) >= current:
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _open(self, generation, at_end=False):
+        fd = os.open(self._segment(generation), os.O_RDONLY | os.O_CREAT, 0o600)
+        f = os.fdopen(fd, 'rb')
+        if at_end:
+            f.seek(0, os.SEEK_END)
+        return f
+
+    def _listen(self):
+        generation = self._generation()
+        f = self._open(generation, at_end=True)
+        buffer = b''
+        try:
+            while True:
+                # A próxima geração só existe depois da última escrita nesta:
+                # ler o resto deste arquivo antes de trocar não perde mensagens
+                latest = self._generation()
+                chunk = f.read()
+                if not chunk:
+                    if latest > generation:
+                        f.close()
+                        # Leitor parado além da retenção (geração seguinte já removida) pula para a atual
+                        following = generation + 1
+                        generation = following if os.path.exists(self._segment(following)) else latest
+                        f = self._open(generation)
+                        buffer = b''
+                        continue
+                    self.server.sleep(self.poll_interval)
+                    continue
+                buffer += chunk
+                while len(buffer) >= _HEADER.size:
+                    size = _HEADER.unpack_from(buffer)[0]
+                    if len(buffer) < _HEADER.size + size:
+                        break
+                    frame = buffer[_HEADER.size:_HEADER.size + size]
+                    buffer = buffer[_HEADER.size + size:]
+                    try:
+                        message = json.loads(frame)
+                    except ValueError:
+                        continue
+                    if isinstance(message, dict) and message.get('channel') == self.channel:
+                        yield message['data']
+        finally:
+            f.close()
+
+
+def socketio_queue_options(url):
+    """Opções do SocketIO para a fila configurada: file://diretório ou URL de broker (redis://...)"""
+    if not url:
+        return {}
+    if url.startswith('file://'):
+        return {'client_manager': FileQueueManager(url)}
+    return {'message_queue': url}
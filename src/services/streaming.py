@@ -0,0 +1,352 @@
+import math
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from src.services.indicators import DEFAULT_PARAMS
+
+# Versões incrementais dos indicadores de src/services/indicators.py: cada nova
+# barra custa O(1) (ou O(janela) no pior caso das deques), independente do histórico.
+# As sementes são as mesmas do motor vetorizado, então os valores coincidem.
+
+
+class EMAState:
+    """EMA semeada com a média simples dos primeiros `span` valores"""
+
+    def __init__(self, span):
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = None
+
+    def update(self, x):
+        self.count += 1
+        if self.value is not None:
+            self.value += self.alpha * (x - self.value)
+        else:
+            self.total += x
+            if self.count == self.span:
+                self.value = self.total / self.span
+        return self.value
+
+    def peek(self, x):
+        """Valor que `update(x)` devolveria, sem alterar o estado"""
+        if self.value is not None:
+            return self.value + self.alpha * (x - self.value)
+        if self.count + 1 == self.span:
+            return (self.total + x) / self.span
+        return None
+
+
+class MACDState:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMAState(fast)
+        self.slow = EMAState(slow)
+        self.signal = EMAState(signal)
+        self.macd = None
+        self.signal_value = None
+
+    def update(self, close):
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        if slow is not None:
+            self.macd = fast - slow
+            self.signal_value = self.signal.update(self.macd)
+        return self.macd, self.signal_value
+
+    def peek(self, close):
+        fast = self.fast.peek(close)
+        slow = self.slow.peek(close)
+        if slow is None:
+            return self.macd, self.signal_value
+        macd = fast - slow
+        return macd, self.signal.peek(macd)
+
+
+class WilderRSIState:
+    """RSI com média de Wilder; semente = média simples dos primeiros `period` ganhos/perdas"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.value = None
+
+    def _next(self, close):
+        """(contagem, ganho médio, perda média, RSI) depois de `close`; RSI None até a semente"""
+        delta = close - self.prev
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        count = self.count + 1
+        if count <= self.period:
+            avg_gain = self.avg_gain + gain / self.period
+            avg_loss = self.avg_loss + loss / self.period
+            if count < self.period:
+                return count, avg_gain, avg_loss, None
+        else:
+            avg_gain = self.avg_gain + (gain - self.avg_gain) / self.period
+            avg_loss = self.avg_loss + (loss - self.avg_loss) / self.period
+        value = 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        return count, avg_gain, avg_loss, value
+
+    def update(self, close):
+        if self.prev is None:
+            self.prev = close
+            return None
+        self.count, self.avg_gain, self.avg_loss, value = self._next(close)
+        self.prev = close
+        if value is None:
+            return None
+        self.value = value
+        return value
+
+    def peek(self, close):
+        """RSI (o valor exposto em `value`) depois de `close`, sem alterar o estado"""
+        if self.prev is None:
+            return self.value
+        value = self._next(close)[3]
+        return self.value if value is None else value
+
+
+class RollingStatsState:
+    """Média e desvio padrão em janela deslizante com atualização de Welford"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _next(self, x):
+        """(média, m2) depois de acrescentar x, sem alterar a janela"""
+        if len(self.values) >= self.window:
+            old = self.values[0]
+            new_mean = self.mean + (x - old) / self.window
+            return new_mean, self.m2 + (x - old) * (x - new_mean + old - self.mean)
+        delta = x - self.mean
+        mean = self.mean + delta / (len(self.values) + 1)
+        return mean, self.m2 + delta * (x - mean)
+
+    def update(self, x):
+        self.mean, self.m2 = self._next(x)
+        self.values.append(x)
+        if len(self.values) > self.window:
+            self.values.popleft()
+        return self.sma
+
+    def peek(self, x):
+        """(média ou None se a janela não encher, m2) com x, sem alterar a janela"""
+        mean, m2 = self._next(x)
+        return (mean if len(self.values) + 1 >= self.window else None), m2
+
+    def _std(self, m2):
+        return math.sqrt(max(m2, 0.0) / (self.window - 1))
+
+    @property
+    def ready(self):
+        return len(self.values) == self.window
+
+    @property
+    def sma(self):
+        return self.mean if self.ready else None
+
+    @property
+    def std(self):
+        if not self.ready:
+            return None
+        return self._std(self.m2)
+
+
+class RollingExtremeState:
+    """Mínimo ou máximo em janela deslizante com deque monotônica"""
+
+    def __init__(self, window, mode='min'):
+        self.window = window
+        self.better = (lambda a, b: a <= b) if mode == 'min' else (lambda a, b: a >= b)
+        self.items = deque()  # (índice, valor) em ordem monotônica
+        self.index = -1
+
+    def update(self, x):
+        self.index += 1
+        while self.items and self.better(x, self.items[-1][1]):
+            self.items.pop()
+        self.items.append((self.index, x))
+        if self.items[0][0] <= self.index - self.window:
+            self.items.popleft()
+        return self.value
+
+    def peek(self, x):
+        """Extremo da janela com x, sem alterar a deque"""
+        index = self.index + 1
+        if index < self.window - 1:
+            return None
+        # Na frente fica o primeiro item ainda na janela, a menos que x o tire da deque
+        for item_index, value in self.items:
+            if item_index > index - self.window:
+                return x if self.better(x, value) else value
+        return x
+
+    @property
+    def value(self):
+        return self.items[0][1] if self.index >= self.window - 1 else None
+
+
+class StochasticState:
+    def __init__(self, k_period=14, d_period=3):
+        self.lowest = RollingExtremeState(k_period, 'min')
+        self.highest = RollingExtremeState(k_period, 'max')
+        self.d = RollingStatsState(d_period)
+        self.k = None
+
+    def update(self, high, low, close):
+        lowest = self.lowest.update(low)
+        highest = self.highest.update(high)
+        if lowest is None:
+            return None, None
+        spread = highest - lowest
+        self.k = 50.0 if spread == 0 else (close - lowest) / spread * 100
+        return self.k, self.d.update(self.k)
+
+    def peek(self, high, low, close):
+        """(%K, %D) com a barra, sem alterar o estado"""
+        lowest = self.lowest.peek(low)
+        highest = self.highest.peek(high)
+        if lowest is None:
+            return self.k, self.d.sma
+        spread = highest - lowest
+        k = 50.0 if spread == 0 else (close - lowest) / spread * 100
+        return k, self.d.peek(k)[0]
+
+
+def _round(value, digits):
+    return None if value is None else round(float(value), digits)
+
+
+class IndicatorState:
+    """Estado de todos os indicadores de um (símbolo, intervalo), avançado barra a barra"""
+
+    def __init__(self, params=None):
+        p = dict(DEFAULT_PARAMS, **(params or {}))
+        self.bb_std = p['bb_std']
+        self.rsi = WilderRSIState(p['rsi_period'])
+        self.macd = MACDState(p['macd_fast'], p['macd_slow'], p['macd_signal'])
+        self.bollinger = RollingStatsState(p['bb_period'])
+        self.smas = {period: RollingStatsState(period) for period in p['sma_periods']}
+        self.stochastic = StochasticState(p['stoch_k'], p['stoch_d'])
+        self.volume = RollingStatsState(p['volume_period'])
+        self.last_timestamp = None
+        self.last_volume = 0
+
+    def update(self, timestamp, high, low, close, volume):
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.bollinger.update(close)
+        for sma in self.smas.values():
+            sma.update(close)
+        self.stochastic.update(high, low, close)
+        self.volume.update(volume)
+        self.last_timestamp = timestamp
+        self.last_volume = volume
+
+    def preview(self, timestamp, high, low, close, volume):
+        """Valores incluindo uma barra ainda em formação, sem alterar (nem copiar) o estado"""
+        middle, m2 = self.bollinger.peek(close)
+        macd, signal = self.macd.peek(close)
+        k, d = self.stochastic.peek(high, low, close)
+        avg_volume = self.volume.peek(volume)[0]
+        return self._format(
+            self.rsi.peek(close), macd, signal, middle,
+            self.bollinger._std(m2) * self.bb_std if middle is not None else None,
+            k, d, {period: sma.peek(close)[0] for period, sma in self.smas.items()},
+            avg_volume, volume
+        )
+
+    def snapshot(self):
+        """Últimos valores no mesmo formato de `indicators.latest_values`"""
+        middle = self.bollinger.sma
+        return self._format(
+            self.rsi.value, self.macd.macd, self.macd.signal_value, middle,
+            self.bollinger.std * self.bb_std if middle is not None else None,
+            self.stochastic.k, self.stochastic.d.sma, {period: sma.sma for period, sma in self.smas.items()},
+            self.volume.sma, self.last_volume
+        )
+
+    def _format(self, rsi, macd, signal, middle, band, k, d, smas, avg_volume, volume):
+        indicators = {
+            'rsi': _round(rsi, 2),
+            'macd': {
+                'macd': _round(macd, 6),
+                'signal': _round(signal, 6),
+                'histogram': _round(macd - signal, 6) if signal is not None else None
+            },
+            'bollinger': {
+                'upper': _round(middle + band, 4) if middle is not None else None,
+                'middle': _round(middle, 4),
+                'lower': _round(middle - band, 4) if middle is not None else None
+            },
+            'stochastic': {
+                'k': _round(k, 2),
+                'd': _round(d, 2)
+            }
+        }
+        for period, sma in smas.items():
+            indicators[f'sma_{period}'] = _round(sma, 4)
+        if avg_volume is not None:
+            indicators['avg_volume'] = _round(avg_volume, 0)
+            indicators['current_volume'] = int(volume)
+        return indicators
+
+
+class IndicatorStateRegistry:
+    """Estados incrementais mantidos em memória por (símbolo, intervalo), com limite LRU"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is None:
+                entry = {'lock': threading.Lock(), 'state': None}
+                self._states[key] = entry
+                while len(self._states) > self.max_entries:
+                    self._states.popitem(last=False)
+            self._states.move_to_end(key)
+            return entry
+
+    def latest(self, symbol, interval, timestamps, bars):
+        """Avança o estado só com as barras novas e devolve os indicadores atuais.
+
+        A última barra é tratada como em formação: entra apenas em `preview`, e
+        é confirmada na chamada seguinte quando uma barra mais nova aparecer.
+        """
+        timestamps = np.asarray(timestamps)
+        high, low, close, volume = bars['high'], bars['low'], bars['close'], bars['volume']
+        entry = self._entry((symbol, interval))
+        with entry['lock']:
+            state = entry['state']
+            start = 0
+            if state is not None and state.last_timestamp is not None:
+                pos = int(np.searchsorted(timestamps, state.last_timestamp))
+                if pos < len(timestamps) - 1 and timestamps[pos] == state.last_timestamp:
+                    start = pos + 1
+                else:
+                    state = None
+            if state is None:
+                state = IndicatorState()
+                start = 0
+
+            for i in range(start, len(timestamps) - 1):
+                state.update(int(timestamps[i]), float(high[i]), float(low[i]),
+                             float(close[i]), float(volume[i]))
+            entry['state'] = state
+            return state.preview(int(timestamps[-1]), float(high[-1]), float(low[-1]),
+                                 float(close[-1]), float(volume[-1]))
+
+
+indicator_states = IndicatorStateRegistry()
@@ -0,0 +1,192 @@
+import csv
+import os
+import re
+import threading
+from bisect import bisect_left
+
+import numpy as np
+
+DEFAULT_CATALOG = os.environ.get(
+    'SYMBOL_CATALOG',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'symbols.csv')
+)
+
+# Nome do grupo em /api/market/symbols para cada tipo
+GROUP_NAMES = {'forex': 'forex', 'stock': 'stocks', 'crypto': 'crypto', 'index': 'indices'}
+
+# Faixas de pontuação: prefixo do símbolo > prefixo do nome > prefixo de palavra >
+# todos os trigramas presentes (contém) > aproximado
+_KIND_SCORES = (3000, 2000, 1000)
+_EXACT_BONUS = 5000
+_CONTAINS_SCORE = 900
+_FUZZY_SCORE = 500
+_MAX_PREFIX_SCAN = 20000
+
+
+def _words(text):
+    return re.sub(r'[^0-9A-Z]+', ' ', text.upper()).split()
+
+
+def _trigrams(token):
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolCatalog:
+    """Catálogo de instrumentos com índices pré-calculados para busca.
+
+    - prefixo: chaves normalizadas (símbolo, nome inteiro e cada palavra do nome)
+      ordenadas; um prefixo vira um intervalo contíguo via bisect.
+    - aproximado: índice invertido de trigramas -> ids, contado com numpy.
+    """
+
+    def __init__(self, entries):
+        self.entries = [
+            {'symbol': e['symbol'], 'name': e['name'], 'type': e['type'], 'featured': bool(e.get('featured'))}
+            for e in entries
+        ]
+        self._types = np.array([e['type'] for e in self.entries])
+        # Texto bruto (com pontuação) para a busca por substring de consultas curtas
+        self._texts = np.array([f"{e['symbol']}\n{e['name']}".upper() for e in self.entries])
+
+        keys = []
+        postings = {}
+        for index, entry in enumerate(self.entries):
+            symbol = ''.join(_words(entry['symbol']))
+            name_words = _words(entry['name'])
+            keys.append((symbol, index, 0))
+            keys.append((''.join(name_words), index, 1))
+            keys.extend((word, index, 2) for word in name_words[1:])
+            grams = _trigrams(symbol)
+            for word in name_words:
+                grams |= _trigrams(word)
+            for gram in grams:
+                postings.setdefault(gram, []).append(index)
+
+        keys.sort()
+        self._keys = [key for key, _, _ in keys]
+        self._key_ids = np.array([index for _, index, _ in keys], dtype=np.int64)
+        self._key_kinds = np.array([kind for _, _, kind in keys], dtype=np.int64)
+        self._key_lengths = np.array([len(key) for key in self._keys], dtype=np.int64)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            row['featured'] = row.get('featured', '0').strip() in ('1', 'true', 'yes')
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _prefix_scores(self, query):
+        lo = bisect_left(self._keys, query)
+        hi = bisect_left(self._keys, query + '\uffff')
+        hi = min(hi, lo + _MAX_PREFIX_SCAN)
+        ids = self._key_ids[lo:hi]
+        kinds = self._key_kinds[lo:hi]
+        lengths = self._key_lengths[lo:hi]
+        scores = np.take(_KIND_SCORES, kinds) - (lengths - len(query))
+        scores = scores + np.where((lengths == len(query)) & (kinds < 2), _EXACT_BONUS, 0)
+        return ids, scores
+
+    def _fuzzy_scores(self, query_words):
+        """Fração dos trigramas da busca presentes em cada instrumento.
+
+        Os trigramas da busca não usam as bordas das palavras, então uma busca
+        contida no meio de um símbolo ou palavra ainda tem todos presentes.
+        """
+        grams = set()
+        for word in query_words:
+            grams |= {word[i:i + 3] for i in range(len(word) - 2)}
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not lists:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.entries))
+        ids = np.flatnonzero(counts >= len(grams) * 0.5)
+        return ids, counts[ids] / len(grams)
+
+    def _top(self, ids, scores, types, limit):
+        """Melhores `limit` instrumentos distintos; empate mantém a ordem do catálogo"""
+        if types:
+            keep = np.isin(self._types[ids], list(types))
+            ids, scores = ids[keep], scores[keep]
+        # Só os candidatos de maior pontuação precisam ser ordenados
+        pool = limit * 8
+        if len(ids) > pool:
+            part = np.argpartition(-scores, pool)[:pool]
+            ids, scores = ids[part], scores[part]
+        order = np.lexsort((ids, -scores))
+        ids = ids[order]
+        _, first = np.unique(ids, return_index=True)
+        return ids[np.sort(first)][:limit]
+
+    def search(self, query, types=None, limit=10):
+        """Busca ranqueada por prefixo, substring e similaridade de trigramas"""
+        raw = (query or '').strip().upper()
+        if not raw or limit < 1:
+            return []
+        query_words = _words(raw)
+        compact = ''.join(query_words)
+
+        if compact:
+            ids, scores = self._prefix_scores(compact)
+        else:
+            ids, scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        best = self._top(ids, scores, types, limit)
+        # Prefixos sempre pontuam acima das demais faixas: só busca aproximada se faltar resultado
+        if len(best) < limit and len(compact) >= 3:
+            fuzzy_ids, similarity = self._fuzzy_scores(query_words)
+            fuzzy_scores = np.where(similarity >= 1, _CONTAINS_SCORE, _FUZZY_SCORE * similarity)
+            best = self._top(
+                np.concatenate([ids, fuzzy_ids]),
+                np.concatenate([scores, fuzzy_scores]),
+                types, limit
+            )
+        elif len(best) < limit:
+            # Consultas curtas não têm trigramas: substring no texto bruto (ex.: "=X", "^")
+            contains = np.flatnonzero(np.char.find(self._texts, raw) >= 0)
+            best = self._top(
+                np.concatenate([ids, contains]),
+                np.concatenate([scores, np.full(len(contains), _CONTAINS_SCORE)]),
+                types, limit
+            )
+        return [self._public(self.entries[i]) for i in best.tolist()]
+
+    def groups(self, featured_only=True):
+        """Instrumentos agrupados por tipo no formato de /api/market/symbols"""
+        groups = {name: [] for name in GROUP_NAMES.values()}
+        for entry in self.entries:
+            if featured_only and not entry['featured']:
+                continue
+            group = GROUP_NAMES.get(entry['type'], entry['type'])
+            groups.setdefault(group, []).append(self._public(entry))
+        return groups
+
+    def symbols(self, types=None):
+        return [entry['symbol'] for entry in self.entries if not types or entry['type'] in types]
+
+    @staticmethod
+    def _public(entry):
+        return {'symbol': entry['symbol'], 'name': entry['name'], 'type': entry['type']}
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Catálogo carregado uma única vez por processo"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = SymbolCatalog.from_csv(DEFAULT_CATALOG)
+    return _catalog
+
+
+def universe(types=None):
+    """Todos os símbolos do catálogo (opcionalmente filtrados por tipo)"""
+    return get_catalog().symbols(types)
@@ -0,0 +1,115 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from src.services.resample import load_interval
+
+# Mantém no armazenamento as barras dos símbolos pedidos ao screener. A rota
+# só lê o disco; as buscas no upstream acontecem aqui, uma por vez, no ritmo
+# do limitador de requisições, sem ocupar o pool do fan-out.
+
+REFRESH_INTERVAL = float(os.environ.get('SCREENER_REFRESH_INTERVAL', 900))
+MAX_TRACKED = int(os.environ.get('SCREENER_MAX_TRACKED', 20000))
+# Chaves que ninguém pede ao screener por esse tempo deixam de ser atualizadas
+IDLE_TTL = float(os.environ.get('SCREENER_IDLE_TTL', 3600))
+REFRESH_BATCH = 50
+
+logger = logging.getLogger(__name__)
+
+
+class UniverseRefresher:
+    """Atualiza em segundo plano as séries (símbolo, intervalo, período) pedidas recentemente"""
+
+    def __init__(self, store, fetch_chart, refresh_interval=REFRESH_INTERVAL, max_tracked=MAX_TRACKED,
+                 idle_ttl=IDLE_TTL):
+        self.store = store
+        self.fetch_chart = fetch_chart
+        self.refresh_interval = refresh_interval
+        self.max_tracked = max_tracked
+        self.idle_ttl = idle_ttl
+        self._tracked = OrderedDict()  # chave -> relógio da última atualização (0 = nunca)
+        self._requested = {}  # chave -> relógio do último pedido
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stats = {'refreshed': 0, 'errors': 0, 'evicted': 0, 'expired': 0, 'no_data': 0}
+
+    def request(self, keys):
+        """Passa a acompanhar as chaves; as novas vão para o início da fila"""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if key in self._tracked:
+                    self._tracked.move_to_end(key)
+                else:
+                    self._tracked[key] = 0.0
+                self._requested[key] = now
+            while len(self._tracked) > self.max_tracked:
+                self._forget(self._tracked.popitem(last=False)[0])
+                self._stats['evicted'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='screener-refresh', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _forget(self, key):
+        """Para de acompanhar a chave (chamado com o lock)"""
+        self._tracked.pop(key, None)
+        self._requested.pop(key, None)
+
+    def due(self):
+        """Chaves a atualizar: nunca carregadas primeiro, depois as mais antigas.
+
+        As não pedidas há mais de `idle_ttl` são descartadas aqui.
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, requested in self._requested.items() if now - requested > self.idle_ttl]
+            for key in idle:
+                self._forget(key)
+            self._stats['expired'] += len(idle)
+            due = [(updated, key) for key, updated in self._tracked.items()
+                   if not updated or now - updated >= self.refresh_interval]
+        due.sort(key=lambda item: item[0])
+        return [key for _, key in due]
+
+    def refresh(self, key):
+        symbol, interval, range_period = key
+        try:
+            columns, _ = load_interval(self.store, self.fetch_chart, symbol, interval, range_period)
+            outcome = 'refreshed' if columns is not None else 'no_data'
+        except Exception:
+            logger.warning('Screener refresh failed for %s', key, exc_info=True)
+            outcome = 'errors'
+        with self._lock:
+            self._stats[outcome] += 1
+            if outcome == 'no_data':
+                # Símbolo que o upstream não conhece não volta a ser buscado até ser pedido de novo
+                self._forget(key)
+            elif key in self._tracked:
+                # Falhas também esperam o próximo ciclo, para não martelar o upstream
+                self._tracked[key] = time.monotonic()
+
+    def _run(self):
+        while True:
+            due = self.due()
+            if not due:
+                self._wake.wait(timeout=min(self.refresh_interval, 30))
+                self._wake.clear()
+                continue
+            # Poucas por vez: símbolos recém-pedidos não esperam a volta inteira
+            for key in due[:REFRESH_BATCH]:
+                self.refresh(key)
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for updated in self._tracked.values() if not updated)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tracked'] = len(self._tracked)
+        stats['pending'] = self.pending()
+        return stats
@@ -0,0 +1,183 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from src.services.cooperative import native_lock
+from src.services.metrics import register_gauges, upstream_requests
+
+# Limite global de requisições ao upstream (por processo), compartilhado por todas as rotas
+UPSTREAM_RATE = float(os.environ.get('UPSTREAM_RATE', 5))
+UPSTREAM_BURST = int(os.environ.get('UPSTREAM_BURST', 10))
+MAX_RETRIES = int(os.environ.get('UPSTREAM_MAX_RETRIES', 3))
+BACKOFF_BASE = float(os.environ.get('UPSTREAM_BACKOFF_BASE', 0.5))
+BACKOFF_CAP = float(os.environ.get('UPSTREAM_BACKOFF_CAP', 8))
+
+
+class RateLimitTimeout(Exception):
+    """Não foi possível obter permissão do limitador dentro do prazo"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """O prazo da chamada (definido pelo fan-out) acabou antes da resposta do upstream"""
+
+
+# Prazo (relógio monotônico) da chamada em andamento; None = sem prazo
+_deadline = contextvars.ContextVar('upstream_deadline', default=None)
+
+
+@contextmanager
+def call_deadline(seconds):
+    """Limita as chamadas ao upstream feitas dentro do bloco a `seconds` no total"""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(default):
+    """Tempo que resta até o prazo da chamada atual, no máximo `default`"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded('timeout')
+    return min(default, left)
+
+
+class TokenBucket:
+    """Balde de fichas: `rate` requisições/s em média, rajadas de até `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = native_lock()
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=30):
+        """Bloqueia até haver uma ficha (ou levanta RateLimitTimeout após `timeout` segundos)"""
+        deadline = time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    if waited:
+                        self.waits += 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                raise RateLimitTimeout('Limite de requisições ao upstream atingido')
+            waited = True
+            self.waited_seconds += wait
+            time.sleep(wait)
+
+
+def error_status(exc):
+    """Status HTTP associado a uma exceção do upstream (429 para o rate limit do yfinance)"""
+    if type(exc).__name__ == 'YFRateLimitError':
+        return 429
+    if isinstance(getattr(exc, 'status', None), int):
+        return exc.status
+    response = getattr(exc, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def is_retryable(exc):
+    status = error_status(exc)
+    return status == 429 or (status is not None and 500 <= status < 600)
+
+
+def _retry_after(exc):
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class Governor:
+    """Limitador + novas tentativas com backoff exponencial e jitter para chamadas ao upstream"""
+
+    def __init__(self, limiter, max_retries=MAX_RETRIES, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base = base
+        self.cap = cap
+        self.stats = {'calls': 0, 'retries': 0, 'failures': 0}
+
+    def call(self, fn, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.limiter.acquire(timeout=remaining(30))
+            except RateLimitTimeout:
+                upstream_requests.inc('throttled')
+                raise
+            self.stats['calls'] += 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                upstream_requests.inc('rate_limited' if error_status(e) == 429 else 'error')
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self.stats['failures'] += 1
+                    raise
+                # Full jitter: espera aleatória até o teto exponencial (ou o Retry-After do servidor)
+                delay = random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = min(self.cap, max(delay, retry_after))
+                if remaining(delay + 1) <= delay:
+                    # Não há tempo para outra tentativa dentro do prazo da chamada
+                    self.stats['failures'] += 1
+                    raise
+                self.stats['retries'] += 1
+                time.sleep(delay)
+            else:
+                upstream_requests.inc('ok')
+                return result
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    """Sessão HTTP única do processo (conexões keep-alive reaproveitadas).
+
+    Usa curl_cffi, exigido pelo yfinance para falar com o Yahoo; sem ele cai
+    para requests.Session.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                try:
+                    from curl_cffi import requests as curl_requests
+                    _session = curl_requests.Session(impersonate='chrome')
+                except ImportError:
+                    import requests
+                    _session = requests.Session()
+    return _session
+
+
+upstream = Governor(TokenBucket(UPSTREAM_RATE, UPSTREAM_BURST))
+
+register_gauges(lambda: [
+    ('upstream_retries', 'Novas tentativas ao upstream', upstream.stats['retries']),
+    ('upstream_limiter_waits', 'Chamadas que esperaram o limitador', upstream.limiter.waits),
+    ('upstream_limiter_wait_seconds', 'Tempo total de espera no limitador', round(upstream.limiter.waited_seconds, 3))
+])
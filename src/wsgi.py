@@ -0,0 +1,16 @@
+import os
+import sys
+
+# Monkey patch antes de qualquer outro import: sockets, threads e locks viram cooperativos
+if os.environ.get('SOCKETIO_ASYNC_MODE', 'eventlet') == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+
+# Mesmo sys.path de `python src/main.py`: raiz do projeto e src/ (para data_api)
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app, socketio  # noqa: E402
+
+# Ponto de entrada de produção: gunicorn -c gunicorn.conf.py src.wsgi:app
+application = app
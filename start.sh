@@ -1,3 +1,3 @@
 #!/bin/bash
 pip install -r requirements.txt
-python src/main.py
+gunicorn -c gunicorn.conf.py src.wsgi:app